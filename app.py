@@ -186,6 +186,10 @@ def initialize_session_state():
         st.session_state.main_pdf = None
     if 'merged_pdf' not in st.session_state:
         st.session_state.merged_pdf = None
+    if 'jobs' not in st.session_state:
+        st.session_state.jobs = {}
+    if 'pipeline_steps' not in st.session_state:
+        st.session_state.pipeline_steps = []
 
 def create_header():
     """Create professional header"""
@@ -214,21 +218,25 @@ def create_footer():
 
 def main():
     """Main application function"""
-    # Apply styling
-    apply_custom_css()
+    from pdf_metrics import rerun_timer
 
-    # Initialize session state
-    initialize_session_state()
+    # Full reruns only; tool fragments time their own reruns
+    with rerun_timer('app'):
+        # Apply styling
+        apply_custom_css()
 
-    # Create header
-    create_header()
+        # Initialize session state
+        initialize_session_state()
 
-    # Import and render PDF manager
-    from pdf_manager import render_pdf_manager
-    render_pdf_manager()
+        # Create header
+        create_header()
 
-    # Create footer
-    create_footer()
+        # Import and render PDF manager
+        from pdf_manager import render_pdf_manager
+        render_pdf_manager()
+
+        # Create footer
+        create_footer()
 
 if __name__ == "__main__":
     main()
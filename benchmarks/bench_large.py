@@ -0,0 +1,114 @@
+"""
+Out-of-core merge benchmark
+
+Writes two image-heavy synthetic PDFs totalling --size-mb to disk, merges
+them with PDFProcessor.merge_pdfs and reports time and peak RSS next to the
+size of the inputs plus the output. Each merge runs in a fresh process so
+peak RSS covers that merge alone; --in-memory adds a run with the
+out-of-core threshold raised past the inputs for comparison.
+
+    python benchmarks/bench_large.py                      # 1 GB of inputs
+    python benchmarks/bench_large.py --size-mb 200 --in-memory
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.corpus import CorpusSpec, generate_pdf  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def write_inputs(directory: Path, size_mb: int, image_kb: int):
+    """Generate the two merge inputs (different seeds, so nothing is shared)"""
+    paths = []
+    pages = max(size_mb * 1024 // (2 * image_kb), 1)
+    for seed in (0, 1):
+        path = directory / f"large_{seed}.pdf"
+        path.write_bytes(generate_pdf(CorpusSpec(pages=pages, image_bytes=image_kb * 1024, seed=seed)))
+        paths.append(path)
+    return paths
+
+
+def run_merge(main_path: str, insert_path: str) -> dict:
+    """Merge in this process; called in a child so ru_maxrss is the merge's own peak"""
+    from pdf_engine import PDFProcessor
+    from pdf_results import result_cache
+    from pdf_storage import FileSource
+
+    result_cache.max_bytes = 0
+    main, insert = FileSource(main_path), FileSource(insert_path)
+    start = time.perf_counter()
+    result = PDFProcessor.merge_pdfs(main, [(insert, 1)], to_file=True)
+    seconds = time.perf_counter() - start
+    output_bytes = len(result)
+    os.unlink(result.path)
+    return {
+        'seconds': seconds,
+        'input_bytes': main.size + insert.size,
+        'output_bytes': output_bytes,
+        'peak_rss': peak_rss(),
+    }
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes"""
+    # VmHWM starts over at exec; ru_maxrss would include the parent's peak from before the fork
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Kilobytes on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def measure(paths, threshold_mb=None) -> dict:
+    env = dict(os.environ)
+    if threshold_mb is not None:
+        env['DOCSUITE_OUT_OF_CORE_MB'] = str(threshold_mb)
+    output = subprocess.run([sys.executable, __file__, '--child', *map(str, paths)],
+                            cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=1024, help='Combined size of the two inputs')
+    parser.add_argument('--image-kb', type=int, default=512, help='Image size per page')
+    parser.add_argument('--dir', type=Path, help='Where to write the inputs (default: a temporary directory)')
+    parser.add_argument('--in-memory', action='store_true', help='Also time the in-memory path')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_merge(*args.child)))
+        return
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        paths = write_inputs(Path(directory), args.size_mb, args.image_kb)
+        runs = [('out-of-core', measure(paths))]
+        if args.in_memory:
+            runs.append(('in-memory', measure(paths, threshold_mb=2 * args.size_mb + 1)))
+
+    print(f"{'mode':<12} {'seconds':>8} {'input MB':>9} {'output MB':>10} {'peak RSS MB':>12} {'RSS / (in+out)':>15}")
+    for mode, run in runs:
+        moved = run['input_bytes'] + run['output_bytes']
+        print(f"{mode:<12} {run['seconds']:>8.2f} {run['input_bytes'] / MB:>9.0f} {run['output_bytes'] / MB:>10.0f} "
+              f"{run['peak_rss'] / MB:>12.0f} {run['peak_rss'] / moved:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
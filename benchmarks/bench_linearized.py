@@ -0,0 +1,181 @@
+"""
+Time-to-first-page benchmark for linearized output
+
+Runs merge, remove and split on an image-heavy synthetic document with and
+without ``linearize``, serves every output from a local HTTP server that
+answers byte-range requests over a throttled link (a stand-in for a CDN or
+object store), and times how long a progressive viewer takes to hold
+everything page 1 needs:
+
+- linearized: fetch the first KB, read the end of the first-page section
+  (/E) from the linearization dictionary and fetch up to it;
+- not linearized: page 1 can't be located without the cross-reference data
+  at the end of the file, so the viewer downloads the whole file first.
+
+The linearized prefix is checked rather than trusted: every object page 1
+uses must be listed in the first-page xref table and lie before /E.
+
+    python benchmarks/bench_linearized.py
+    python benchmarks/bench_linearized.py --pages 400 --image-kb 64 --bandwidth-kb 512 --latency-ms 80
+"""
+
+import argparse
+import re
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.corpus import CorpusSpec, generate_pdf  # noqa: E402
+from pdf_engine import PDFProcessor  # noqa: E402
+from pdf_results import result_cache  # noqa: E402
+
+result_cache.max_bytes = 0
+
+MB = 1024 * 1024
+# Bytes a viewer reads before it knows whether the file is linearized
+HEAD_BYTES = 1024
+SEND_CHUNK = 16 * 1024
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves the server's files with Range support, latency and a bandwidth cap"""
+
+    def do_GET(self):
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        start, end = 0, len(data)
+        match = _RANGE_RE.fullmatch(self.headers.get('Range', ''))
+        if match:
+            first, last = match.groups()
+            start = int(first) if first else max(len(data) - int(last), 0)
+            end = min(int(last) + 1, len(data)) if first and last else len(data)
+
+        time.sleep(self.server.latency)
+        self.send_response(206 if match else 200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start))
+        if match:
+            self.send_header('Content-Range', f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+        for offset in range(start, end, SEND_CHUNK):
+            chunk = data[offset:min(offset + SEND_CHUNK, end)]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / self.server.bandwidth)
+
+    def log_message(self, *args):
+        pass
+
+
+def fetch(url: str, start: int = 0, end: int = None) -> bytes:
+    """GET a byte range [start, end), or the whole file"""
+    request = urllib.request.Request(url)
+    if start or end is not None:
+        request.add_header('Range', f"bytes={start}-{'' if end is None else end - 1}")
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def linearization(head: bytes) -> Dict[str, int]:
+    """Numeric entries of the linearization dictionary, or {} for other files"""
+    match = re.search(rb'<<\s*/Linearized\s.*?>>', head, re.S)
+    if not match:
+        return {}
+    return {key.decode(): int(value) for key, value in re.findall(rb'/(\w+)\s+(\d+)', match.group(0))}
+
+
+def first_page_view(url: str) -> Tuple[bytes, Dict[str, int]]:
+    """Fetch what a progressive viewer needs for page 1; returns the bytes held and the parameters"""
+    head = fetch(url, 0, HEAD_BYTES)
+    parameters = linearization(head)
+    if not parameters:
+        return head + fetch(url, len(head)), parameters
+    return head + fetch(url, len(head), parameters['E']), parameters
+
+
+def first_page_objects(prefix: bytes, parameters: Dict[str, int]) -> int:
+    """Count the objects page 1 uses, checking that all of them are inside the prefix"""
+    table = re.search(rb'xref\s+(\d+)\s+(\d+)\s+', prefix)
+    first, count = int(table.group(1)), int(table.group(2))
+    offsets = {first + i: int(prefix[table.end() + 20 * i:table.end() + 20 * i + 10]) for i in range(count)}
+
+    pending, seen = [parameters['O']], set()
+    while pending:
+        idnum = pending.pop()
+        if idnum in seen:
+            continue
+        seen.add(idnum)
+        offset = offsets.get(idnum)
+        if offset is None or offset >= parameters['E']:
+            raise AssertionError(f"page 1 uses object {idnum}, which is outside the first-page section")
+        # References live in the object's dictionary, never inside stream data
+        body = prefix[offset:prefix.index(b'endobj', offset)]
+        body = body.split(b'stream', 1)[0]
+        body = re.sub(rb'/Parent\s+\d+\s+0\s+R', b'', body)
+        pending.extend(int(ref) for ref in re.findall(rb'(\d+)\s+0\s+R', body))
+    return len(seen)
+
+
+def build_outputs(pages: int, image_kb: int) -> Dict[str, bytes]:
+    document = generate_pdf(CorpusSpec(pages=pages, image_bytes=image_kb * 1024))
+    insert = generate_pdf(CorpusSpec(pages=max(pages // 10, 1), image_bytes=image_kb * 1024, seed=1))
+    outputs = {}
+    for linearize in (False, True):
+        suffix = 'linearized' if linearize else 'plain'
+        outputs[f"merge/{suffix}"] = PDFProcessor.merge_pdfs(document, [(insert, pages // 2)], linearize=linearize)
+        outputs[f"remove/{suffix}"] = PDFProcessor.remove_pages(document, range(1, pages + 1, 10),
+                                                                compact=True, linearize=linearize)
+        outputs[f"split/{suffix}"] = next(iter(PDFProcessor.split_pdf(document, 'every_n', max(pages // 2, 1),
+                                                                      linearize=linearize).values()))
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--image-kb', type=int, default=32, help='Image size per page')
+    parser.add_argument('--bandwidth-kb', type=int, default=1024, help='Link speed in KB/s')
+    parser.add_argument('--latency-ms', type=int, default=50, help='Delay before each response')
+    args = parser.parse_args()
+
+    outputs = build_outputs(args.pages, args.image_kb)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.files = {f"/{name}.pdf": data for name, data in outputs.items()}
+    server.bandwidth = args.bandwidth_kb * 1024
+    server.latency = args.latency_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{'output':<20} {'MB':>7} {'page 1 KB':>10} {'objects':>8} {'first page s':>13} {'full file s':>12}")
+    try:
+        for name, data in outputs.items():
+            url = f"{base}/{name}.pdf"
+            start = time.perf_counter()
+            prefix, parameters = first_page_view(url)
+            first_page = time.perf_counter() - start
+            objects = first_page_objects(prefix, parameters) if parameters else '-'
+
+            start = time.perf_counter()
+            fetched = fetch(url)
+            full = time.perf_counter() - start
+            assert fetched == data
+
+            print(f"{name:<20} {len(data) / MB:>7.2f} {len(prefix) / 1024:>10.0f} {objects:>8} "
+                  f"{first_page:>13.2f} {full:>12.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Merge scaling benchmark
+
+Times PDFProcessor.merge_pdfs at growing output sizes and reports the cost per
+output page. A linear merge keeps that figure flat as the page count grows.
+
+    python benchmarks/bench_merge.py [--scales 250,500,1000,2000] [--repeat 3]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.corpus import CorpusSpec, generate_pdf  # noqa: E402
+from pdf_cache import document_cache  # noqa: E402
+from pdf_engine import PDFProcessor  # noqa: E402
+from pdf_results import result_cache  # noqa: E402
+
+# Time the merge itself, never a result cache lookup
+result_cache.max_bytes = 0
+
+
+def bench_scale(main_pages: int, repeat: int):
+    """Merge a main PDF with inserts at the start, middle and end"""
+    main_bytes = generate_pdf(CorpusSpec(pages=main_pages))
+    insert_bytes = generate_pdf(CorpusSpec(pages=max(main_pages // 10, 1), seed=1))
+    inserts = [(insert_bytes, 0), (insert_bytes, main_pages // 2), (insert_bytes, main_pages)]
+    output_pages = main_pages + 3 * max(main_pages // 10, 1)
+
+    # Parse once up front so the timing covers merge work, not first parse;
+    # get_pdf_info answers from the probe without parsing, so go to the cache
+    document_cache.get(main_bytes)
+    document_cache.get(insert_bytes)
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        PDFProcessor.merge_pdfs(main_bytes, inserts)
+        best = min(best, time.perf_counter() - start)
+
+    document_cache.clear()
+    return output_pages, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='250,500,1000,2000', help='Main PDF page counts')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scale (best is kept)')
+    args = parser.parse_args()
+
+    rows = [bench_scale(int(scale), args.repeat) for scale in args.scales.split(',')]
+
+    print(f"{'output pages':>12} {'seconds':>10} {'ms/page':>10}")
+    for pages, seconds in rows:
+        print(f"{pages:>12} {seconds:>10.3f} {seconds * 1000 / pages:>10.3f}")
+
+    first_rate = rows[0][1] / rows[0][0]
+    last_rate = rows[-1][1] / rows[-1][0]
+    print(f"\nper-page cost ratio (largest / smallest): {last_rate / first_rate:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Deterministic synthetic PDF generator for benchmarks
+
+Builds PDFs byte by byte so that page count, embedded image size, font
+sharing and cross-reference style can be varied independently, and so the
+same parameters always produce the same bytes.
+
+    from benchmarks.corpus import CorpusSpec, generate_pdf
+    pdf_bytes = generate_pdf(CorpusSpec(pages=1000, image_bytes=20_000, object_streams=True))
+"""
+
+import random
+import zlib
+from typing import Dict, List, NamedTuple, Tuple
+
+# Kids per intermediate page tree node
+PAGE_TREE_FANOUT = 64
+# Non-stream objects packed into each object stream
+OBJECTS_PER_STREAM = 100
+
+
+class CorpusSpec(NamedTuple):
+    """Parameters of one synthetic document"""
+    pages: int = 10
+    image_bytes: int = 0           # raw size of one image XObject per page (0 = none)
+    shared_fonts: bool = True      # one font object for all pages, or one per page
+    object_streams: bool = False   # object streams plus an xref stream instead of a classic table
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        parts = [f"p{self.pages}"]
+        if self.image_bytes:
+            parts.append(f"img{self.image_bytes // 1024}k")
+        if not self.shared_fonts:
+            parts.append("fonts")
+        if self.object_streams:
+            parts.append("objstm")
+        return '-'.join(parts)
+
+
+def generate_pdf(spec: CorpusSpec) -> bytes:
+    """Build the document described by ``spec``"""
+    rng = random.Random(spec.seed)
+    objects: Dict[int, bytes] = {}
+    streams: Dict[int, Tuple[bytes, bytes]] = {}  # idnum -> (dictionary, data)
+    next_id = [1]
+
+    def reserve() -> int:
+        idnum = next_id[0]
+        next_id[0] += 1
+        return idnum
+
+    catalog_id = reserve()
+    root_pages_id = reserve()
+    shared_font_id = reserve() if spec.shared_fonts else None
+    if shared_font_id:
+        objects[shared_font_id] = _font_dict()
+
+    page_ids: List[int] = []
+    for number in range(1, spec.pages + 1):
+        page_id = reserve()
+        page_ids.append(page_id)
+
+        font_id = shared_font_id
+        if font_id is None:
+            font_id = reserve()
+            objects[font_id] = _font_dict()
+
+        resources = f"/Font << /F1 {font_id} 0 R >>"
+        drawing = b""
+        if spec.image_bytes:
+            image_id = reserve()
+            side = max(int((spec.image_bytes / 3) ** 0.5), 1)
+            pixels = rng.randbytes(side * side * 3)
+            streams[image_id] = (
+                f"/Type /XObject /Subtype /Image /Width {side} /Height {side} "
+                f"/ColorSpace /DeviceRGB /BitsPerComponent 8".encode(),
+                pixels,
+            )
+            resources += f" /XObject << /Im1 {image_id} 0 R >>"
+            drawing = b"q 200 0 0 200 72 400 cm /Im1 Do Q\n"
+
+        content_id = reserve()
+        text = f"BT /F1 24 Tf 72 720 Td (Synthetic page {number}) Tj ET\n".encode()
+        streams[content_id] = (b"/Filter /FlateDecode", zlib.compress(drawing + text))
+
+        objects[page_id] = (
+            f"<< /Type /Page /Parent {{parent}} 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << {resources} >> /Contents {content_id} 0 R >>"
+        ).encode()
+
+    # Two-level page tree: root -> nodes of PAGE_TREE_FANOUT pages
+    node_ids = []
+    for start in range(0, len(page_ids), PAGE_TREE_FANOUT):
+        kids = page_ids[start:start + PAGE_TREE_FANOUT]
+        node_id = reserve() if len(page_ids) > PAGE_TREE_FANOUT else root_pages_id
+        node_ids.append(node_id)
+        for kid in kids:
+            objects[kid] = objects[kid].replace(b"{parent}", str(node_id).encode())
+        parent = f"/Parent {root_pages_id} 0 R " if node_id != root_pages_id else ""
+        objects[node_id] = (
+            f"<< /Type /Pages {parent}/Count {len(kids)} "
+            f"/Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] >>"
+        ).encode()
+
+    if node_ids != [root_pages_id]:
+        objects[root_pages_id] = (
+            f"<< /Type /Pages /Count {len(page_ids)} "
+            f"/Kids [{' '.join(f'{node} 0 R' for node in node_ids)}] >>"
+        ).encode()
+
+    objects[catalog_id] = f"<< /Type /Catalog /Pages {root_pages_id} 0 R >>".encode()
+
+    if spec.object_streams:
+        return _serialize_with_object_streams(objects, streams, catalog_id, next_id[0])
+    return _serialize_classic(objects, streams, catalog_id, next_id[0])
+
+
+def _font_dict() -> bytes:
+    return b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+
+
+def _stream_bytes(idnum: int, dictionary: bytes, data: bytes) -> bytes:
+    return (f"{idnum} 0 obj\n<< ".encode() + dictionary + f" /Length {len(data)} >>\nstream\n".encode()
+            + data + b"\nendstream\nendobj\n")
+
+
+def _serialize_classic(objects, streams, catalog_id: int, size: int) -> bytes:
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for idnum in range(1, size):
+        offsets[idnum] = len(out)
+        if idnum in streams:
+            out += _stream_bytes(idnum, *streams[idnum])
+        else:
+            out += f"{idnum} 0 obj\n".encode() + objects[idnum] + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for idnum in range(1, size):
+        out += f"{offsets[idnum]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {size} /Root {catalog_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def _serialize_with_object_streams(objects, streams, catalog_id: int, size: int) -> bytes:
+    out = bytearray(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    entries: Dict[int, Tuple[int, int, int]] = {}  # idnum -> (type, field2, field3)
+
+    for idnum in sorted(streams):
+        entries[idnum] = (1, len(out), 0)
+        out += _stream_bytes(idnum, *streams[idnum])
+
+    packed = sorted(objects)
+    for start in range(0, len(packed), OBJECTS_PER_STREAM):
+        members = packed[start:start + OBJECTS_PER_STREAM]
+        stream_id = size
+        size += 1
+        header, body = [], bytearray()
+        for index, idnum in enumerate(members):
+            header.append(f"{idnum} {len(body)}")
+            body += objects[idnum] + b"\n"
+            entries[idnum] = (2, stream_id, index)
+        header_bytes = (' '.join(header) + '\n').encode()
+        data = zlib.compress(header_bytes + bytes(body))
+        dictionary = (f"/Type /ObjStm /N {len(members)} /First {len(header_bytes)} "
+                      f"/Filter /FlateDecode").encode()
+        entries[stream_id] = (1, len(out), 0)
+        out += _stream_bytes(stream_id, dictionary, data)
+
+    xref_id = size
+    size += 1
+    entries[xref_id] = (1, len(out), 0)
+    rows = bytearray(b"\x00" + (0).to_bytes(4, 'big') + (65535).to_bytes(2, 'big'))
+    for idnum in range(1, size):
+        kind, field2, field3 = entries[idnum]
+        rows += bytes([kind]) + field2.to_bytes(4, 'big') + field3.to_bytes(2, 'big')
+    data = zlib.compress(bytes(rows))
+    xref_offset = len(out)
+    dictionary = (f"/Type /XRef /Size {size} /W [1 4 2] /Root {catalog_id} 0 R "
+                  f"/Filter /FlateDecode").encode()
+    out += _stream_bytes(xref_id, dictionary, data)
+    out += f"startxref\n{xref_offset}\n%%EOF\n".encode()
+    return bytes(out)
@@ -0,0 +1,191 @@
+"""
+Load generator for the DocSuite HTTP API (pdf_api.py)
+
+Each simulated client uploads a synthetic corpus document, polls its job
+until it finishes and downloads the result, so latency covers the whole
+round trip. Prints latency percentiles, throughput and failure counts.
+Every client sends the same documents, so a spawned server runs with the
+result cache off unless --result-cache is given.
+
+    python benchmarks/load_api.py --spawn                      # start a local server
+    python benchmarks/load_api.py --url http://127.0.0.1:8000 --op split --clients 16 --requests 200
+"""
+
+import argparse
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.corpus import CorpusSpec, generate_pdf  # noqa: E402
+
+OPS = ('merge', 'remove', 'split')
+POLL_SECONDS = 0.05
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def encode_multipart(fields: Dict[str, str], files: List[Tuple[str, str, bytes]]) -> Tuple[bytes, str]:
+    """Build a multipart/form-data body from fields and (field, filename, data) files"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                   f'Content-Type: application/pdf\r\n\r\n'.encode())
+        body.write(data)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def build_request(op: str, pdf_bytes: bytes, pages: int) -> Tuple[bytes, str]:
+    if op == 'merge':
+        return encode_multipart({'positions': f"0,{pages}"},
+                                [('main', 'main.pdf', pdf_bytes), ('insert', 'a.pdf', pdf_bytes),
+                                 ('insert', 'b.pdf', pdf_bytes)])
+    if op == 'remove':
+        return encode_multipart({'pages': '1-9:2,-1', 'compact': 'true'}, [('file', 'doc.pdf', pdf_bytes)])
+    return encode_multipart({'mode': 'every_n', 'pages_per_split': str(max(pages // 10, 1))},
+                            [('file', 'doc.pdf', pdf_bytes)])
+
+
+def call(url: str, method: str = 'GET', body: bytes = None, content_type: str = None) -> Tuple[int, Dict]:
+    request = urllib.request.Request(url, data=body, method=method)
+    if content_type:
+        request.add_header('Content-Type', content_type)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def run_one(base_url: str, op: str, body: bytes, content_type: str) -> Dict:
+    """Submit, poll and download one job; returns its outcome and timings"""
+    start = time.perf_counter()
+    status, job = call(f"{base_url}/{op}", 'POST', body, content_type)
+    if status != 202:
+        return {'op': op, 'ok': False, 'status': job.get('status', status), 'error': job.get('error'),
+                'seconds': time.perf_counter() - start}
+
+    while job['status'] in ('queued', 'running'):
+        time.sleep(POLL_SECONDS)
+        _, job = call(f"{base_url}{job['status_url']}")
+    if job['status'] != 'done':
+        return {'op': op, 'ok': False, 'status': job['status'], 'error': job.get('error'),
+                'seconds': time.perf_counter() - start}
+
+    received = 0
+    with urllib.request.urlopen(f"{base_url}{job['result_url']}") as response:
+        while True:
+            chunk = response.read(DOWNLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            received += len(chunk)
+    return {'op': op, 'ok': True, 'status': 'done', 'seconds': time.perf_counter() - start,
+            'uploaded_bytes': len(body), 'downloaded_bytes': received}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(port: int, result_cache: bool = False) -> subprocess.Popen:
+    """Start pdf_api under uvicorn and wait until it answers"""
+    env = dict(os.environ)
+    if not result_cache:
+        env['DOCSUITE_RESULT_CACHE_MB'] = '0'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'pdf_api:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=ROOT, env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            call(f"http://127.0.0.1:{port}/health")
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("API server did not start")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='API base URL')
+    parser.add_argument('--spawn', action='store_true', help='Start a local server on a free port')
+    parser.add_argument('--result-cache', action='store_true',
+                        help='Leave the result cache on in a spawned server')
+    parser.add_argument('--op', choices=OPS + ('mix',), default='mix')
+    parser.add_argument('--pages', type=int, default=100, help='Pages per synthetic document')
+    parser.add_argument('--image-kb', type=int, default=0, help='Embedded image size per page')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=40, help='Total jobs to run')
+    args = parser.parse_args()
+
+    pdf_bytes = generate_pdf(CorpusSpec(pages=args.pages, image_bytes=args.image_kb * 1024))
+    ops = [OPS[i % len(OPS)] if args.op == 'mix' else args.op for i in range(args.requests)]
+    bodies = {op: build_request(op, pdf_bytes, args.pages) for op in set(ops)}
+
+    server = None
+    base_url = args.url.rstrip('/')
+    if args.spawn:
+        port = free_port()
+        server = spawn_server(port, args.result_cache)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            results = list(pool.map(lambda op: run_one(base_url, op, *bodies[op]), ops))
+        elapsed = time.perf_counter() - start
+        _, health = call(f"{base_url}/health")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    ok = [result for result in results if result['ok']]
+    print(f"{len(results)} jobs ({args.op}, {args.pages} pages, {len(pdf_bytes) / 1024:.0f} KB input) "
+          f"from {args.clients} clients in {elapsed:.2f}s")
+    print(f"  {len(ok)} ok, {len(results) - len(ok)} failed: "
+          f"{sorted({str(result['status']) for result in results if not result['ok']}) or '-'}")
+    if ok:
+        latencies = [result['seconds'] for result in ok]
+        print(f"  latency p50 {percentile(latencies, 0.50):.3f}s  p95 {percentile(latencies, 0.95):.3f}s  "
+              f"p99 {percentile(latencies, 0.99):.3f}s  mean {statistics.mean(latencies):.3f}s")
+        moved = sum(result['uploaded_bytes'] + result['downloaded_bytes'] for result in ok)
+        print(f"  throughput {len(ok) / elapsed:.1f} jobs/s, {moved / elapsed / (1024 * 1024):.1f} MB/s transferred")
+    for op in sorted(set(ops)):
+        op_latencies = [result['seconds'] for result in ok if result['op'] == op]
+        if op_latencies:
+            print(f"    {op:<7} {len(op_latencies):>4} ok  p50 {percentile(op_latencies, 0.5):.3f}s  "
+                  f"p95 {percentile(op_latencies, 0.95):.3f}s")
+    print(f"  server: {health['jobs']}")
+    print(f"  results: {health['results']['hits']} hits, {health['results']['misses']} misses")
+    return 0 if len(ok) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
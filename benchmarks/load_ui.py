@@ -0,0 +1,298 @@
+"""
+Load generator for the Streamlit UI (app.py)
+
+Drives app.main through Streamlit's AppTest harness the way a browser session
+would: upload a main PDF, queue two inserts, merge, download the result, then
+upload a document to the splitter, split it every N pages and download the
+ZIP. Every script run is timed.
+
+All sessions of a level run as threads of one process, as they would inside
+one Streamlit server: they share its job manager, memory budget, document
+cache and blob store, and script runs overlap freely. Only what belongs to a
+session is kept apart: each has its own AppTest, with its own session state,
+widgets and uploads. AppTest would also install a fresh runtime for every
+script run and remove it afterwards, pulling it out from under overlapping
+runs, so the harness gives all sessions one shared runtime, as a server has.
+
+Each concurrency level runs in a fresh process, so its peak RSS belongs to
+that level alone. The report has rerun latency percentiles, completed
+sessions per second and memory per session (peak RSS above the process after
+a warm-up script, divided by the sessions), and marks the saturation point:
+the first level where throughput stops growing by --saturation (default 10%)
+while p95 latency keeps rising.
+
+Running jobs are polled with full reruns every --poll seconds; a browser
+reruns only the job's progress fragment, so polling reruns here are an upper
+bound on that cost. Every session uploads its own documents and the result
+cache is off, so no session is served another one's work.
+
+    python benchmarks/load_ui.py                               # sweep 1,2,4,8,16 sessions
+    python benchmarks/load_ui.py --sessions 1,4,16,32 --pages 200 --image-kb 16
+    python benchmarks/load_ui.py --sessions 8 --rounds 3       # one level, 3 scripts per session
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_large import peak_rss  # noqa: E402
+
+MB = 1024 * 1024
+# Seconds a single script run may take before the session counts as failed
+RERUN_TIMEOUT = 120
+# Seconds a merge or split job may run before the session counts as failed
+JOB_TIMEOUT = 600
+STEPS = ('load', 'upload', 'queue', 'merge', 'poll', 'download', 'split')
+
+
+class ScriptedSession:
+    """One browser session working through merge and split in the app"""
+
+    def __init__(self, seed: int, pages: int, image_kb: int, poll: float):
+        from benchmarks.corpus import CorpusSpec, generate_pdf
+
+        spec = dict(pages=pages, image_bytes=image_kb * 1024)
+        self.main_pdf = generate_pdf(CorpusSpec(seed=seed * 3, **spec))
+        self.inserts = [generate_pdf(CorpusSpec(seed=seed * 3 + i, **dict(spec, pages=max(pages // 10, 1))))
+                        for i in (1, 2)]
+        self.seed = seed
+        self.pages = pages
+        self.poll = poll
+        self.reruns: List[Dict] = []
+        self.downloaded = 0
+
+    def run(self, step: str, action=None):
+        """Apply a widget action and time the script run it triggers"""
+        start = time.perf_counter()
+        if action is None:
+            self.at.run(timeout=RERUN_TIMEOUT)
+        else:
+            action.run(timeout=RERUN_TIMEOUT)
+        self.reruns.append({'step': step, 'seconds': time.perf_counter() - start})
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].value}")
+
+    def wait_for(self, step: str, done):
+        """Rerun every poll interval until ``done()``, as the progress fragment would"""
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while not done():
+            if self.at.error:
+                raise RuntimeError(f"{step}: {self.at.error[0].value}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{step}: no result after {JOB_TIMEOUT}s")
+            time.sleep(self.poll)
+            self.run('poll')
+
+    def button(self, label: str):
+        return next(button for button in self.at.button if button.label == label)
+
+    def script(self):
+        from streamlit.testing.v1 import AppTest
+        from pdf_blobs import blob_store
+        from pdf_jobs import job_manager
+        from pdf_manager import download_data
+
+        self.at = AppTest.from_file(str(ROOT / 'app.py'), default_timeout=RERUN_TIMEOUT)
+        self.run('load')
+
+        # Merge: main document, two inserts queued in the middle and at the end
+        self.run('upload', self.at.file_uploader(key='main_pdf_upload').set_value(
+            (f"main_{self.seed}.pdf", self.main_pdf, 'application/pdf')))
+        names = [f"insert_{self.seed}_{i}.pdf" for i in range(len(self.inserts))]
+        self.run('upload', self.at.file_uploader(key='insert_pdfs_upload').set_value(
+            [(name, data, 'application/pdf') for name, data in zip(names, self.inserts)]))
+        for name, position in zip(names, (self.pages // 2, self.pages)):
+            self.run('queue', self.at.number_input(key=f"pos_{name}").set_value(position))
+            self.run('queue', self.at.button(key=f"add_{name}").click())
+        self.run('merge', self.button("🔗 Start Merge").click())
+        self.wait_for('merge', lambda: self.at.session_state.merged_pdf)
+        self.download(download_data(blob_store.get(self.at.session_state.merged_pdf)))
+
+        # Split the main document with the default pages per file into a ZIP
+        self.run('upload', self.at.file_uploader(key='split_pdf_upload').set_value(
+            (f"split_{self.seed}.pdf", self.main_pdf, 'application/pdf')))
+        self.run('split', self.at.radio(key='split_mode').set_value("Every N Pages"))
+        self.run('split', self.button("✂️ Split PDF").click())
+        split_job = lambda: job_manager.get(self.at.session_state.jobs.get('split'))
+        self.wait_for('split', lambda: not split_job().active)
+        if split_job().error:
+            raise RuntimeError(f"split: {split_job().error}")
+        result = split_job().result
+        # A split into one file offers that file instead of a ZIP
+        self.download(download_data(next(iter(result.values())) if isinstance(result, dict) else result[0]))
+
+    def download(self, data):
+        """Fetch a result the way its download button serves it"""
+        start = time.perf_counter()
+        self.downloaded += len(data() if callable(data) else data)
+        self.reruns.append({'step': 'download', 'seconds': time.perf_counter() - start})
+
+
+def share_runtime():
+    """Point Streamlit at one runtime for every session, as in a server
+
+    Streamlit only reads the runtime through Runtime.instance() and
+    Runtime.exists(), so the per-run mocks AppTest installs and removes are
+    never looked at.
+    """
+    from unittest.mock import MagicMock
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.bidi_component_registry = BidiComponentManager()
+    runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+def run_level(sessions: int, rounds: int, pages: int, image_kb: int, poll: float) -> Dict:
+    """Run ``sessions`` concurrent sessions ``rounds`` times each; called in a child process"""
+    from pdf_results import result_cache
+
+    result_cache.max_bytes = 0
+    share_runtime()
+    # One small script first, so imports and worker pools belong to the idle process
+    ScriptedSession(-1, 2, 0, poll).script()
+    idle_rss = current_rss()
+
+    scripted = [[ScriptedSession(i * rounds + r, pages, image_kb, poll) for r in range(rounds)]
+                for i in range(sessions)]
+    failures = []
+
+    def client(queue: List[ScriptedSession]):
+        for session in queue:
+            try:
+                session.script()
+            except Exception as e:
+                failures.append(str(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(queue,)) for queue in scripted]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    done = [session for queue in scripted for session in queue]
+    return {
+        'sessions': sessions,
+        'scripts': len(done),
+        'failures': failures,
+        'seconds': elapsed,
+        'reruns': [rerun for session in done for rerun in session.reruns],
+        'downloaded_bytes': sum(session.downloaded for session in done),
+        'idle_rss': idle_rss,
+        'peak_rss': peak_rss(),
+    }
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def measure(sessions: int, args) -> Dict:
+    env = dict(os.environ, DOCSUITE_RESULT_CACHE_MB='0')
+    command = [sys.executable, __file__, '--child', str(sessions), '--rounds', str(args.rounds),
+               '--pages', str(args.pages), '--image-kb', str(args.image_kb), '--poll', str(args.poll)]
+    output = subprocess.run(command, cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def summarize(level: Dict) -> Dict:
+    latencies = [rerun['seconds'] for rerun in level['reruns'] if rerun['step'] != 'download']
+    completed = level['scripts'] - len(level['failures'])
+    return {
+        'sessions': level['sessions'],
+        'ok': completed,
+        'failed': len(level['failures']),
+        'reruns': len(latencies),
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'sessions_per_second': completed / level['seconds'],
+        'reruns_per_second': len(latencies) / level['seconds'],
+        'mb_per_session': max(level['peak_rss'] - level['idle_rss'], 0) / level['sessions'] / MB,
+        'peak_mb': level['peak_rss'] / MB,
+    }
+
+
+def saturation_point(rows: List[Dict], threshold: float):
+    """First level whose throughput gain over the previous one falls below ``threshold`` as p95 rises"""
+    for previous, row in zip(rows, rows[1:]):
+        if (row['sessions_per_second'] < previous['sessions_per_second'] * (1 + threshold)
+                and row['p95'] > previous['p95']):
+            return previous['sessions']
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', default='1,2,4,8,16', help='Comma-separated concurrency levels to sweep')
+    parser.add_argument('--rounds', type=int, default=1, help='Scripts each session runs back to back')
+    parser.add_argument('--pages', type=int, default=50, help='Pages per main document')
+    parser.add_argument('--image-kb', type=int, default=0, help='Embedded image size per page')
+    parser.add_argument('--poll', type=float, default=0.25, help='Seconds between reruns while a job runs')
+    parser.add_argument('--saturation', type=float, default=0.10,
+                        help='Throughput gain below which the next level counts as saturated')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_level(args.child, args.rounds, args.pages, args.image_kb, args.poll)))
+        return 0
+
+    levels = [int(value) for value in args.sessions.split(',') if value.strip()]
+    print(f"{args.pages}-page documents, {args.rounds} script(s) per session, steps: {', '.join(STEPS)}")
+    print(f"{'sessions':>8} {'ok':>4} {'failed':>6} {'reruns':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'sessions/s':>11} {'reruns/s':>9} {'MB/session':>11} {'peak MB':>8}")
+    rows = []
+    failures = []
+    for sessions in levels:
+        level = measure(sessions, args)
+        row = summarize(level)
+        rows.append(row)
+        failures.extend(level['failures'])
+        print(f"{row['sessions']:>8} {row['ok']:>4} {row['failed']:>6} {row['reruns']:>7} {row['p50']:>7.3f} "
+              f"{row['p95']:>7.3f} {row['p99']:>7.3f} {row['sessions_per_second']:>11.2f} "
+              f"{row['reruns_per_second']:>9.1f} {row['mb_per_session']:>11.1f} {row['peak_mb']:>8.0f}",
+              flush=True)
+
+    if len(rows) > 1:
+        saturated = saturation_point(rows, args.saturation)
+        if saturated:
+            print(f"\nSaturation at {saturated} concurrent sessions: more sessions add latency, not throughput")
+        else:
+            print(f"\nNo saturation up to {rows[-1]['sessions']} sessions")
+
+    for failure in sorted(set(failures)):
+        print(f"  failed: {failure}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+DocSuite benchmark suite
+
+Times merge_pdfs, remove_pages, split_pdf and parse_page_string over a
+deterministic synthetic corpus (see corpus.py) at several page counts and
+records peak traced memory for each case. Results are written as JSON and
+compared against a stored baseline; any case that got slower or hungrier
+than the tolerance allows is reported and the run exits with status 1.
+
+Times are medians over --repeat runs, and even those drift: on a shared
+machine a whole run can be a third slower than the one before it. So a
+reference workload that uses no DocSuite or pypdf code is timed before each
+document's cases, and a case's baseline time is scaled by how much slower
+the reference ran than it did for the baseline. A case that still looks
+slower is timed again (with a fresh reference) RECHECKS times and only
+reported if it stays slower every time. For the same reason
+--update-baseline times every gated case RECHECKS more times and stores the
+median, so one lucky fast run doesn't set the bar.
+Only cases whose baseline takes at least MIN_GATED_SECONDS are held to the
+time tolerance: shorter runs vary by tens of percent between identical
+back-to-back runs. Memory is checked for every case.
+
+    python benchmarks/run.py                               # 10-1000 pages, compare
+    python benchmarks/run.py --scales 10,1000,5000,20000   # up to 20k pages
+    python benchmarks/run.py --update-baseline             # accept current numbers
+
+Baselines are machine specific: refresh them on the machine that runs the
+comparison.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pypdf  # noqa: E402
+from benchmarks.corpus import CorpusSpec, generate_pdf  # noqa: E402
+from pdf_cache import document_cache  # noqa: E402
+from pdf_engine import PDFProcessor, parse_page_string  # noqa: E402
+from pdf_results import result_cache  # noqa: E402
+
+# Time the operations themselves, never a result cache lookup
+result_cache.max_bytes = 0
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+DEFAULT_OUTPUT = BENCH_DIR / 'results.json'
+DEFAULT_SCALES = '10,100,1000'
+
+# Corpus variants run at every scale; image-heavy documents stop at
+# IMAGE_MAX_PAGES to keep the corpus in memory
+VARIANTS = {
+    'plain': {},
+    'objstm': {'object_streams': True},
+    'fonts': {'shared_fonts': False},
+    'images': {'image_bytes': 16 * 1024},
+}
+IMAGE_MAX_PAGES = 1000
+
+# Cases faster than this in the baseline are too noisy to gate on time
+MIN_GATED_SECONDS = 0.05
+# Objects the reference workload builds and serializes (about 0.1 s)
+REFERENCE_OBJECTS = 10000
+# Slowdowns below this many seconds are treated as timer noise
+MIN_TIME_DELTA = 0.02
+# Extra timings a slowdown must survive before it is reported
+RECHECKS = 2
+
+
+def build_cases(pages: int, pdf_bytes: bytes) -> Dict[str, Callable[[], object]]:
+    """Operations to time against one corpus document"""
+    insert_bytes = generate_pdf(CorpusSpec(pages=max(pages // 10, 1), seed=1))
+    inserts = [(insert_bytes, 0), (insert_bytes, pages // 2), (insert_bytes, pages)]
+    every_tenth = list(range(0, pages, 10))
+    chunk = max(pages // 10, 1)
+    page_string = ','.join(f"{start + 1}-{min(start + chunk, pages)}" for start in range(0, pages, chunk))
+
+    return {
+        'info': lambda: PDFProcessor.get_pdf_info(pdf_bytes),
+        'merge': lambda: PDFProcessor.merge_pdfs(pdf_bytes, inserts),
+        'merge_linearized': lambda: PDFProcessor.merge_pdfs(pdf_bytes, inserts, linearize=True),
+        'remove': lambda: PDFProcessor.remove_pages(pdf_bytes, every_tenth),
+        'remove_compact': lambda: PDFProcessor.remove_pages(pdf_bytes, every_tenth, compact=True),
+        'split': lambda: PDFProcessor.split_pdf(pdf_bytes, 'every_n', chunk, workers=1),
+        'parse_page_string': lambda: parse_page_string(page_string, pages),
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict:
+    """Median wall time over ``repeat`` cold runs, plus peak memory of one traced run"""
+    times = []
+    for _ in range(repeat):
+        document_cache.clear()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # Tracing slows pypdf down a lot, so memory gets its own run
+    document_cache.clear()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    document_cache.clear()
+    return {'seconds': round(statistics.median(times), 6), 'peak_bytes': peak}
+
+
+def reference_workload():
+    """Pure-Python object building and serializing, like pypdf's work but none of its code"""
+    objects = {}
+    for idnum in range(REFERENCE_OBJECTS):
+        objects[idnum] = {'/Type': '/Page', '/Parent': (1, 0), '/Contents': [idnum, idnum + 1],
+                          '/Font': f"/F{idnum % 50}"}
+    lines = []
+    for idnum, obj in objects.items():
+        body = ' '.join(f"{key} {value}" for key, value in sorted(obj.items()))
+        lines.append(f"{idnum} 0 obj << {body} >> endobj".encode())
+    return sorted(b'\n'.join(lines).split())
+
+
+def time_reference(repeat: int) -> float:
+    """Median time of the reference workload: how fast the machine is right now"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        reference_workload()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_suite(scales: List[int], variants: List[str], repeat: int, references: List[float]) -> Dict[str, Dict]:
+    """Run every case and return results keyed by ``op/variant/pages``
+
+    Appends a reference timing per document to ``references``.
+    """
+    results = {}
+    for pages in scales:
+        for variant in variants:
+            if variant == 'images' and pages > IMAGE_MAX_PAGES:
+                continue
+            spec = CorpusSpec(pages=pages, **VARIANTS[variant])
+            pdf_bytes = generate_pdf(spec)
+            references.append(time_reference(repeat))
+            for op, func in build_cases(pages, pdf_bytes).items():
+                key = f"{op}/{variant}/{pages}"
+                result = measure(func, repeat)
+                result.update(op=op, variant=variant, pages=pages, input_bytes=len(pdf_bytes))
+                results[key] = result
+                print(f"{key:<32} {result['seconds']:>9.4f}s {result['peak_bytes'] / 1024 / 1024:>9.2f} MB",
+                      flush=True)
+    return results
+
+
+def machine_drift(reference: float, base_reference: Optional[float]) -> float:
+    """How much slower the reference workload ran than for the baseline, at least 1"""
+    return max(reference / base_reference, 1.0) if base_reference else 1.0
+
+
+def slowdown(result: Dict, base: Dict, time_tolerance: float, drift: float) -> float:
+    """How much slower ``result`` is than ``base`` beyond ``drift``, or 0 within tolerance or noise"""
+    seconds, expected = result['seconds'], base['seconds'] * drift
+    if (base['seconds'] >= MIN_GATED_SECONDS and seconds > expected * (1 + time_tolerance)
+            and seconds - expected > MIN_TIME_DELTA):
+        return seconds / expected - 1
+    return 0
+
+
+def recheck(key: str, repeat: int) -> Tuple[Dict, float]:
+    """Time one case again, with a reference timing taken just before it"""
+    op, variant, pages = key.split('/')
+    pdf_bytes = generate_pdf(CorpusSpec(pages=int(pages), **VARIANTS[variant]))
+    reference = time_reference(repeat)
+    return measure(build_cases(int(pages), pdf_bytes)[op], repeat), reference
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], time_tolerance: float,
+            memory_tolerance: float, drift: float, base_reference: Optional[float],
+            retime: Callable[[str], Tuple[Dict, float]]) -> List[str]:
+    """Describe every case that regressed against the baseline"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        slower = slowdown(result, base, time_tolerance, drift)
+        for _ in range(RECHECKS):
+            if not slower:
+                break
+            again, reference = retime(key)
+            slower = min(slower, slowdown(again, base, time_tolerance, machine_drift(reference, base_reference)))
+        if slower:
+            regressions.append(f"{key}: {base['seconds']:.4f}s -> {result['seconds']:.4f}s "
+                               f"(+{slower * 100:.0f}% or more beyond drift in {RECHECKS + 1} timings)")
+        peak, base_peak = result['peak_bytes'], base['peak_bytes']
+        if base_peak and peak > base_peak * (1 + memory_tolerance):
+            regressions.append(f"{key}: peak {base_peak / 1024 / 1024:.2f} MB -> {peak / 1024 / 1024:.2f} MB "
+                               f"(+{(peak / base_peak - 1) * 100:.0f}%)")
+    return regressions
+
+
+def environment() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'pypdf': pypdf.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help='Comma-separated page counts')
+    parser.add_argument('--variants', default=','.join(VARIANTS), help='Comma-separated corpus variants')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed runs per case (the median is kept)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='Where to write results JSON')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='Baseline JSON to compare with')
+    parser.add_argument('--update-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.35,
+                        help='Allowed slowdown once machine drift is allowed for (0.35 = 35%%)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help='Allowed peak memory growth')
+    args = parser.parse_args()
+
+    variants = [variant.strip() for variant in args.variants.split(',') if variant.strip()]
+    unknown = [variant for variant in variants if variant not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(unknown)}")
+    scales = [int(scale) for scale in args.scales.split(',')]
+
+    references = []
+    results = run_suite(scales, variants, args.repeat, references)
+    report = {'created': time.time(), 'environment': environment(), 'results': results,
+              'reference_seconds': round(statistics.median(references), 6) if references else None}
+    args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        for key, result in results.items():
+            if result['seconds'] >= MIN_GATED_SECONDS:
+                timings = [result['seconds']] + [recheck(key, args.repeat)[0]['seconds'] for _ in range(RECHECKS)]
+                result['seconds'] = round(statistics.median(timings), 6)
+        args.baseline.write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get('environment') != report['environment']:
+        print("Warning: baseline was recorded in a different environment", file=sys.stderr)
+
+    baseline_results = baseline.get('results', {})
+    compared = len(set(results) & set(baseline_results))
+    timed = sum(1 for key in results if baseline_results.get(key, {}).get('seconds', 0) >= MIN_GATED_SECONDS)
+    missing = sorted(set(results) - set(baseline_results))
+    if missing:
+        print(f"Warning: {len(missing)} case(s) not in the baseline and not compared, e.g. {missing[0]}; "
+              "run with --update-baseline", file=sys.stderr)
+    base_reference = baseline.get('reference_seconds')
+    drift = machine_drift(report['reference_seconds'], base_reference)
+    if not base_reference:
+        print("Warning: baseline has no reference timing, so machine drift isn't allowed for", file=sys.stderr)
+    elif drift > 1:
+        print(f"Reference workload ran {drift:.2f}x its baseline time; "
+              "baseline times are scaled by that", file=sys.stderr)
+    regressions = compare(results, baseline_results, args.time_tolerance, args.memory_tolerance, drift,
+                          base_reference, lambda key: recheck(key, args.repeat))
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION(S) against {args.baseline}:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+
+    print(f"No regressions in {compared} cases compared with {args.baseline} "
+          f"({timed} long enough to compare times, all for memory)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
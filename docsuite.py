@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+DocSuite batch CLI
+
+Runs merge, remove and split without Streamlit, either as a single job or as
+a batch manifest of jobs spread over a process pool.
+
+    python docsuite.py merge main.pdf --insert cover.pdf:0 --insert appendix.pdf:12 -o out.pdf [--linearize]
+    python docsuite.py remove in.pdf --pages 1,4-6 [--compact] -o out.pdf
+    python docsuite.py split in.pdf --mode every_n --pages-per-split 10 -o parts.zip
+    python docsuite.py split in.pdf --mode ranges --ranges 1-3,4-10,11- -o parts/
+    python docsuite.py split in.pdf --mode max_size --max-mb 10 -o parts.zip
+    python docsuite.py batch jobs.json [--workers 4]
+
+A JSON manifest is a list of job objects (or {"jobs": [...]}); a CSV manifest
+has one job per row. Job fields:
+
+    op               merge | remove | split
+    input            source PDF path
+    output           output path (.pdf, or .zip / directory for split)
+    inserts          merge only: "path:position;path:position" or a list of
+                     {"path": ..., "position": ...}
+    pages            remove only: page selection such as "2,4,10-", "-1" or "odd"
+    compact          remove only: rewrite instead of incremental update
+    mode             split only: individual | every_n | ranges | max_size
+    pages_per_split  split only (default 1)
+    ranges           split only, mode ranges: one output per entry, e.g. "1-3,4-"
+    max_mb           split only, mode max_size: size limit per output file
+    linearize        write linearized ("fast web view") PDFs
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pdf_engine import PDFProcessingError, PDFProcessor, load_document
+from pdf_selection import PageSelection
+from pdf_storage import FileSource
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+def parse_inserts(value) -> List[Dict]:
+    """Normalize merge inserts from CLI/CSV strings or manifest lists"""
+    if isinstance(value, list):
+        return [{'path': item['path'], 'position': int(item['position'])} for item in value]
+
+    inserts = []
+    for part in (value or '').split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        path, _, position = part.rpartition(':')
+        if not path:
+            raise ValueError(f"Insert '{part}' must look like path:position")
+        inserts.append({'path': path, 'position': int(position)})
+    return inserts
+
+
+def load_manifest(path: Path) -> List[Dict]:
+    """Read jobs from a JSON or CSV manifest"""
+    if path.suffix.lower() == '.csv':
+        with open(path, newline='') as f:
+            return [{key: value for key, value in row.items() if value not in (None, '')}
+                    for row in csv.DictReader(f)]
+
+    with open(path) as f:
+        data = json.load(f)
+    return data['jobs'] if isinstance(data, dict) else data
+
+
+def _move_result(result, output: Path):
+    """Place an engine result at the requested output path"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(result, FileSource):
+        shutil.move(str(result.path), output)
+    else:
+        output.write_bytes(result)
+
+
+def run_job(job: Dict, split_workers: Optional[int] = 1) -> Dict:
+    """Run one job and return its timing report
+
+    ``split_workers`` is the split process pool size; batches keep it at 1
+    because jobs already run in parallel.
+    """
+    op = job['op']
+    source = FileSource(job['input'])
+    output = Path(job['output'])
+    input_bytes = source.size
+    files = 1
+    linearize = str(job.get('linearize', '')).lower() in TRUE_VALUES
+
+    start = time.perf_counter()
+    pages = load_document(source).page_count
+
+    if op == 'merge':
+        inserts = [(FileSource(item['path']), item['position']) for item in parse_inserts(job.get('inserts'))]
+        input_bytes += sum(insert.size for insert, _ in inserts)
+        pages += sum(load_document(insert).page_count for insert, _ in inserts)
+        _move_result(PDFProcessor.merge_pdfs(source, inserts, to_file=True, linearize=linearize), output)
+
+    elif op == 'remove':
+        remove = PageSelection.parse(str(job['pages']), pages)
+        compact = str(job.get('compact', '')).lower() in TRUE_VALUES
+        _move_result(PDFProcessor.remove_pages(source, remove, compact=compact, to_file=True,
+                                                  linearize=linearize), output)
+
+    elif op == 'split':
+        mode = job.get('mode', 'individual')
+        pages_per_split = int(job.get('pages_per_split', 1))
+        page_ranges = job.get('ranges')
+        max_mb = float(job['max_mb']) if job.get('max_mb') else None
+        if output.suffix.lower() == '.zip':
+            archive, files = PDFProcessor.split_pdf_to_zip(source, mode, pages_per_split, workers=split_workers,
+                                                           to_file=True, page_ranges=page_ranges, max_mb=max_mb,
+                                                           linearize=linearize)
+            _move_result(archive, output)
+        else:
+            output.mkdir(parents=True, exist_ok=True)
+            files = 0
+            for filename, data in PDFProcessor.iter_split_pdf(source, mode, pages_per_split, workers=split_workers,
+                                                              page_ranges=page_ranges, max_mb=max_mb,
+                                                              linearize=linearize):
+                _move_result(data, output / filename)
+                files += 1
+
+    else:
+        raise ValueError(f"Unknown op '{op}'")
+
+    seconds = time.perf_counter() - start
+    return {
+        'op': op,
+        'input': job['input'],
+        'output': str(output),
+        'seconds': seconds,
+        'pages': pages,
+        'input_bytes': input_bytes,
+        'files': files,
+        'pages_per_second': pages / seconds if seconds else 0.0,
+        'mb_per_second': input_bytes / (1024 * 1024) / seconds if seconds else 0.0,
+    }
+
+
+def _run_job_safe(job: Dict, split_workers: Optional[int] = 1) -> Dict:
+    try:
+        return {'ok': True, **run_job(job, split_workers)}
+    except (PDFProcessingError, OSError, ValueError, KeyError) as e:
+        return {'ok': False, 'op': job.get('op'), 'input': job.get('input'), 'error': str(e)}
+
+
+def run_batch(jobs: List[Dict], workers: int) -> List[Dict]:
+    """Run jobs on a process pool, returning reports in manifest order"""
+    if len(jobs) == 1:
+        # A lone job gets the whole machine for its own split pool
+        return [_run_job_safe(jobs[0], split_workers=None)]
+    if workers <= 1:
+        return [_run_job_safe(job) for job in jobs]
+
+    reports = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_job_safe, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            reports[futures[future]] = future.result()
+    return reports
+
+
+def print_report(reports: List[Dict], wall_seconds: float):
+    """Print per-job timing and overall throughput"""
+    print(f"{'#':>3} {'op':<7} {'status':<6} {'seconds':>8} {'pages':>7} {'pages/s':>9} {'MB/s':>8}  input")
+    for i, report in enumerate(reports, 1):
+        if report['ok']:
+            print(f"{i:>3} {report['op']:<7} {'ok':<6} {report['seconds']:>8.2f} {report['pages']:>7} "
+                  f"{report['pages_per_second']:>9.1f} {report['mb_per_second']:>8.2f}  {report['input']}")
+        else:
+            print(f"{i:>3} {str(report['op']):<7} {'FAILED':<6} {'':>8} {'':>7} {'':>9} {'':>8}  "
+                  f"{report['input']}: {report['error']}")
+
+    done = [report for report in reports if report['ok']]
+    total_pages = sum(report['pages'] for report in done)
+    total_mb = sum(report['input_bytes'] for report in done) / (1024 * 1024)
+    print(f"\n{len(done)}/{len(reports)} jobs succeeded in {wall_seconds:.2f}s "
+          f"({total_pages / wall_seconds if wall_seconds else 0:.1f} pages/s, "
+          f"{total_mb / wall_seconds if wall_seconds else 0:.2f} MB/s)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='docsuite', description='DocSuite PDF tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    merge = sub.add_parser('merge', help='Insert PDFs into a main PDF')
+    merge.add_argument('input')
+    merge.add_argument('--insert', action='append', default=[], metavar='PATH:POSITION',
+                       help='PDF to insert after POSITION (0 = beginning); repeatable')
+    merge.add_argument('-o', '--output', required=True)
+
+    remove = sub.add_parser('remove', help='Remove pages from a PDF')
+    remove.add_argument('input')
+    remove.add_argument('--pages', required=True, help='Pages to remove, e.g. 2,4,10-12, 5-, -1, odd')
+    remove.add_argument('--compact', action='store_true', help='Rewrite instead of appending an update')
+    remove.add_argument('-o', '--output', required=True)
+
+    split = sub.add_parser('split', help='Split a PDF into several files')
+    split.add_argument('input')
+    split.add_argument('--mode', choices=['individual', 'every_n', 'ranges', 'max_size'], default='individual')
+    split.add_argument('--pages-per-split', type=int, default=1)
+    split.add_argument('--ranges', help='With --mode ranges: one output per entry, e.g. 1-3,4-10,11-')
+    split.add_argument('--max-mb', type=float, help='With --mode max_size: size limit per output file')
+    split.add_argument('-o', '--output', required=True, help='.zip file or output directory')
+
+    for command in (merge, remove, split):
+        command.add_argument('--linearize', action='store_true',
+                             help='Write linearized ("fast web view") PDFs that show page 1 while downloading')
+
+    batch = sub.add_parser('batch', help='Run a JSON/CSV manifest of jobs')
+    batch.add_argument('manifest', type=Path)
+    batch.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'batch':
+        jobs = load_manifest(args.manifest)
+        workers = args.workers
+    else:
+        job = {'op': args.command, 'input': args.input, 'output': args.output, 'linearize': str(args.linearize)}
+        if args.command == 'merge':
+            job['inserts'] = ';'.join(args.insert)
+        elif args.command == 'remove':
+            job.update(pages=args.pages, compact=str(args.compact))
+        else:
+            job.update(mode=args.mode, pages_per_split=args.pages_per_split, ranges=args.ranges, max_mb=args.max_mb)
+        jobs = [job]
+        workers = 1
+
+    start = time.perf_counter()
+    reports = run_batch(jobs, workers)
+    print_report(reports, time.perf_counter() - start)
+    return 0 if all(report['ok'] for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+DocSuite HTTP API
+
+ASGI service that runs beside the Streamlit UI and exposes the PDFProcessor
+operations to other services:
+
+    uvicorn pdf_api:app --port 8000        (or: python pdf_api.py --port 8000)
+
+    POST   /merge              main (file), insert (file, repeatable), positions ("0,12"), linearize
+    POST   /remove             file, pages ("2,4,10-"), compact ("true"), linearize
+    POST   /split              file, mode, pages_per_split, ranges, max_mb, linearize
+    GET    /jobs/{id}          status, page progress and queue position
+    GET    /jobs/{id}/result   output PDF (or ZIP for splits), streamed in chunks; honours Range
+    DELETE /jobs/{id}          cancel
+    GET    /health             scheduler, storage and result cache load
+
+Requests are multipart/form-data. Uploads are streamed to storage files and
+hashed as they arrive, so they are never held in memory whole. Operations are
+submitted to the shared job manager (with its admission control) and always
+write their results to disk. Operation POSTs answer 202 with URLs to poll.
+With linearize ("true") the PDFs are linearized, so a viewer reading the
+result by byte ranges shows page 1 before the whole file has arrived.
+"""
+
+import argparse
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse
+from starlette.routing import Route
+
+from pdf_engine import PDFProcessor
+from pdf_jobs import DONE, QUEUED, REJECTED, estimate_memory, estimate_pool_memory, job_manager, pool_workers
+from pdf_results import result_cache
+from pdf_selection import PageSelection, PageSelectionError
+from pdf_storage import FileSource, cleanup_expired, new_storage_path
+
+# Per uploaded file, matching the UI's server.maxUploadSize in .streamlit/config.toml
+MAX_UPLOAD_BYTES = int(os.environ.get('DOCSUITE_API_MAX_UPLOAD_MB', 2048)) * 1024 * 1024
+# Text fields are small; anything larger is a malformed request
+MAX_FIELD_BYTES = 64 * 1024
+
+SPLIT_MODES = ('individual', 'every_n', 'ranges', 'max_size')
+
+# Job ID -> (operation, download filename) for jobs submitted through the API
+_api_jobs: Dict[str, Tuple[str, str]] = {}
+
+
+class UploadError(Exception):
+    """Raised for a request body that cannot be accepted"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class MultipartUpload:
+    """Streaming multipart/form-data reader writing file parts to storage files"""
+
+    def __init__(self, content_type: str):
+        mime, options = parse_options_header(content_type)
+        if mime != b'multipart/form-data' or b'boundary' not in options:
+            raise UploadError("Expected a multipart/form-data body", 415)
+
+        self.fields: Dict[str, List[str]] = {}
+        self.files: Dict[str, List[Tuple[str, FileSource]]] = {}
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b''
+        self._header_value = b''
+        self._name = ''
+        self._filename: Optional[str] = None
+        self._file = None
+        self._hash = None
+        self._size = 0
+        self._field = bytearray()
+        self._open_paths: List[str] = []
+        self._parser = MultipartParser(options[b'boundary'], {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+        })
+
+    async def read(self, request: Request):
+        """Consume the request body; blocking writes run off the event loop"""
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await anyio.to_thread.run_sync(self._parser.write, chunk)
+            self._parser.finalize()
+        except Exception:
+            self.discard()
+            raise
+
+    def field(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        values = self.fields.get(name)
+        return values[0] if values else default
+
+    def discard(self):
+        """Delete every file written for this request"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for path in self._open_paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._open_paths = []
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b''
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        self._name = options.get(b'name', b'').decode('utf-8', 'replace')
+        filename = options.get(b'filename')
+        self._filename = filename.decode('utf-8', 'replace') if filename is not None else None
+        self._size = 0
+        if self._filename is not None:
+            path = new_storage_path()
+            self._open_paths.append(str(path))
+            self._file = open(path, 'wb')
+            self._hash = hashlib.sha256()
+        else:
+            self._field = bytearray()
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        self._size += len(chunk)
+        if self._file is not None:
+            if self._size > MAX_UPLOAD_BYTES:
+                raise UploadError(f"'{self._filename}' exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB", 413)
+            self._file.write(chunk)
+            self._hash.update(chunk)
+        else:
+            if self._size > MAX_FIELD_BYTES:
+                raise UploadError(f"Field '{self._name}' is too large", 413)
+            self._field += chunk
+
+    def _on_part_end(self):
+        if self._file is not None:
+            self._file.close()
+            source = FileSource(self._file.name, self._hash.hexdigest())
+            self._file = None
+            self.files.setdefault(self._name, []).append((self._filename, source))
+        else:
+            self.fields.setdefault(self._name, []).append(self._field.decode('utf-8', 'replace'))
+
+
+async def read_upload(request: Request) -> MultipartUpload:
+    cleanup_expired()
+    upload = request.state.upload = MultipartUpload(request.headers.get('content-type', ''))
+    await upload.read(request)
+    return upload
+
+
+async def _pdf_files(upload: MultipartUpload, name: str) -> List[Tuple[str, FileSource, Dict]]:
+    """Validated (filename, source, info) for every file uploaded as ``name``"""
+    return await anyio.to_thread.run_sync(_validate_files, upload, name)
+
+
+def _validate_files(upload: MultipartUpload, name: str) -> List[Tuple[str, FileSource, Dict]]:
+    files = []
+    for filename, source in upload.files.get(name, []):
+        if not PDFProcessor.validate_pdf(source):
+            raise UploadError(f"'{filename}' is not a valid PDF")
+        files.append((filename, source, PDFProcessor.get_pdf_info(source)))
+    if not files:
+        raise UploadError(f"Missing file field '{name}'")
+    return files
+
+
+def _submit(op: str, filename: str, func, *args, input_bytes: int, pages: int,
+            memory_estimate: Optional[int] = None, **kwargs) -> JSONResponse:
+    if memory_estimate is None:
+        memory_estimate = estimate_memory(input_bytes, pages)
+    job = job_manager.submit(f"API {op}", func, *args, memory_estimate=memory_estimate, **kwargs)
+    _forget_pruned_jobs()
+    _api_jobs[job.id] = (op, filename)
+    # Rejected jobs could never fit the server's memory budget
+    return JSONResponse(_job_status(job), status_code=413 if job.status == REJECTED else 202)
+
+
+def _forget_pruned_jobs():
+    """Drop API bookkeeping for jobs the job manager has pruned"""
+    for job_id in [job_id for job_id in _api_jobs if job_manager.get(job_id) is None]:
+        del _api_jobs[job_id]
+
+
+def _job_status(job) -> Dict:
+    op, filename = _api_jobs.get(job.id, (None, None))
+    status = {
+        'id': job.id,
+        'op': op,
+        'status': job.status,
+        'done': job.done,
+        'total': job.total,
+        'queue_position': job_manager.position(job) if job.status == QUEUED else None,
+        'error': job.error,
+        'status_url': f"/jobs/{job.id}",
+    }
+    if job.status == DONE:
+        status['result_url'] = f"/jobs/{job.id}/result"
+        status['filename'] = filename
+        if isinstance(job.result, tuple):
+            status['files'] = job.result[1]
+    return status
+
+
+def _flag(upload, name: str) -> bool:
+    return (upload.field(name) or '').lower() in ('1', 'true', 'yes')
+
+
+def _stem(filename: str) -> str:
+    return os.path.splitext(os.path.basename(filename or 'document.pdf'))[0]
+
+
+async def merge(request: Request):
+    upload = await read_upload(request)
+    main_name, main, main_info = (await _pdf_files(upload, 'main'))[0]
+    inserts = await _pdf_files(upload, 'insert')
+    try:
+        positions = [int(value) for value in (upload.field('positions') or '').split(',') if value.strip()]
+    except ValueError:
+        raise UploadError("positions must be comma-separated page numbers")
+    if len(positions) != len(inserts):
+        raise UploadError(f"Got {len(inserts)} insert files but {len(positions)} positions")
+
+    pages = main_info['page_count'] + sum(info['page_count'] for _, _, info in inserts)
+    input_bytes = len(main) + sum(len(source) for _, source, _ in inserts)
+    return _submit('merge', f"{_stem(main_name)}_merged.pdf", PDFProcessor.merge_pdfs,
+                   main, [(source, position) for (_, source, _), position in zip(inserts, positions)],
+                   to_file=True, linearize=_flag(upload, 'linearize'), input_bytes=input_bytes, pages=pages)
+
+
+async def remove(request: Request):
+    upload = await read_upload(request)
+    filename, source, info = (await _pdf_files(upload, 'file'))[0]
+    pages = upload.field('pages')
+    if not pages:
+        raise UploadError("Missing field 'pages'")
+    selection = PageSelection.parse(pages, info['page_count'])
+    if len(selection) >= info['page_count']:
+        raise UploadError("Cannot remove all pages")
+    return _submit('remove', f"{_stem(filename)}_removed.pdf", PDFProcessor.remove_pages,
+                   source, selection, compact=_flag(upload, 'compact'), to_file=True,
+                   linearize=_flag(upload, 'linearize'),
+                   input_bytes=len(source), pages=info['page_count'])
+
+
+async def split(request: Request):
+    upload = await read_upload(request)
+    filename, source, info = (await _pdf_files(upload, 'file'))[0]
+    mode = upload.field('mode', 'individual')
+    if mode not in SPLIT_MODES:
+        raise UploadError(f"mode must be one of {', '.join(SPLIT_MODES)}")
+    try:
+        pages_per_split = int(upload.field('pages_per_split', '1'))
+        max_mb = float(upload.field('max_mb')) if upload.field('max_mb') else None
+    except ValueError:
+        raise UploadError("pages_per_split and max_mb must be numbers")
+    if pages_per_split < 1:
+        raise UploadError("pages_per_split must be at least 1")
+    if max_mb is not None and max_mb <= 0:
+        raise UploadError("max_mb must be positive")
+    workers = pool_workers(len(source), info['page_count'])
+    return _submit('split', f"{_stem(filename)}_split.zip", PDFProcessor.split_pdf_to_zip,
+                   source, mode, pages_per_split, workers=workers, to_file=True,
+                   page_ranges=upload.field('ranges'), max_mb=max_mb, linearize=_flag(upload, 'linearize'),
+                   input_bytes=len(source), pages=info['page_count'],
+                   memory_estimate=estimate_pool_memory(len(source), info['page_count'], workers))
+
+
+def _api_job(request: Request):
+    job = job_manager.get(request.path_params['job_id'])
+    if job is None or job.id not in _api_jobs:
+        raise UploadError("Unknown or expired job", 404)
+    return job
+
+
+async def job_status(request: Request):
+    return JSONResponse(_job_status(_api_job(request)))
+
+
+async def job_result(request: Request):
+    job = _api_job(request)
+    if job.status != DONE:
+        return JSONResponse(_job_status(job), status_code=409)
+    result = job.result[0] if isinstance(job.result, tuple) else job.result
+    op, filename = _api_jobs[job.id]
+    result.touch()
+    return FileResponse(result.path, filename=filename,
+                        media_type='application/zip' if op == 'split' else 'application/pdf')
+
+
+async def cancel_job(request: Request):
+    job = _api_job(request)
+    job.cancel()
+    return JSONResponse(_job_status(job))
+
+
+async def health(request: Request):
+    _forget_pruned_jobs()
+    return JSONResponse({'status': 'ok', 'jobs': job_manager.stats(), 'results': result_cache.stats()})
+
+
+async def upload_error(request: Request, exc: Exception):
+    # Nothing was submitted, so the request's uploads are not needed
+    upload = getattr(request.state, 'upload', None)
+    if upload is not None:
+        upload.discard()
+    status = getattr(exc, 'status', 400)
+    return JSONResponse({'error': str(exc)}, status_code=status)
+
+
+app = Starlette(
+    routes=[
+        Route('/merge', merge, methods=['POST']),
+        Route('/remove', remove, methods=['POST']),
+        Route('/split', split, methods=['POST']),
+        Route('/jobs/{job_id}', job_status, methods=['GET']),
+        Route('/jobs/{job_id}', cancel_job, methods=['DELETE']),
+        Route('/jobs/{job_id}/result', job_result, methods=['GET']),
+        Route('/health', health, methods=['GET']),
+    ],
+    exception_handlers={UploadError: upload_error, PageSelectionError: upload_error},
+)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="DocSuite HTTP API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Content-addressed store for the documents sessions hold on to
+
+Session state keeps digests instead of bytes. Each holder (a session slot
+such as the merge tool's main PDF, one merge queue item, a merge result)
+references exactly one blob. Queuing the same insert three times stores it
+once, and a blob is dropped as soon as its last holder releases it.
+
+In-memory blobs past the memory budget are spilled to disk, least recently
+used first. Holders are named "<session id>/<slot>", so everything a session
+holds is released when it stops rerunning for SESSION_TTL_SECONDS.
+"""
+
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from pdf_storage import CLEANUP_INTERVAL_SECONDS, STORAGE_DIR, FileSource, Source, source_digest
+
+BLOB_DIR = STORAGE_DIR / 'blobs'
+
+# Bytes of in-memory blobs across all sessions before spilling to disk
+DEFAULT_MEMORY_BUDGET = int(os.environ.get('DOCSUITE_BLOB_MEMORY_MB', 256)) * 1024 * 1024
+# Sessions that have not rerun for this long release everything they hold
+SESSION_TTL_SECONDS = 60 * 60
+
+
+class Blob:
+    """One stored document and the holders referencing it"""
+
+    def __init__(self, digest: str, source: Source):
+        self.digest = digest
+        self.source = source
+        self.size = len(source)
+        self.holders: Set[str] = set()
+
+    @property
+    def on_disk(self) -> bool:
+        return isinstance(self.source, FileSource)
+
+
+class BlobStore:
+    """Refcounted documents keyed by content hash, shared by all sessions"""
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.spills = 0
+        self._blobs: "OrderedDict[str, Blob]" = OrderedDict()
+        self._holders: Dict[str, str] = {}
+        self._sessions: Dict[str, float] = {}
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+
+    def hold(self, holder: str, source: Source, digest: Optional[str] = None) -> str:
+        """Store a document for ``holder`` and return its digest
+
+        Whatever the holder referenced before is released. Pass ``digest``
+        when the source's hash is already known to skip rehashing it.
+        """
+        digest = digest or source_digest(source)
+        with self._lock:
+            if self._holders.get(holder) == digest:
+                self._blobs.move_to_end(digest)
+                return digest
+            self._release(holder)
+
+            blob = self._blobs.get(digest)
+            if blob is None:
+                blob = self._blobs[digest] = Blob(digest, _adopt(source, digest))
+                if blob.on_disk:
+                    self.disk_bytes += blob.size
+                else:
+                    self.memory_bytes += blob.size
+            self._blobs.move_to_end(digest)
+            blob.holders.add(holder)
+            self._holders[holder] = digest
+            self._spill()
+        return digest
+
+    def get(self, digest: Optional[str]) -> Optional[Source]:
+        """The stored document for a digest, or None once it has been dropped"""
+        with self._lock:
+            blob = self._blobs.get(digest)
+            if blob is None:
+                return None
+            self._blobs.move_to_end(digest)
+        if blob.on_disk:
+            blob.source.touch()
+        return blob.source
+
+    def release(self, holder: str):
+        """Drop a holder's reference, deleting the blob if it was the last"""
+        with self._lock:
+            self._release(holder)
+
+    def release_session(self, session_id: str):
+        """Release everything a session holds"""
+        prefix = f"{session_id}/"
+        with self._lock:
+            for holder in [holder for holder in self._holders if holder.startswith(prefix)]:
+                self._release(holder)
+            self._sessions.pop(session_id, None)
+
+    def touch_session(self, session_id: str):
+        """Record that a session is still alive"""
+        with self._lock:
+            self._sessions[session_id] = time.time()
+
+    def cleanup(self, ttl: float = SESSION_TTL_SECONDS, force: bool = False) -> int:
+        """Release sessions not seen within ``ttl`` seconds
+
+        Also deletes blob files left behind by earlier processes. Runs at most
+        once per CLEANUP_INTERVAL_SECONDS unless forced. Returns the number of
+        sessions released.
+        """
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_cleanup < CLEANUP_INTERVAL_SECONDS:
+                return 0
+            self._last_cleanup = now
+            expired = [session for session, seen in self._sessions.items() if now - seen > ttl]
+        for session in expired:
+            self.release_session(session)
+
+        if BLOB_DIR.is_dir():
+            for entry in os.scandir(BLOB_DIR):
+                try:
+                    with self._lock:
+                        known = entry.name[:-len('.pdf')] in self._blobs
+                    if not known and now - entry.stat().st_mtime > ttl:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+        return len(expired)
+
+    def stats(self) -> Dict:
+        """Bytes and references held across all sessions"""
+        with self._lock:
+            return {
+                'blobs': len(self._blobs),
+                'holders': len(self._holders),
+                'sessions': len(self._sessions),
+                'memory_bytes': self.memory_bytes,
+                'disk_bytes': self.disk_bytes,
+                'total_bytes': self.memory_bytes + self.disk_bytes,
+                'referenced_bytes': sum(blob.size * len(blob.holders) for blob in self._blobs.values()),
+                'memory_budget': self.memory_budget,
+                'spills': self.spills,
+            }
+
+    def _release(self, holder: str):
+        digest = self._holders.pop(holder, None)
+        blob = self._blobs.get(digest)
+        if blob is None:
+            return
+        blob.holders.discard(holder)
+        if blob.holders:
+            return
+
+        del self._blobs[digest]
+        if blob.on_disk:
+            self.disk_bytes -= blob.size
+            try:
+                os.unlink(blob.source.path)
+            except OSError:
+                pass
+        else:
+            self.memory_bytes -= blob.size
+
+    def _spill(self):
+        """Move least recently used in-memory blobs to disk until under budget"""
+        for blob in list(self._blobs.values()):
+            if self.memory_bytes <= self.memory_budget:
+                break
+            if blob.on_disk:
+                continue
+            path = _blob_path(blob.digest)
+            with open(path, 'wb') as f:
+                f.write(blob.source)
+            blob.source = FileSource(path, blob.digest)
+            self.memory_bytes -= blob.size
+            self.disk_bytes += blob.size
+            self.spills += 1
+
+
+def _blob_path(digest: str):
+    # Blobs live in their own directory, out of reach of cleanup_expired
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    return BLOB_DIR / f"{digest}.pdf"
+
+
+def _adopt(source: Source, digest: str) -> Source:
+    """Take a file source into the blob directory without copying its bytes"""
+    if not isinstance(source, FileSource):
+        return source
+    path = _blob_path(digest)
+    if not path.exists():
+        try:
+            os.link(source.path, path)
+        except OSError:
+            shutil.copyfile(source.path, path)
+    return FileSource(path, digest)
+
+
+blob_store = BlobStore()
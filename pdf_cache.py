@@ -0,0 +1,112 @@
+"""
+Process-wide cache of parsed PDF documents keyed by content hash
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, Optional
+from pypdf import PdfReader
+from pdf_storage import Source, source_digest, source_stream
+
+# Total source bytes kept parsed across all sessions
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class ParsedDocument:
+    """Parsed PDF with a reusable reader handle"""
+
+    def __init__(self, digest: str, size: int, reader: PdfReader):
+        self.digest = digest
+        self.size = size
+        self.reader = reader
+        self.page_count = len(reader.pages)
+        metadata = reader.metadata
+        self.title = getattr(metadata, 'title', 'Unknown') if metadata else 'Unknown'
+        self.metadata = {key: str(value) for key, value in metadata.items()} if metadata else {}
+        # pypdf readers share one stream, so page access must be serialized
+        self.lock = threading.RLock()
+        # Results computed from the reader on demand (e.g. page size estimates)
+        self.derived: Dict[str, object] = {}
+
+    @property
+    def info(self) -> Dict:
+        """Page count and title in the shape returned by get_pdf_info"""
+        return {'page_count': self.page_count, 'title': self.title}
+
+
+class DocumentCache:
+    """LRU cache of parsed documents bounded by total source bytes"""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, ParsedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: Source) -> ParsedDocument:
+        """Return the parsed document for a source, parsing on first use"""
+        digest = source_digest(source)
+
+        with self._lock:
+            doc = self._entries.get(digest)
+            if doc is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return doc
+            self.misses += 1
+
+        # Parse outside the lock so other sessions are not blocked
+        doc = ParsedDocument(digest, len(source), PdfReader(source_stream(source)))
+
+        with self._lock:
+            existing = self._entries.get(digest)
+            if existing is not None:
+                return existing
+            if doc.size <= self.max_bytes:
+                self._entries[digest] = doc
+                self.total_bytes += doc.size
+                self._evict()
+        return doc
+
+    def peek(self, digest: str) -> Optional[ParsedDocument]:
+        """Return a cached document without parsing or touching LRU order"""
+        with self._lock:
+            return self._entries.get(digest)
+
+    def clear(self):
+        """Drop every cached document"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict:
+        """Cache occupancy and hit counters"""
+        with self._lock:
+            return {
+                'documents': len(self._entries),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, doc = self._entries.popitem(last=False)
+            self.total_bytes -= doc.size
+
+
+@contextmanager
+def lock_documents(docs: Iterable[ParsedDocument]):
+    """Hold the reader locks of several documents in a deadlock-free order"""
+    unique = {doc.digest: doc for doc in docs}
+    with ExitStack() as stack:
+        for digest in sorted(unique):
+            stack.enter_context(unique[digest].lock)
+        yield
+
+
+document_cache = DocumentCache()
@@ -0,0 +1,823 @@
+"""
+Headless PDF processing engine
+
+Everything here is importable without Streamlit so the same operations can
+run from the UI, the CLI and background workers. Failures surface as
+PDFProcessingError subclasses.
+"""
+
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import IO, Callable, Iterable, Iterator, List, Tuple, Dict, Optional, Union
+from pypdf import PdfReader, PdfWriter
+from pdf_cache import ParsedDocument, document_cache, lock_documents
+from pdf_incremental import IncrementalUpdateError, remove_pages_incremental
+from pdf_metrics import instrument, suspended
+from pdf_output import StreamSpill, optimize_writer, write_compact, write_linearized
+from pdf_pipeline import Segment, page_count, plan_pipeline, select, take
+from pdf_probe import probe_pdf
+from pdf_results import KIND_ARCHIVE, KIND_DOCUMENT, KIND_FILES, KIND_VALUE, memoize
+from pdf_selection import PageSelection, PageSelectionError
+from pdf_sizing import PageCostModel
+from pdf_storage import FileSource, Source, new_storage_path, out_of_core, source_stream, source_view
+
+# Below this many pages, worker startup costs more than parallel splitting saves
+PARALLEL_SPLIT_MIN_PAGES = 200
+# Pools start from job threads; a forked worker could inherit a lock another
+# thread held (document_cache, metrics) and block on it forever
+WORKER_CONTEXT = multiprocessing.get_context('spawn')
+SPLIT_BATCH_MAX_RANGES = 16
+
+# Split archives stay in memory up to this size, then spill to disk
+ZIP_SPOOL_MAX_MEMORY = 32 * 1024 * 1024
+# Deflate an entry only if a sample of it compresses below this ratio
+ZIP_SAMPLE_BYTES = 64 * 1024
+ZIP_DEFLATE_MIN_RATIO = 0.9
+# Size-bounded splits pack to this fraction of the limit to absorb estimate error
+SIZE_SPLIT_TARGET = 0.98
+# Operations a batch can apply to every document
+BATCH_OPS = ('remove', 'split')
+SPLIT_MODES = ('individual', 'every_n', 'ranges', 'max_size')
+
+class PDFProcessingError(Exception):
+    """Base class for PDF operation failures"""
+
+class InvalidPDFError(PDFProcessingError):
+    """Input could not be parsed as a PDF"""
+
+class MergeError(PDFProcessingError):
+    """Merge operation failed"""
+
+class RemoveError(PDFProcessingError):
+    """Page removal failed"""
+
+class SplitError(PDFProcessingError):
+    """Split operation failed"""
+
+class PipelineError(PDFProcessingError):
+    """Pipeline step was invalid or failed"""
+
+class BatchError(PDFProcessingError):
+    """Batch operation spec was invalid"""
+
+class OperationCancelled(PDFProcessingError):
+    """Raised from a progress callback to stop an operation"""
+    metrics_status = 'cancelled'
+
+# Called as progress(pages_done, pages_total); may raise OperationCancelled
+ProgressCallback = Callable[[int, int], None]
+
+def load_document(source: Source) -> ParsedDocument:
+    """Parse a source through the shared cache"""
+    try:
+        return document_cache.get(source)
+    except Exception as e:
+        raise InvalidPDFError(f"Invalid PDF: {e}") from e
+
+class PDFProcessor:
+    """PDF processing utilities"""
+
+    @staticmethod
+    def validate_pdf(file_bytes: Source) -> bool:
+        """Validate PDF file
+
+        The header, tail and trailer are probed first; the document is only
+        fully parsed when the probe cannot decide.
+        """
+        probe = probe_pdf(file_bytes)
+        if not probe.valid:
+            return False
+        if probe.complete:
+            return True
+        try:
+            document_cache.get(file_bytes)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def get_pdf_info(file_bytes: Source) -> Dict:
+        """Get PDF information, from the trailer alone when possible"""
+        probe = probe_pdf(file_bytes)
+        if probe.complete:
+            return probe.info
+        if not probe.valid:
+            return {'page_count': 0, 'title': 'Unknown'}
+        try:
+            return _parsed_info(file_bytes)
+        except Exception:
+            return {'page_count': 0, 'title': 'Unknown'}
+
+    @staticmethod
+    @memoize('merge', KIND_DOCUMENT, lambda main_bytes, insert_list, linearize, **_: (
+        [main_bytes] + [insert for insert, _ in insert_list],
+        {'positions': [position for _, position in insert_list], 'linearize': linearize}))
+    def merge_pdfs(main_bytes: Source, insert_list: List[Tuple[Source, int]], to_file: bool = False,
+                   progress: Optional[ProgressCallback] = None, linearize: bool = False) -> Source:
+        """Merge PDFs with insertion points
+
+        With ``to_file`` the result is written straight to a storage file and
+        returned as a FileSource instead of bytes; out-of-core inputs always
+        are (see pdf_storage.OUT_OF_CORE_BYTES). ``progress`` is called
+        after every output page. ``linearize`` writes a linearized ("fast
+        web view") file whose first page displays before the rest arrives.
+        """
+        try:
+            with instrument('merge') as metrics:
+                with metrics.stage('parse'):
+                    main_doc = load_document(main_bytes)
+                    sources = {main_doc.digest: main_doc}
+
+                    # Parse each distinct insert once, even if it is queued several times
+                    parsed = {}
+                    inserts = []
+                    for insert_bytes, position in insert_list:
+                        doc = parsed.get(id(insert_bytes))
+                        if doc is None:
+                            doc = parsed[id(insert_bytes)] = load_document(insert_bytes)
+                        sources.setdefault(doc.digest, doc)
+                        inserts.append((doc.digest, doc.page_count, position))
+
+                metrics.input_bytes = len(main_bytes) + sum(len(insert_bytes) for insert_bytes, _ in insert_list)
+                large = out_of_core(sum(doc.size for doc in sources.values()))
+
+                with metrics.stage('plan'):
+                    plan = build_merge_plan(main_doc.digest, main_doc.page_count, inserts)
+
+                # Emit the final page order into a single writer
+                writer = PdfWriter()
+                total = sum(stop - start for _, start, stop in plan)
+                done = 0
+                with _stream_spill(writer, sources.values(), large) as spill:
+                    with metrics.stage('copy_pages'), lock_documents(sources.values()):
+                        for digest, start, stop in plan:
+                            pages = sources[digest].reader.pages
+                            for i in range(start, stop):
+                                writer.add_page(pages[i])
+                                if spill:
+                                    spill.offload()
+                                done += 1
+                                if progress:
+                                    progress(done, total)
+                    metrics.pages = total
+
+                    with metrics.stage('optimize'):
+                        metrics.details.update(optimize_writer(writer))
+                    with metrics.stage('write'):
+                        result = _write_output(writer, to_file or large, spill, linearize)
+                metrics.output_bytes = len(result)
+                return result
+
+        except Exception as e:
+            if isinstance(e, PDFProcessingError):
+                raise
+            raise MergeError(f"Merge error: {e}") from e
+
+    @staticmethod
+    @memoize('remove', KIND_DOCUMENT, lambda pdf_bytes, pages_to_remove, compact, linearize, **_: (
+        [pdf_bytes], {'pages': _selection_key(pages_to_remove), 'compact': compact, 'linearize': linearize}))
+    def remove_pages(pdf_bytes: Source, pages_to_remove: Union[PageSelection, Iterable[int]],
+                     compact: bool = False, to_file: bool = False,
+                     progress: Optional[ProgressCallback] = None, linearize: bool = False) -> Source:
+        """Remove specific pages from PDF
+
+        ``pages_to_remove`` is a PageSelection or 1-based page numbers. By
+        default the original bytes are kept and an incremental update
+        dropping the pages is appended. ``compact`` rewrites the whole
+        document so the removed pages' resources are physically dropped.
+        ``linearize`` also rewrites the document, as a linearized file.
+        Out-of-core inputs are always written to a storage file.
+        """
+        try:
+            with instrument('remove') as metrics:
+                with metrics.stage('parse'):
+                    doc = load_document(pdf_bytes)
+                metrics.input_bytes = len(pdf_bytes)
+
+                total_pages = doc.page_count
+                remove_set = as_selection(pages_to_remove, total_pages)
+                if len(remove_set) >= total_pages:
+                    raise RemoveError("Cannot remove every page")
+                metrics.pages = total_pages
+                large = out_of_core(len(pdf_bytes))
+                to_file = to_file or large
+
+                if not compact and not linearize:
+                    output = _new_output(to_file)
+                    try:
+                        with metrics.stage('incremental_update'), doc.lock:
+                            remove_pages_incremental(source_view(pdf_bytes), doc.reader, remove_set, output)
+                        if progress:
+                            progress(total_pages, total_pages)
+                        result = _finish_output(output)
+                        metrics.output_bytes = len(result)
+                        return result
+                    except IncrementalUpdateError:
+                        _discard_output(output)  # Fall back to a full rewrite
+
+                writer = PdfWriter()
+                with _stream_spill(writer, [doc], large) as spill:
+                    # Add pages not in remove set
+                    with metrics.stage('copy_pages'), doc.lock:
+                        pages = doc.reader.pages
+                        for i in remove_set.complement():
+                            writer.add_page(pages[i])
+                            if spill:
+                                spill.offload()
+                            if progress:
+                                progress(i + 1, total_pages)
+
+                    with metrics.stage('optimize'):
+                        metrics.details.update(optimize_writer(writer))
+                    with metrics.stage('write'):
+                        result = _write_output(writer, to_file, spill, linearize)
+                metrics.output_bytes = len(result)
+                return result
+
+        except Exception as e:
+            if isinstance(e, PDFProcessingError):
+                raise
+            raise RemoveError(f"Remove error: {e}") from e
+
+    @staticmethod
+    @memoize('split', KIND_FILES, lambda pdf_bytes, **params: _split_identity(pdf_bytes, **params))
+    def split_pdf(pdf_bytes: Source, mode: str, pages_per_split: int = 1,
+                  workers: Optional[int] = None, progress: Optional[ProgressCallback] = None,
+                  page_ranges: Optional[str] = None, max_mb: Optional[float] = None,
+                  linearize: bool = False) -> Dict[str, Source]:
+        """Split PDF into multiple files (FileSources for out-of-core inputs)"""
+        return dict(PDFProcessor.iter_split_pdf(pdf_bytes, mode, pages_per_split, workers, progress,
+                                                page_ranges, max_mb, linearize))
+
+    @staticmethod
+    def plan_size_split(pdf_bytes: Source, max_mb: float) -> List[Tuple[str, int, int]]:
+        """Estimate the (filename, page count, bytes) outputs of a 'max_size' split"""
+        doc = load_document(pdf_bytes)
+        return [(name, len(pages), estimate) for name, pages, estimate in size_split_plan(doc, mb_to_bytes(max_mb))]
+
+    @staticmethod
+    def iter_split_pdf(pdf_bytes: Source, mode: str, pages_per_split: int = 1,
+                       workers: Optional[int] = None,
+                       progress: Optional[ProgressCallback] = None,
+                       page_ranges: Optional[str] = None,
+                       max_mb: Optional[float] = None,
+                       linearize: bool = False) -> Iterator[Tuple[str, Source]]:
+        """Yield (filename, bytes) for each split output in order
+
+        Parts of an out-of-core input are written to storage files and
+        yielded as FileSources instead; the consumer owns (and deletes) them.
+
+        ``workers`` sets the process pool size; None picks one per CPU, and
+        documents under PARALLEL_SPLIT_MIN_PAGES are always split serially.
+        ``progress`` is called after each output file. The 'ranges' mode
+        writes one file per entry of the ``page_ranges`` selection string.
+
+        The 'max_size' mode packs consecutive pages into files estimated to
+        stay under ``max_mb``. Every file's actual size is checked against
+        the estimate (recorded in the operation's metrics details), and a
+        file that still comes out too large is split again.
+
+        ``linearize`` writes every output as a linearized file.
+        """
+        try:
+            with instrument('split') as metrics:
+                with metrics.stage('parse'):
+                    doc = load_document(pdf_bytes)
+                metrics.input_bytes = len(pdf_bytes)
+                to_file = out_of_core(len(pdf_bytes))
+                max_bytes = None
+                estimates = {}
+                if mode == 'max_size':
+                    max_bytes = mb_to_bytes(max_mb)
+                    with metrics.stage('estimate'):
+                        plan = size_split_plan(doc, max_bytes)
+                    ranges = [(name, pages) for name, pages, _ in plan]
+                    estimates = {name: estimate for name, _, estimate in plan}
+                    metrics.details['max_bytes'] = max_bytes
+                    metrics.details['files'] = []
+                else:
+                    ranges = split_ranges(doc.page_count, mode, pages_per_split, page_ranges)
+
+                if workers is None:
+                    workers = os.cpu_count() or 1
+                workers = min(workers, len(ranges))
+
+                range_pages = dict(ranges)
+                total = sum(len(pages) for pages in range_pages.values())
+
+                def outputs(name: str, data: Source) -> Iterator[Tuple[str, Source]]:
+                    """Count a finished file, re-splitting it if it broke the size limit"""
+                    pages = range_pages[name]
+                    if max_bytes is not None:
+                        metrics.details['files'].append({
+                            'file': name, 'pages': len(pages),
+                            'estimated_bytes': estimates.get(name), 'actual_bytes': len(data),
+                        })
+                        if len(data) > max_bytes and len(pages) > 1:
+                            if isinstance(data, FileSource):
+                                data.unlink()
+                            middle = pages.start + len(pages) // 2
+                            for part in (range(pages.start, middle), range(middle, pages.stop)):
+                                part_name = _range_filename(part.start, part.stop)
+                                range_pages[part_name] = part
+                                with metrics.stage('split'), doc.lock:
+                                    part_data = _write_pages(doc.reader, part, to_file, linearize)
+                                yield from outputs(part_name, part_data)
+                            return
+
+                    metrics.pages += len(pages)
+                    metrics.output_bytes += len(data)
+                    if progress:
+                        progress(metrics.pages, total)
+                    with suspended():
+                        yield name, data
+
+                if workers <= 1 or doc.page_count < PARALLEL_SPLIT_MIN_PAGES:
+                    for name, pages in ranges:
+                        with metrics.stage('split'), doc.lock:
+                            data = _write_pages(doc.reader, pages, to_file, linearize)
+                        yield from outputs(name, data)
+                    return
+
+                # Hand each worker a few batches so IPC stays small relative to work
+                batch_size = max(1, min(len(ranges) // (workers * 4), SPLIT_BATCH_MAX_RANGES))
+                batches = iter([ranges[i:i + batch_size] for i in range(0, len(ranges), batch_size)])
+
+                with ProcessPoolExecutor(max_workers=workers, mp_context=WORKER_CONTEXT,
+                                         initializer=_init_split_worker, initargs=(pdf_bytes,)) as executor:
+                    # Keep only a bounded window of finished batches in memory
+                    pending = deque()
+                    try:
+                        while True:
+                            for batch in batches:
+                                pending.append(executor.submit(_split_batch, batch, to_file, linearize))
+                                if len(pending) >= workers * 2:
+                                    break
+                            if not pending:
+                                break
+                            with metrics.stage('split'):
+                                batch_result = pending.popleft().result()
+                            for name, data in batch_result:
+                                yield from outputs(name, data)
+                    finally:
+                        # Don't leave queued batches running after a cancel or error
+                        for future in pending:
+                            future.cancel()
+
+        except Exception as e:
+            if isinstance(e, PDFProcessingError):
+                raise
+            raise SplitError(f"Split error: {e}") from e
+
+    @staticmethod
+    @memoize('split_zip', KIND_ARCHIVE, lambda pdf_bytes, **params: _split_identity(pdf_bytes, **params))
+    def split_pdf_to_zip(pdf_bytes: Source, mode: str, pages_per_split: int = 1,
+                         workers: Optional[int] = None, to_file: bool = False,
+                         progress: Optional[ProgressCallback] = None,
+                         page_ranges: Optional[str] = None,
+                         max_mb: Optional[float] = None,
+                         linearize: bool = False) -> Tuple[Union[IO[bytes], FileSource], int]:
+        """Split PDF straight into a ZIP archive
+
+        Returns the archive and the number of entries written. The archive is
+        a spooled temporary file positioned at the start, or a FileSource
+        when ``to_file`` is set or the input is out of core.
+        """
+        with instrument('split') as metrics:
+            entries = PDFProcessor.iter_split_pdf(pdf_bytes, mode, pages_per_split, workers, progress,
+                                                  page_ranges, max_mb, linearize)
+            return _write_zip(entries, to_file or out_of_core(len(pdf_bytes)), metrics)
+
+    @staticmethod
+    def run_pipeline(sources: List[Source], steps: List[Dict], to_file: bool = False,
+                     progress: Optional[ProgressCallback] = None
+                     ) -> Union[Source, Tuple[Union[IO[bytes], FileSource], int]]:
+        """Run a merge/remove/reorder/split pipeline in one pass
+
+        ``sources[0]`` is the starting document; merge steps insert sources
+        by index (see pdf_pipeline for the step format). Pages are copied
+        straight from the parsed sources and each output is serialized once.
+        Returns the output document, or, when the last step is a split, a
+        ZIP archive and its entry count as split_pdf_to_zip does. Out-of-core
+        inputs always produce file results.
+        """
+        try:
+            with instrument('pipeline') as metrics:
+                with metrics.stage('parse'):
+                    docs = [load_document(source) for source in sources]
+                unique = {doc.digest: source for doc, source in zip(docs, sources)}
+                metrics.input_bytes = sum(len(source) for source in unique.values())
+                large = out_of_core(metrics.input_bytes)
+
+                with metrics.stage('plan'):
+                    segments, split = plan_pipeline([doc.page_count for doc in docs], steps)
+                    if split is None:
+                        outputs = [(None, segments)]
+                    else:
+                        parts = split_ranges(page_count(segments), split['mode'],
+                                             int(split.get('pages_per_split') or 1), split.get('ranges'))
+                        outputs = [(name, take(segments, part) if isinstance(part, range)
+                                     else select(segments, part)) for name, part in parts]
+                metrics.details['steps'] = [step.get('op') for step in steps]
+
+                total = sum(page_count(part) for _, part in outputs)
+                done = 0
+
+                def build(part: List[Segment], to_file: bool) -> Source:
+                    nonlocal done
+                    writer = PdfWriter()
+                    with _stream_spill(writer, docs, large) as spill:
+                        with metrics.stage('copy_pages'), lock_documents(docs):
+                            for source, pages in part:
+                                reader_pages = docs[source].reader.pages
+                                for i in pages:
+                                    writer.add_page(reader_pages[i])
+                                    if spill:
+                                        spill.offload()
+                                    done += 1
+                                    if progress:
+                                        progress(done, total)
+                        with metrics.stage('optimize'):
+                            optimize_writer(writer)
+                        metrics.pages += page_count(part)
+                        with metrics.stage('write'):
+                            return _write_output(writer, to_file, spill)
+
+                if split is None:
+                    result = build(segments, to_file or large)
+                    metrics.output_bytes = len(result)
+                    return result
+
+                def entries() -> Iterator[Tuple[str, Source]]:
+                    for name, part in outputs:
+                        yield name, build(part, large)
+
+                return _write_zip(entries(), to_file or large, metrics)
+
+        except Exception as e:
+            if isinstance(e, PDFProcessingError):
+                raise
+            raise PipelineError(f"Pipeline error: {e}") from e
+
+    @staticmethod
+    def run_batch(documents: List[Tuple[str, Source]], op: str, params: Dict,
+                  workers: Optional[int] = None, to_file: bool = False,
+                  progress: Optional[ProgressCallback] = None,
+                  statuses: Optional[List[Dict]] = None) -> Tuple[Union[IO[bytes], FileSource], List[Dict]]:
+        """Apply one remove or split to many documents, collecting every output in one ZIP
+
+        ``documents`` are (filename, source) pairs. ``params`` holds the
+        operation's options: ``pages`` (a selection string, resolved against
+        each document) and ``compact`` for 'remove'; ``mode``,
+        ``pages_per_split``, ``page_ranges`` and ``max_mb`` for 'split'.
+        Documents are spread over a process pool of ``workers`` (None picks
+        one per CPU) and their outputs are streamed into the archive in
+        document order: removals as ``<filename>``, split parts as
+        ``<filename stem>/<part>``. A document that fails is recorded and
+        the rest of the batch carries on.
+
+        ``statuses`` (see batch_statuses) is updated in place as documents
+        are handed to a worker and finish, so a caller can watch the batch.
+        ``progress`` counts documents rather than pages. Returns the archive,
+        as split_pdf_to_zip does, and the statuses.
+        """
+        if op not in BATCH_OPS:
+            raise BatchError(f"Unknown batch operation '{op}'; expected one of {', '.join(BATCH_OPS)}")
+        if op == 'remove' and not str(params.get('pages') or '').strip():
+            raise BatchError("Pages to remove are required")
+        if op == 'split':
+            if params.get('mode') not in SPLIT_MODES:
+                raise BatchError(f"Split mode must be one of {', '.join(SPLIT_MODES)}")
+            if params['mode'] == 'max_size':
+                mb_to_bytes(params.get('max_mb'))
+        if not documents:
+            raise BatchError("A batch needs at least one document")
+        if statuses is None:
+            statuses = batch_statuses([name for name, _ in documents])
+
+        with instrument('batch') as metrics:
+            metrics.input_bytes = sum(len(source) for _, source in documents)
+            metrics.details.update({'batch_op': op, 'documents': len(documents), 'failed': 0})
+            stems = _batch_stems([name for name, _ in documents])
+
+            def entries() -> Iterator[Tuple[str, Source]]:
+                for done, (index, outputs, error, seconds) in enumerate(
+                        _batch_outcomes(documents, op, params, workers, statuses), 1):
+                    status = statuses[index]
+                    if error is None:
+                        for name, data in outputs:
+                            yield (f"{stems[index]}.pdf" if name is None else f"{stems[index]}/{name}"), data
+                        status.update(status='done', files=len(outputs),
+                                      bytes=sum(len(data) for _, data in outputs), seconds=seconds)
+                    else:
+                        status.update(status='failed', error=error, seconds=seconds)
+                        metrics.details['failed'] += 1
+                    if progress:
+                        progress(done, len(documents))
+
+            archive, _ = _write_zip(entries(), to_file or out_of_core(metrics.input_bytes), metrics)
+            return archive, statuses
+
+def batch_statuses(names: List[str]) -> List[Dict]:
+    """Initial per-document statuses for PDFProcessor.run_batch
+
+    'status' is 'waiting', 'running' (handed to a worker), 'done' or
+    'failed'; 'files' and 'bytes' count a document's outputs and 'error'
+    says why it failed.
+    """
+    return [{'file': name, 'status': 'waiting', 'files': 0, 'bytes': 0, 'seconds': None, 'error': None}
+            for name in names]
+
+def _batch_stems(names: List[str]) -> List[str]:
+    """Archive names for a batch's documents: the file name without .pdf, numbered if repeated"""
+    stems = []
+    seen: Dict[str, int] = {}
+    for name in names:
+        stem = os.path.basename(name)
+        if stem.lower().endswith('.pdf'):
+            stem = stem[:-len('.pdf')]
+        seen[stem.lower()] = seen.get(stem.lower(), 0) + 1
+        stems.append(stem if seen[stem.lower()] == 1 else f"{stem} ({seen[stem.lower()]})")
+    return stems
+
+def _batch_outcomes(documents: List[Tuple[str, Source]], op: str, params: Dict, workers: Optional[int],
+                    statuses: List[Dict]) -> Iterator[Tuple[int, Optional[List[Tuple[Optional[str], Source]]],
+                                                            Optional[str], float]]:
+    """Yield (index, outputs, error, seconds) per document, in document order
+
+    Documents always go to worker processes, even with one worker, so each
+    document's operation is measured on its own and a crash costs only
+    that document.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(min(workers, len(documents)), 1)
+    queue = iter(enumerate(documents))
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=WORKER_CONTEXT) as executor:
+        # Keep only a bounded window of finished documents in memory
+        pending = deque()
+        try:
+            while True:
+                for index, (_, source) in queue:
+                    pending.append((index, executor.submit(_batch_document, op, source, params)))
+                    statuses[index]['status'] = 'running'
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    break
+                index, future = pending.popleft()
+                try:
+                    outputs, error, seconds = future.result()
+                except Exception as e:
+                    outputs, error, seconds = None, f"Worker failed: {e}", 0.0
+                yield index, outputs, error, seconds
+        finally:
+            # Don't leave queued documents running after a cancel or error
+            for _, future in pending:
+                future.cancel()
+
+def _batch_document(op: str, source: Source, params: Dict
+                    ) -> Tuple[Optional[List[Tuple[Optional[str], Source]]], Optional[str], float]:
+    """Run a batch operation on one document in a worker; failures come back as messages"""
+    start = time.perf_counter()
+    try:
+        if op == 'remove':
+            selection = PageSelection.parse(str(params['pages']), load_document(source).page_count)
+            outputs = [(None, PDFProcessor.remove_pages(source, selection, compact=bool(params.get('compact'))))]
+        else:
+            outputs = list(PDFProcessor.iter_split_pdf(
+                source, params['mode'], int(params.get('pages_per_split') or 1), workers=1,
+                page_ranges=params.get('page_ranges'), max_mb=params.get('max_mb')))
+    except (PDFProcessingError, PageSelectionError) as e:
+        return None, str(e), time.perf_counter() - start
+    return outputs, None, time.perf_counter() - start
+
+def _write_zip(entries: Iterable[Tuple[str, Source]], to_file: bool,
+               metrics) -> Tuple[Union[IO[bytes], FileSource], int]:
+    """Write (filename, data) entries into a new ZIP archive
+
+    The archive is a spooled temporary file positioned at the start, or a
+    FileSource when ``to_file`` is set. FileSource entries are deleted once
+    archived. Nothing is left behind on failure.
+    """
+    if to_file:
+        archive = open(new_storage_path('.zip'), 'w+b')
+    else:
+        archive = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_MEMORY)
+    count = 0
+    try:
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            for filename, file_bytes in entries:
+                with metrics.stage('zip'):
+                    write_zip_entry(zip_file, filename, file_bytes)
+                if isinstance(file_bytes, FileSource):
+                    file_bytes.unlink()
+                count += 1
+    except BaseException:
+        archive.close()
+        if to_file:
+            os.unlink(archive.name)
+        raise
+
+    # Report the archive size rather than the sum of its entries
+    metrics.output_bytes = archive.tell()
+    if to_file:
+        archive.close()
+        return FileSource(archive.name), count
+    archive.seek(0)
+    return archive, count
+
+def _new_output(to_file: bool) -> IO[bytes]:
+    """Open the destination for a single output document"""
+    return open(new_storage_path(), 'w+b') if to_file else io.BytesIO()
+
+def _finish_output(output: IO[bytes]) -> Source:
+    """Close an output opened by _new_output and return its contents"""
+    if isinstance(output, io.BytesIO):
+        return output.getvalue()
+    output.close()
+    return FileSource(output.name)
+
+def _discard_output(output: IO[bytes]):
+    output.close()
+    if not isinstance(output, io.BytesIO):
+        os.unlink(output.name)
+
+def _write_output(writer: PdfWriter, to_file: bool, spill: Optional[StreamSpill] = None,
+                  linearize: bool = False) -> Source:
+    """Serialize a writer to bytes or to a storage file, linearized if asked"""
+    output = _new_output(to_file)
+    try:
+        if linearize:
+            write_linearized(writer, output, spill)
+        else:
+            write_compact(writer, output, spill)
+    except BaseException:
+        _discard_output(output)
+        raise
+    return _finish_output(output)
+
+def _stream_spill(writer: PdfWriter, docs: Iterable[ParsedDocument], enabled: bool):
+    """StreamSpill for a writer copying out-of-core documents, else a no-op context"""
+    return StreamSpill(writer, [doc.reader for doc in docs]) if enabled else nullcontext()
+
+def split_ranges(total_pages: int, mode: str, pages_per_split: int = 1,
+                 page_ranges: Optional[str] = None) -> List[Tuple[str, Union[range, PageSelection]]]:
+    """List the (filename, zero-based pages) outputs a split produces"""
+    if mode == 'individual':
+        return [(f'page_{i+1}.pdf', range(i, i + 1)) for i in range(total_pages)]
+
+    if mode == 'every_n':
+        ranges = []
+        for start in range(0, total_pages, pages_per_split):
+            end = min(start + pages_per_split, total_pages)
+            ranges.append((f'pages_{start+1}-{end}.pdf', range(start, end)))
+        return ranges
+
+    if mode == 'ranges':
+        ranges = []
+        names = set()
+        for number, entry in enumerate(PageSelection.parse_entries(page_ranges or '', total_pages), 1):
+            span = entry.contiguous
+            name = _range_filename(span.start, span.stop) if span is not None else f'part_{number}.pdf'
+            if name in names:
+                name = f'part_{number}.pdf'
+            names.add(name)
+            ranges.append((name, span if span is not None else entry))
+        return ranges
+
+    return []
+
+def size_split_plan(doc: ParsedDocument, max_bytes: int) -> List[Tuple[str, range, int]]:
+    """List (filename, zero-based pages, estimated bytes) for a size-bounded split"""
+    with doc.lock:
+        model = doc.derived.get('page_costs')
+        if model is None:
+            model = doc.derived['page_costs'] = PageCostModel(doc.reader)
+    return [(_range_filename(pages.start, pages.stop), pages, estimate)
+            for pages, estimate in model.pack(int(max_bytes * SIZE_SPLIT_TARGET))]
+
+def mb_to_bytes(max_mb: Optional[float]) -> int:
+    if not max_mb or max_mb <= 0:
+        raise SplitError("A positive size limit in MB is required")
+    return int(max_mb * 1024 * 1024)
+
+def _range_filename(start: int, end: int) -> str:
+    return f'page_{start+1}.pdf' if end - start == 1 else f'pages_{start+1}-{end}.pdf'
+
+def _write_pages(reader: PdfReader, pages: Iterable[int], to_file: bool = False, linearize: bool = False) -> Source:
+    """Serialize the given zero-based pages of a reader as a standalone PDF
+
+    With ``to_file`` the pages are copied out of core into a storage file.
+    """
+    writer = PdfWriter()
+    with StreamSpill(writer, [reader]) if to_file else nullcontext() as spill:
+        for i in pages:
+            writer.add_page(reader.pages[i])
+            if spill:
+                spill.offload()
+        optimize_writer(writer)
+        return _write_output(writer, to_file, spill, linearize)
+
+# Reader opened once per split worker process
+_worker_reader = None
+
+def _init_split_worker(pdf_bytes: Source):
+    global _worker_reader
+    _worker_reader = PdfReader(source_stream(pdf_bytes))
+
+def _split_batch(batch: List[Tuple[str, Iterable[int]]], to_file: bool = False,
+                 linearize: bool = False) -> List[Tuple[str, Source]]:
+    return [(name, _write_pages(_worker_reader, pages, to_file, linearize)) for name, pages in batch]
+
+def write_zip_entry(zip_file: zipfile.ZipFile, filename: str, data: Source):
+    """Add an entry, deflating only when a sample shows it saves space
+
+    FileSource entries are streamed from disk in chunks.
+    """
+    if isinstance(data, FileSource):
+        with data.open() as f:
+            sample = f.read(ZIP_SAMPLE_BYTES)
+    else:
+        sample = data[:ZIP_SAMPLE_BYTES]
+    if sample and len(zlib.compress(sample, 6)) < len(sample) * ZIP_DEFLATE_MIN_RATIO:
+        compress_type = zipfile.ZIP_DEFLATED
+    else:
+        compress_type = zipfile.ZIP_STORED
+    if isinstance(data, FileSource):
+        zip_file.write(data.path, filename, compress_type=compress_type)
+    else:
+        zip_file.writestr(filename, data, compress_type=compress_type)
+
+def build_merge_plan(main_key, main_pages: int, inserts: List[Tuple[object, int, int]]) -> List[Tuple[object, int, int]]:
+    """Build the merged page order as (source, start, stop) segments
+
+    ``inserts`` holds (source, page_count, position) tuples, where position is
+    the main page the insert follows (0 = beginning). Inserts sharing a
+    position keep their queue order.
+    """
+    by_position = {}
+    for source, page_count, position in inserts:
+        position = min(max(int(position), 0), main_pages)
+        by_position.setdefault(position, []).append((source, page_count))
+
+    plan = []
+    previous = 0
+    for position in sorted(by_position):
+        if position > previous:
+            plan.append((main_key, previous, position))
+        for source, page_count in by_position[position]:
+            if page_count > 0:
+                plan.append((source, 0, page_count))
+        previous = position
+
+    if previous < main_pages:
+        plan.append((main_key, previous, main_pages))
+
+    return plan
+
+@memoize('info', KIND_VALUE, lambda source: ([source], {}))
+def _parsed_info(source: Source) -> Dict:
+    """Document info from a full parse, for files the probe cannot read"""
+    return load_document(source).info
+
+def _selection_key(pages: Union[PageSelection, Iterable[int]]) -> str:
+    """Canonical string for the pages an operation selects, independent of spelling"""
+    if not isinstance(pages, PageSelection):
+        pages = list(pages)
+        pages = PageSelection.from_pages(pages, max(pages, default=0))
+    return str(pages)
+
+def _split_identity(pdf_bytes: Source, mode: str, pages_per_split: int, page_ranges: Optional[str],
+                    max_mb: Optional[float], linearize: bool, **_) -> Tuple[List[Source], Dict]:
+    """Inputs and result-affecting parameters of a split; workers and progress don't change the output"""
+    params = {'mode': mode, 'linearize': linearize}
+    if mode == 'every_n':
+        params['pages_per_split'] = pages_per_split
+    elif mode == 'ranges':
+        params['page_ranges'] = page_ranges
+    elif mode == 'max_size':
+        params['max_bytes'] = mb_to_bytes(max_mb)
+    return [pdf_bytes], params
+
+def as_selection(pages: Union[PageSelection, Iterable[int]], total_pages: int) -> PageSelection:
+    """Coerce a PageSelection or 1-based page numbers to a selection of this document"""
+    if isinstance(pages, PageSelection):
+        return pages if pages.total_pages == total_pages else PageSelection(total_pages, pages.ranges)
+    return PageSelection.from_pages(pages, total_pages)
+
+def parse_page_string(page_str: str, total_pages: int) -> List[int]:
+    """Parse page range string like '2,4,10-12' into list of page numbers
+
+    Out-of-range pages are dropped; see PageSelection for the full syntax.
+    """
+    return PageSelection.parse(page_str, total_pages, clip=True).page_numbers()
@@ -0,0 +1,190 @@
+"""
+Incremental-update writer for page removal
+
+Instead of re-serializing the whole document, the page tree nodes that change
+are written as new revisions of the same objects and appended to the original
+bytes together with a cross-reference section pointing back at the previous
+one. Output cost follows the number of touched page tree nodes, not the size
+of the document.
+"""
+
+import mmap
+import re
+from typing import BinaryIO, Dict, Iterable, Tuple
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+)
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)\s*%%EOF', re.S)
+_OBJ_HEADER_RE = re.compile(rb'\s*\d+\s+\d+\s+obj')
+
+# startxref and %%EOF must sit within this many bytes of the end
+_TAIL_BYTES = 2048
+# The original bytes are copied in chunks of this size (a multiple of the page size)
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+class IncrementalUpdateError(Exception):
+    """Raised when a document cannot take an incremental update"""
+
+
+def find_startxref(pdf_bytes) -> Tuple[int, bool]:
+    """Return the last startxref offset and whether it points at an xref stream"""
+    tail_start = max(len(pdf_bytes) - _TAIL_BYTES, 0)
+    matches = list(_STARTXREF_RE.finditer(pdf_bytes, tail_start))
+    if not matches:
+        raise IncrementalUpdateError("startxref not found")
+
+    offset = int(matches[-1].group(1))
+    section = pdf_bytes[offset:offset + 32]
+    if section.startswith(b'xref'):
+        return offset, False
+    if _OBJ_HEADER_RE.match(section):
+        return offset, True
+    raise IncrementalUpdateError("startxref does not point at a cross-reference section")
+
+
+def remove_pages_incremental(pdf_bytes, reader: PdfReader, remove_indexes: Iterable[int], output: BinaryIO):
+    """Write the original bytes plus an update dropping the given zero-based pages
+
+    ``pdf_bytes`` may be any bytes-like object, including an mmap.
+    """
+    if reader.is_encrypted:
+        raise IncrementalUpdateError("encrypted documents need a full rewrite")
+
+    prev_offset, uses_xref_stream = find_startxref(pdf_bytes)
+
+    # Copies of the page tree nodes that change, keyed by object number
+    modified: Dict[int, Tuple[IndirectObject, DictionaryObject]] = {}
+
+    def node_copy(ref: IndirectObject) -> DictionaryObject:
+        if ref.idnum not in modified:
+            original = ref.get_object()
+            node = DictionaryObject(original)
+            node[NameObject('/Kids')] = ArrayObject(original['/Kids'])
+            modified[ref.idnum] = (ref, node)
+        return modified[ref.idnum][1]
+
+    for index in sorted(set(remove_indexes)):
+        target = reader.pages[index].indirect_reference
+        parent = reader.pages[index].get_object().raw_get('/Parent')
+
+        while isinstance(parent, IndirectObject):
+            node = node_copy(parent)
+            kids = node['/Kids']
+            if target is not None:
+                try:
+                    kids.remove(target)
+                except ValueError:
+                    raise IncrementalUpdateError("page tree does not list the removed page") from None
+            node[NameObject('/Count')] = NumberObject(int(node['/Count']) - 1)
+
+            # Drop intermediate nodes that no longer have any kids
+            target = parent if target is not None and not kids and '/Parent' in node else None
+            parent = node.raw_get('/Parent') if '/Parent' in node else None
+
+    _copy_original(pdf_bytes, output)
+    if not modified:
+        return
+
+    if pdf_bytes[-1:] not in (b'\n', b'\r'):
+        output.write(b'\n')
+
+    offsets = {}
+    for idnum in sorted(modified):
+        ref, node = modified[idnum]
+        offsets[(idnum, ref.generation)] = output.tell()
+        output.write(f"{idnum} {ref.generation} obj\n".encode())
+        node.write_to_stream(output)
+        output.write(b"\nendobj\n")
+
+    trailer = DictionaryObject()
+    for key in ('/Root', '/Info', '/ID'):
+        if key in reader.trailer:
+            trailer[NameObject(key)] = reader.trailer.raw_get(key)
+    trailer[NameObject('/Prev')] = NumberObject(prev_offset)
+    size = int(reader.trailer['/Size'])
+
+    xref_offset = output.tell()
+    if uses_xref_stream:
+        _write_xref_stream(output, trailer, offsets, size)
+    else:
+        trailer[NameObject('/Size')] = NumberObject(size)
+        _write_xref_table(output, trailer, offsets)
+
+    output.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def _copy_original(pdf_bytes, output: BinaryIO):
+    """Copy the original document in chunks
+
+    Chunks of an mmap are released once written, so copying a mapped file
+    doesn't leave all of it resident in the process.
+    """
+    release = isinstance(pdf_bytes, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED')
+    view = memoryview(pdf_bytes)
+    try:
+        for start in range(0, len(view), COPY_CHUNK_BYTES):
+            chunk = view[start:start + COPY_CHUNK_BYTES]
+            output.write(chunk)
+            if release:
+                pdf_bytes.madvise(mmap.MADV_DONTNEED, start, len(chunk))
+            chunk.release()
+    finally:
+        view.release()
+
+
+def _subsections(idnums):
+    """Group sorted object numbers into contiguous (start, count) runs"""
+    runs = []
+    for idnum in idnums:
+        if runs and runs[-1][0] + runs[-1][1] == idnum:
+            runs[-1][1] += 1
+        else:
+            runs.append([idnum, 1])
+    return runs
+
+
+def _write_xref_table(output, trailer: DictionaryObject, offsets: Dict[Tuple[int, int], int]):
+    generations = {idnum: generation for idnum, generation in offsets}
+    # Restate the head of the free list so the section starts at object 0
+    output.write(b"xref\n0 1\n0000000000 65535 f \n")
+    for start, count in _subsections(sorted(generations)):
+        output.write(f"{start} {count}\n".encode())
+        for idnum in range(start, start + count):
+            output.write(f"{offsets[(idnum, generations[idnum])]:010d} {generations[idnum]:05d} n \n".encode())
+    output.write(b"trailer\n")
+    trailer.write_to_stream(output)
+    output.write(b"\n")
+
+
+def _write_xref_stream(output, trailer: DictionaryObject, offsets: Dict[Tuple[int, int], int], size: int):
+    # The xref stream takes the next free object number and lists itself
+    xref_idnum = size
+    entries = {idnum: (offset, generation) for (idnum, generation), offset in offsets.items()}
+    entries[xref_idnum] = (output.tell(), 0)
+
+    rows = b''.join(
+        bytes([1]) + entries[idnum][0].to_bytes(4, 'big') + entries[idnum][1].to_bytes(2, 'big')
+        for idnum in sorted(entries)
+    )
+
+    xref = DecodedStreamObject()
+    xref.update(trailer)
+    xref[NameObject('/Type')] = NameObject('/XRef')
+    xref[NameObject('/Size')] = NumberObject(size + 1)
+    xref[NameObject('/W')] = ArrayObject([NumberObject(1), NumberObject(4), NumberObject(2)])
+    xref[NameObject('/Index')] = ArrayObject(
+        [NumberObject(n) for run in _subsections(sorted(entries)) for n in run]
+    )
+    xref.set_data(rows)
+
+    output.write(f"{xref_idnum} 0 obj\n".encode())
+    xref.write_to_stream(output)
+    output.write(b"\nendobj\n")
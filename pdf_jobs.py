@@ -0,0 +1,242 @@
+"""
+Background job executor for long PDF operations
+
+Jobs run on a process-wide thread pool so they survive Streamlit reruns and
+browser refreshes; sessions only keep job IDs. Operations report page-level
+progress through the engine's progress callback, and cancellation is
+cooperative: the callback raises OperationCancelled at the next page.
+
+Admission control keeps one server from running itself out of memory: each
+job carries a memory estimate (see estimate_memory), at most JOB_WORKERS jobs
+run at once, and the estimates of running jobs must fit the memory budget.
+Jobs that do not fit yet wait in FIFO order with a visible queue position;
+jobs that could never fit are rejected up front.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Optional
+
+from pdf_engine import PARALLEL_SPLIT_MIN_PAGES, OperationCancelled
+from pdf_storage import out_of_core
+
+JOB_WORKERS = 4
+# Finished jobs (and their results) are kept this long for download
+JOB_TTL_SECONDS = 60 * 60
+
+# Peak memory model per job, fitted to the benchmark corpus: parsed objects
+# and in-memory output scale with input bytes, page tree state with pages
+MEMORY_BASE_BYTES = 8 * 1024 * 1024
+MEMORY_PER_INPUT_BYTE = 3
+MEMORY_PER_PAGE_BYTES = 16 * 1024
+# Out-of-core inputs keep stream payloads on disk, leaving a bounded working
+# set (benchmarks/bench_large.py: ~45 MB above the interpreter for a 1 GB merge)
+MEMORY_OUT_OF_CORE_BYTES = 64 * 1024 * 1024
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+REJECTED = 'rejected'
+
+
+def default_memory_budget() -> int:
+    """Memory all running jobs may use together
+
+    DOCSUITE_JOB_MEMORY_MB if set, otherwise half of physical memory.
+    """
+    if os.environ.get('DOCSUITE_JOB_MEMORY_MB'):
+        return int(os.environ['DOCSUITE_JOB_MEMORY_MB']) * 1024 * 1024
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (AttributeError, ValueError, OSError):
+        return 2 * 1024 * 1024 * 1024
+
+
+def estimate_memory(input_bytes: int, pages: int) -> int:
+    """Estimated peak memory of an operation over the given input"""
+    if out_of_core(input_bytes):
+        return MEMORY_BASE_BYTES + MEMORY_OUT_OF_CORE_BYTES + pages * MEMORY_PER_PAGE_BYTES
+    return MEMORY_BASE_BYTES + input_bytes * MEMORY_PER_INPUT_BYTE + pages * MEMORY_PER_PAGE_BYTES
+
+
+def estimate_pool_memory(input_bytes: int, pages: int, workers: int,
+                         parallel_min_pages: int = PARALLEL_SPLIT_MIN_PAGES) -> int:
+    """Estimated peak memory of a split (or text extraction) on a pool of ``workers`` processes
+
+    Every pool worker parses the whole source, as does the calling process.
+    Documents under ``parallel_min_pages`` are processed without a pool.
+    """
+    estimate = estimate_memory(input_bytes, pages)
+    if workers <= 1 or pages < parallel_min_pages:
+        return estimate
+    return estimate * (workers + 1)
+
+
+def pool_workers(input_bytes: int, pages: int, budget: Optional[int] = None,
+                 parallel_min_pages: int = PARALLEL_SPLIT_MIN_PAGES) -> int:
+    """Process pool size for a job: one per CPU, fewer if that would not fit the memory budget"""
+    budget = job_manager.memory_budget if budget is None else budget
+    workers = os.cpu_count() or 1
+    while workers > 1 and estimate_pool_memory(input_bytes, pages, workers, parallel_min_pages) > budget:
+        workers -= 1
+    return workers
+
+
+class Job:
+    """A single background operation and its progress"""
+
+    def __init__(self, label: str, memory_estimate: int = 0):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.memory_estimate = memory_estimate
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 0.0
+
+    def progress(self, done: int, total: int):
+        """Engine progress callback; raises once cancellation is requested"""
+        self.done = done
+        self.total = total
+        if self._cancel.is_set():
+            raise OperationCancelled("Cancelled by user")
+
+    def cancel(self):
+        """Ask the job to stop at its next progress report
+
+        A job still waiting for admission is cancelled right away.
+        """
+        self._cancel.set()
+        if self.status == QUEUED:
+            self._finish(CANCELLED)
+
+    def _run(self, func: Callable, args, kwargs):
+        if self._cancel.is_set():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        try:
+            self.result = func(*args, progress=self.progress, **kwargs)
+            self._finish(DONE)
+        except OperationCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            self.error = str(e)
+            self._finish(FAILED)
+
+    def _finish(self, status: str):
+        self.status = status
+        self.finished = time.time()
+
+
+class JobManager:
+    """Admission-controlled thread pool plus a registry of jobs shared by all sessions"""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, memory_budget: Optional[int] = None):
+        self.max_workers = max_workers
+        self.memory_budget = memory_budget if memory_budget is not None else default_memory_budget()
+        self.memory_reserved = 0
+        self.running = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='docsuite-job')
+        self._jobs: Dict[str, Job] = {}
+        self._waiting: Deque = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, label: str, func: Callable, *args, memory_estimate: int = 0, **kwargs) -> Job:
+        """Queue ``func(*args, progress=..., **kwargs)`` and return its job
+
+        ``memory_estimate`` is the job's expected peak memory in bytes. A job
+        whose estimate exceeds the whole budget is returned already REJECTED.
+        """
+        self.prune()
+        job = Job(label, memory_estimate)
+        with self._lock:
+            self._jobs[job.id] = job
+            if memory_estimate > self.memory_budget:
+                job.error = (f"needs about {memory_estimate / (1024 * 1024):.0f} MB of memory, more than the "
+                             f"{self.memory_budget / (1024 * 1024):.0f} MB this server allows for processing")
+                job._finish(REJECTED)
+                self.rejected += 1
+                return job
+            self._waiting.append((job, func, args, kwargs))
+            self._dispatch()
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def position(self, job: Job) -> Optional[int]:
+        """1-based place of a waiting job in the admission queue"""
+        with self._lock:
+            waiting = [queued for queued, _, _, _ in self._waiting if queued.status == QUEUED]
+        for index, queued in enumerate(waiting, 1):
+            if queued is job:
+                return index
+        return None
+
+    def stats(self) -> Dict:
+        """Current load against the concurrency and memory limits"""
+        with self._lock:
+            return {
+                'running': self.running,
+                'waiting': sum(1 for job, _, _, _ in self._waiting if job.status == QUEUED),
+                'max_workers': self.max_workers,
+                'memory_reserved': self.memory_reserved,
+                'memory_budget': self.memory_budget,
+                'rejected': self.rejected,
+            }
+
+    def prune(self, ttl: float = JOB_TTL_SECONDS):
+        """Forget finished jobs older than ``ttl`` seconds"""
+        cutoff = time.time() - ttl
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.finished is not None and job.finished < cutoff]:
+                del self._jobs[job_id]
+
+    def _dispatch(self):
+        """Start waiting jobs in order while they fit; caller holds the lock"""
+        while self._waiting:
+            job, func, args, kwargs = self._waiting[0]
+            if job.status != QUEUED:
+                self._waiting.popleft()  # Cancelled while waiting
+                continue
+            # Strict FIFO, so large jobs are not starved by a stream of small ones
+            if self.running >= self.max_workers or self.memory_reserved + job.memory_estimate > self.memory_budget:
+                return
+            self._waiting.popleft()
+            self.running += 1
+            self.memory_reserved += job.memory_estimate
+            self._executor.submit(self._execute, job, func, args, kwargs)
+
+    def _execute(self, job: Job, func: Callable, args, kwargs):
+        try:
+            job._run(func, args, kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.memory_reserved -= job.memory_estimate
+                self._dispatch()
+
+
+job_manager = JobManager()
@@ -2,159 +2,65 @@
 PDF Manager with fully functional PDF operations
 """
 
-import streamlit as st
+import functools
 import io
+import os
+import uuid
 import zipfile
-from typing import List, Tuple, Dict
-from pypdf import PdfReader, PdfWriter
-
-class PDFProcessor:
-    """PDF processing utilities"""
-
-    @staticmethod
-    def validate_pdf(file_bytes: bytes) -> bool:
-        """Validate PDF file"""
-        try:
-            reader = PdfReader(io.BytesIO(file_bytes))
-            _ = len(reader.pages)
-            return True
-        except Exception:
-            return False
-
-    @staticmethod
-    def get_pdf_info(file_bytes: bytes) -> Dict:
-        """Get PDF information"""
-        try:
-            reader = PdfReader(io.BytesIO(file_bytes))
-            return {
-                'page_count': len(reader.pages),
-                'title': getattr(reader.metadata, 'title', 'Unknown') if reader.metadata else 'Unknown'
-            }
-        except Exception:
-            return {'page_count': 0, 'title': 'Unknown'}
-
-    @staticmethod
-    def merge_pdfs(main_bytes: bytes, insert_list: List[Tuple[bytes, int]]) -> bytes:
-        """Merge PDFs with insertion points"""
-        try:
-            main_reader = PdfReader(io.BytesIO(main_bytes))
-            writer = PdfWriter()
-
-            # Sort inserts by position
-            inserts_sorted = sorted(insert_list, key=lambda x: x[1])
-            insert_index = 0
-
-            # Process main PDF pages
-            for page_num in range(len(main_reader.pages)):
-                # Add main page
-                writer.add_page(main_reader.pages[page_num])
-
-                # Check for inserts after this page
-                while (insert_index < len(inserts_sorted) and 
-                       inserts_sorted[insert_index][1] == page_num + 1):
-
-                    insert_bytes, _ = inserts_sorted[insert_index]
-                    insert_reader = PdfReader(io.BytesIO(insert_bytes))
-
-                    # Add all pages from insert PDF
-                    for insert_page in insert_reader.pages:
-                        writer.add_page(insert_page)
-
-                    insert_index += 1
-
-            # Handle beginning inserts (position 0)
-            if inserts_sorted and inserts_sorted[0][1] == 0:
-                new_writer = PdfWriter()
-
-                # Add beginning inserts first
-                for insert_bytes, position in inserts_sorted:
-                    if position == 0:
-                        insert_reader = PdfReader(io.BytesIO(insert_bytes))
-                        for page in insert_reader.pages:
-                            new_writer.add_page(page)
-
-                # Add main content
-                for page in writer.pages:
-                    new_writer.add_page(page)
-
-                writer = new_writer
-
-            # Write to bytes
-            output = io.BytesIO()
-            writer.write(output)
-            return output.getvalue()
-
-        except Exception as e:
-            st.error(f"Merge error: {str(e)}")
-            raise
-
-    @staticmethod
-    def remove_pages(pdf_bytes: bytes, pages_to_remove: List[int]) -> bytes:
-        """Remove specific pages from PDF"""
-        try:
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            writer = PdfWriter()
-
-            total_pages = len(reader.pages)
-            remove_set = set(p - 1 for p in pages_to_remove if 1 <= p <= total_pages)
-
-            # Add pages not in remove set
-            for i, page in enumerate(reader.pages):
-                if i not in remove_set:
-                    writer.add_page(page)
-
-            output = io.BytesIO()
-            writer.write(output)
-            return output.getvalue()
-
-        except Exception as e:
-            st.error(f"Remove error: {str(e)}")
-            raise
-
-    @staticmethod
-    def split_pdf(pdf_bytes: bytes, mode: str, pages_per_split: int = 1) -> Dict[str, bytes]:
-        """Split PDF into multiple files"""
-        try:
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            total_pages = len(reader.pages)
-            result = {}
-
-            if mode == 'individual':
-                # One page per file
-                for i, page in enumerate(reader.pages):
-                    writer = PdfWriter()
-                    writer.add_page(page)
-
-                    output = io.BytesIO()
-                    writer.write(output)
-                    result[f'page_{i+1}.pdf'] = output.getvalue()
-
-            elif mode == 'every_n':
-                # N pages per file
-                for start in range(0, total_pages, pages_per_split):
-                    end = min(start + pages_per_split, total_pages)
-
-                    writer = PdfWriter()
-                    for i in range(start, end):
-                        writer.add_page(reader.pages[i])
-
-                    output = io.BytesIO()
-                    writer.write(output)
-                    result[f'pages_{start+1}-{end}.pdf'] = output.getvalue()
-
-            return result
-
-        except Exception as e:
-            st.error(f"Split error: {str(e)}")
-            raise
+from typing import Dict, List, Optional
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from pdf_blobs import blob_store
+from pdf_engine import PDFProcessor, batch_statuses, write_zip_entry
+from pdf_jobs import (DONE, FAILED, QUEUED, REJECTED, estimate_memory, estimate_pool_memory, job_manager,
+                      pool_workers)
+from pdf_metrics import (
+    memory_tracing_enabled, profiling_enabled, recent_operations, rerun_stats, rerun_timer, set_memory_tracing,
+    set_profiling
+)
+from pdf_pipeline import PipelineStepError, page_count, plan_pipeline
+from pdf_results import result_cache
+from pdf_selection import PageSelection, PageSelectionError
+from pdf_storage import FileSource, Source, cleanup_expired, out_of_core, source_digest
+from pdf_text import PageTextIndex, TextQueryError, split_ranges_at, text_index
+
+# How often a running job's progress bar refreshes
+JOB_POLL_SECONDS = 1.0
+# File uploaders whose files are ingested with ingest_upload
+UPLOAD_WIDGET_KEYS = ('main_pdf_upload', 'insert_pdfs_upload', 'remove_pdf_upload', 'split_pdf_upload',
+                      'pipeline_upload', 'batch_upload')
+BATCH_STATUS_ICONS = {'waiting': '⏳', 'running': '⚙️', 'done': '✅', 'failed': '❌'}
+
+def tool_fragment(scope: str):
+    """Render a tool as a fragment that reruns on its own, timing every run"""
+    def decorate(func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with rerun_timer(scope):
+                return func(*args, **kwargs)
+        return st.fragment(timed)
+    return decorate
 
 def render_pdf_manager():
     """Main PDF Manager interface"""
 
     st.markdown("### 🔧 Professional PDF Tools")
 
+    st.toggle(
+        "💾 Large-file mode",
+        key="large_file_mode",
+        help="Keep uploads and results in temporary files on disk instead of in memory"
+    )
+    cleanup_expired()
+    blob_store.cleanup()
+    blob_store.touch_session(session_id())
+    forget_dropped_documents()
+    forget_closed_uploads()
+
     # Create tabs for different tools
-    tab1, tab2, tab3 = st.tabs(["🔗 PDF Merge", "❌ Page Remove", "✂️ PDF Splitter"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🔗 PDF Merge", "❌ Page Remove", "✂️ PDF Splitter", "🧩 Pipeline",
+                                            "📦 Batch"])
 
     with tab1:
         render_pdf_merge()
@@ -165,6 +71,15 @@ def render_pdf_manager():
     with tab3:
         render_pdf_splitter()
 
+    with tab4:
+        render_pipeline()
+
+    with tab5:
+        render_batch()
+
+    render_debug_panel()
+
+@tool_fragment('merge')
 def render_pdf_merge():
     """PDF Merge tool"""
     st.markdown('<div class="tool-section">', unsafe_allow_html=True)
@@ -182,12 +97,12 @@ def render_pdf_merge():
     )
 
     if main_pdf:
-        main_bytes = main_pdf.read()
-        if PDFProcessor.validate_pdf(main_bytes):
+        upload = ingest_upload(main_pdf)
+        if upload['valid']:
             st.session_state.main_pdf = {
                 'name': main_pdf.name,
-                'bytes': main_bytes,
-                'info': PDFProcessor.get_pdf_info(main_bytes)
+                'blob': blob_store.hold(holder('main_pdf'), upload['source'], upload['digest']),
+                'info': upload['info']
             }
 
             col1, col2 = st.columns(2)
@@ -212,18 +127,16 @@ def render_pdf_merge():
 
         if insert_pdf:
             for pdf in insert_pdf:
-                pdf_bytes = pdf.read()
-                if PDFProcessor.validate_pdf(pdf_bytes):
-                    info = PDFProcessor.get_pdf_info(pdf_bytes)
-
+                upload = ingest_upload(pdf)
+                if upload['valid']:
                     col1, col2, col3 = st.columns([3, 1, 1])
 
                     with col1:
-                        st.write(f"**{pdf.name}** ({info['page_count']} pages)")
+                        st.write(f"**{pdf.name}** ({upload['info']['page_count']} pages)")
 
                     with col2:
                         max_pages = st.session_state.main_pdf['info']['page_count']
-                        insert_pos = st.number_input(
+                        st.number_input(
                             "Insert after page",
                             min_value=0,
                             max_value=max_pages,
@@ -233,58 +146,11 @@ def render_pdf_merge():
                         )
 
                     with col3:
-                        if st.button("Add to Queue", key=f"add_{pdf.name}"):
-                            queue_item = {
-                                'name': pdf.name,
-                                'bytes': pdf_bytes,
-                                'pages': info['page_count'],
-                                'position': insert_pos
-                            }
-                            st.session_state.merge_queue.append(queue_item)
-                            st.success(f"Added {pdf.name}")
-                            st.rerun()
-
-    # Step 3: Display Queue
-    if st.session_state.merge_queue:
-        st.markdown("**Step 3: Merge Queue**")
-
-        for i, item in enumerate(st.session_state.merge_queue):
-            st.markdown(f"""
-            <div class="queue-item">
-                <strong>{item['name']}</strong> ({item['pages']} pages) 
-                → Insert after page {item['position']}
-            </div>
-            """, unsafe_allow_html=True)
-
-            if st.button(f"Remove", key=f"remove_{i}"):
-                st.session_state.merge_queue.pop(i)
-                st.rerun()
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            if st.button("🔗 Start Merge", type="primary", use_container_width=True):
-                try:
-                    with st.spinner("Merging PDFs..."):
-                        inserts = [(item['bytes'], item['position']) 
-                                 for item in st.session_state.merge_queue]
-
-                        merged = PDFProcessor.merge_pdfs(
-                            st.session_state.main_pdf['bytes'],
-                            inserts
-                        )
-
-                        st.session_state.merged_pdf = merged
-                        st.success("✅ PDFs merged successfully!")
-                        st.rerun()
+                        st.button("Add to Queue", key=f"add_{pdf.name}", on_click=queue_insert,
+                                  args=(upload, f"pos_{pdf.name}"))
 
-                except Exception as e:
-                    st.error(f"❌ Merge failed: {str(e)}")
-
-        with col2:
-            if st.button("Clear Queue", use_container_width=True):
-                st.session_state.merge_queue = []
-                st.rerun()
+        # Step 3: Queue, reran on its own when items are removed
+        render_merge_queue()
 
     # Step 4: Download
     if st.session_state.merged_pdf:
@@ -293,14 +159,15 @@ def render_pdf_merge():
         main_name = st.session_state.main_pdf['name'].replace('.pdf', '')
         filename = f"{main_name}_merged.pdf"
 
-        info = PDFProcessor.get_pdf_info(st.session_state.merged_pdf)
+        merged_pdf = blob_store.get(st.session_state.merged_pdf)
+        info = PDFProcessor.get_pdf_info(merged_pdf)
 
         col1, col2 = st.columns([3, 1])
 
         with col1:
             st.download_button(
                 "📥 Download Merged PDF",
-                data=st.session_state.merged_pdf,
+                data=download_data(merged_pdf),
                 file_name=filename,
                 mime="application/pdf",
                 type="primary",
@@ -312,6 +179,77 @@ def render_pdf_merge():
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+@tool_fragment('merge_queue')
+def render_merge_queue():
+    """Merge queue, merge controls and the merge job's progress"""
+    if st.session_state.merge_queue:
+        st.markdown("**Step 3: Merge Queue**")
+
+        for item in st.session_state.merge_queue:
+            st.markdown(f"""
+            <div class="queue-item">
+                <strong>{item['name']}</strong> ({item['pages']} pages) 
+                → Insert after page {item['position']}
+            </div>
+            """, unsafe_allow_html=True)
+
+            st.button("Remove", key=f"remove_{item['id']}", on_click=dequeue_insert, args=(item['id'],))
+
+        linearize_option('merge')
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.button("🔗 Start Merge", type="primary", use_container_width=True, on_click=start_merge)
+
+        with col2:
+            st.button("Clear Queue", use_container_width=True, on_click=clear_merge_queue)
+
+    render_job('merge', store_merge_result)
+
+def queue_insert(upload: Dict, position_key: str):
+    """Add an ingested upload to the merge queue at the position its input shows"""
+    item_id = uuid.uuid4().hex
+    st.session_state.merge_queue.append({
+        'id': item_id,
+        'name': upload['name'],
+        'blob': blob_store.hold(holder(f"merge_queue/{item_id}"), upload['source'], upload['digest']),
+        'pages': upload['info']['page_count'],
+        'position': st.session_state[position_key]
+    })
+
+def dequeue_insert(item_id: str):
+    st.session_state.merge_queue = [item for item in st.session_state.merge_queue if item['id'] != item_id]
+    blob_store.release(holder(f"merge_queue/{item_id}"))
+
+def clear_merge_queue():
+    for item in st.session_state.merge_queue:
+        blob_store.release(holder(f"merge_queue/{item['id']}"))
+    st.session_state.merge_queue = []
+
+def start_merge():
+    """Submit the queued merge as a background job"""
+    inserts = [(blob_store.get(item['blob']), item['position'])
+               for item in st.session_state.merge_queue]
+    main_source = blob_store.get(st.session_state.main_pdf['blob'])
+
+    # Each distinct document is parsed once, however often it is queued
+    unique_sources = {id(source): source for source, _ in inserts}
+    unique_sources[id(main_source)] = main_source
+    total_pages = st.session_state.main_pdf['info']['page_count'] + sum(
+        item['pages'] for item in st.session_state.merge_queue)
+
+    start_job(
+        'merge', "Merging PDFs",
+        PDFProcessor.merge_pdfs,
+        main_source,
+        inserts,
+        to_file=large_file_mode(),
+        linearize=st.session_state.get('merge_linearize', False),
+        memory_estimate=estimate_memory(sum(map(len, unique_sources.values())), total_pages)
+    )
+
+@tool_fragment('remove')
 def render_page_remove():
     """Page Remove tool"""
     st.markdown('<div class="tool-section">', unsafe_allow_html=True)
@@ -326,11 +264,11 @@ def render_page_remove():
     )
 
     if uploaded_file:
-        pdf_bytes = uploaded_file.read()
+        upload = ingest_upload(uploaded_file)
+        pdf_bytes = upload['source']
 
-        if PDFProcessor.validate_pdf(pdf_bytes):
-            info = PDFProcessor.get_pdf_info(pdf_bytes)
-            total_pages = info['page_count']
+        if upload['valid']:
+            total_pages = upload['info']['page_count']
 
             col1, col2 = st.columns(2)
 
@@ -343,20 +281,26 @@ def render_page_remove():
                 **Examples:**
                 - `2,4,6` - Remove pages 2, 4, 6
                 - `1-3,5` - Remove pages 1, 2, 3, 5
-                - `10-12` - Remove pages 10, 11, 12
+                - `10-` - Remove page 10 to the end
+                - `-1` - Remove the last page
+                - `even`, `1-9:2` - Every other page
                 """)
 
+            render_text_search('remove', pdf_bytes, "Use as pages to remove", use_matches_for_remove)
+
             # Page removal input
             remove_input = st.text_input(
                 "Pages to remove",
+                key="remove_pages_input",
                 placeholder="e.g., 2,4,10-12",
-                help="Use commas for individual pages, dashes for ranges"
+                help="Commas separate entries; dashes make ranges, negative numbers count from the end, "
+                     "':N' takes every Nth page, and 'odd'/'even' select alternating pages"
             )
 
             if remove_input:
                 try:
                     # Parse remove string
-                    pages_to_remove = parse_page_string(remove_input, total_pages)
+                    pages_to_remove = PageSelection.parse(remove_input, total_pages)
 
                     if pages_to_remove:
                         remaining = total_pages - len(pages_to_remove)
@@ -369,38 +313,50 @@ def render_page_remove():
                         with col2:
                             st.metric("Remaining Pages", remaining)
 
+                        compact = st.checkbox(
+                            "Compact output",
+                            help="Rewrite the whole file so removed pages' images and fonts are dropped. "
+                                 "Slower on large documents; by default only the page list is updated."
+                        )
+                        linearize = linearize_option('remove')
+
                         if st.button("❌ Remove Pages", type="primary"):
                             if remaining <= 0:
                                 st.error("Cannot remove all pages!")
                             else:
-                                try:
-                                    with st.spinner("Removing pages..."):
-                                        result = PDFProcessor.remove_pages(pdf_bytes, pages_to_remove)
+                                start_job(
+                                    'remove', "Removing pages",
+                                    PDFProcessor.remove_pages,
+                                    pdf_bytes, pages_to_remove, compact=compact, to_file=large_file_mode(),
+                                    linearize=linearize,
+                                    memory_estimate=estimate_memory(len(pdf_bytes), total_pages)
+                                )
+                    else:
+                        st.warning("No valid pages specified")
 
-                                    filename = f"{uploaded_file.name.replace('.pdf', '')}_removed.pdf"
+                except PageSelectionError as e:
+                    st.error(f"Invalid format: {str(e)}")
 
-                                    st.download_button(
-                                        "📥 Download PDF with Pages Removed",
-                                        data=result,
-                                        file_name=filename,
-                                        mime="application/pdf",
-                                        type="primary"
-                                    )
+            def show_remove_result(job):
+                filename = f"{uploaded_file.name.replace('.pdf', '')}_removed.pdf"
 
-                                    st.success("✅ Pages removed successfully!")
+                st.download_button(
+                    "📥 Download PDF with Pages Removed",
+                    data=download_data(job.result),
+                    file_name=filename,
+                    mime="application/pdf",
+                    type="primary"
+                )
 
-                                except Exception as e:
-                                    st.error(f"❌ Remove failed: {str(e)}")
-                    else:
-                        st.warning("No valid pages specified")
+                st.success("✅ Pages removed successfully!")
 
-                except Exception as e:
-                    st.error(f"Invalid format: {str(e)}")
+            render_job('remove', show_remove_result)
         else:
             st.error("❌ Invalid PDF file")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+@tool_fragment('split')
 def render_pdf_splitter():
     """PDF Splitter tool"""
     st.markdown('<div class="tool-section">', unsafe_allow_html=True)
@@ -415,11 +371,11 @@ def render_pdf_splitter():
     )
 
     if uploaded_file:
-        pdf_bytes = uploaded_file.read()
+        upload = ingest_upload(uploaded_file)
+        pdf_bytes = upload['source']
 
-        if PDFProcessor.validate_pdf(pdf_bytes):
-            info = PDFProcessor.get_pdf_info(pdf_bytes)
-            total_pages = info['page_count']
+        if upload['valid']:
+            total_pages = upload['info']['page_count']
 
             col1, col2 = st.columns(2)
 
@@ -431,18 +387,61 @@ def render_pdf_splitter():
                 file_size = len(pdf_bytes) / (1024 * 1024)
                 st.metric("File Size", f"{file_size:.1f} MB")
 
+            render_text_search('split', pdf_bytes, "Start a new file at each match", use_matches_for_split)
+
             # Split options
             split_mode = st.radio(
                 "Split method:",
-                ["Individual Pages", "Every N Pages"],
+                ["Individual Pages", "Every N Pages", "Custom Ranges", "Max MB per File"],
+                key="split_mode",
                 horizontal=True
             )
+            page_ranges = None
+            max_mb = None
+            size_plan = []
 
             if split_mode == "Individual Pages":
                 st.info("Split into individual PDF files (one page per file)")
                 estimated_files = total_pages
                 pages_per_split = 1
 
+            elif split_mode == "Custom Ranges":
+                pages_per_split = 1
+                page_ranges = st.text_input(
+                    "Ranges (one file per entry)",
+                    key="split_ranges_input",
+                    placeholder="e.g., 1-3,4-10,11-",
+                    help="Same syntax as page removal: 5-, -1, 1-9:2, odd, even"
+                )
+                try:
+                    estimated_files = len(PageSelection.parse_entries(page_ranges, total_pages)) if page_ranges else 0
+                except PageSelectionError as e:
+                    st.error(f"Invalid format: {str(e)}")
+                    estimated_files = 0
+                if estimated_files:
+                    st.info(f"Will create {estimated_files} files")
+
+            elif split_mode == "Max MB per File":
+                pages_per_split = 1
+                max_mb = st.number_input(
+                    "Max MB per file",
+                    min_value=0.1,
+                    value=10.0,
+                    step=0.5,
+                    help="Consecutive pages are packed into files estimated to stay under this size"
+                )
+                # Estimating sizes walks every page, so keep one plan per limit with the upload
+                size_plans = upload.setdefault('size_plans', {})
+                if max_mb not in size_plans:
+                    size_plans[max_mb] = PDFProcessor.plan_size_split(pdf_bytes, max_mb)
+                size_plan = size_plans[max_mb]
+                estimated_files = len(size_plan)
+                st.info(f"Will create ~{estimated_files} files")
+
+                oversize = sum(1 for _, _, estimate in size_plan if estimate > max_mb * 1024 * 1024)
+                if oversize:
+                    st.warning(f"{oversize} page(s) are larger than the limit on their own and will exceed it")
+
             else:  # Every N Pages
                 pages_per_split = st.number_input(
                     "Pages per file",
@@ -454,65 +453,715 @@ def render_pdf_splitter():
 
                 st.info(f"Will create ~{estimated_files} files")
 
-            if st.button("✂️ Split PDF", type="primary", use_container_width=True):
-                try:
-                    with st.spinner("Splitting PDF..."):
-                        mode = 'individual' if split_mode == "Individual Pages" else 'every_n'
-                        split_files = PDFProcessor.split_pdf(pdf_bytes, mode, pages_per_split)
-
-                    st.success(f"✅ PDF split into {len(split_files)} files!")
-
-                    if len(split_files) == 1:
-                        # Single file
-                        filename, file_bytes = next(iter(split_files.items()))
-                        st.download_button(
-                            f"📥 Download {filename}",
-                            data=file_bytes,
-                            file_name=filename,
-                            mime="application/pdf",
-                            type="primary"
-                        )
+            linearize = linearize_option('split')
+
+            if st.button("✂️ Split PDF", type="primary", use_container_width=True, disabled=not estimated_files):
+                mode = {
+                    "Individual Pages": 'individual',
+                    "Every N Pages": 'every_n',
+                    "Custom Ranges": 'ranges',
+                    "Max MB per File": 'max_size',
+                }[split_mode]
+
+                if estimated_files == 1:
+                    # Single file
+                    start_job('split', "Splitting PDF", PDFProcessor.split_pdf, pdf_bytes, mode, pages_per_split,
+                              page_ranges=page_ranges, max_mb=max_mb, linearize=linearize,
+                              memory_estimate=estimate_memory(len(pdf_bytes), total_pages))
+                else:
+                    # Stream split outputs straight into a ZIP, on as many processes as memory allows
+                    workers = pool_workers(len(pdf_bytes), total_pages)
+                    start_job(
+                        'split', "Splitting PDF",
+                        PDFProcessor.split_pdf_to_zip,
+                        pdf_bytes, mode, pages_per_split, workers=workers, to_file=large_file_mode(),
+                        page_ranges=page_ranges, max_mb=max_mb, linearize=linearize,
+                        memory_estimate=estimate_pool_memory(len(pdf_bytes), total_pages, workers)
+                    )
+
+            def show_size_report(actual_sizes: Dict[str, int]):
+                """Compare estimated and actual file sizes of a size-bounded split"""
+                estimates = {name: (pages, estimate) for name, pages, estimate in size_plan}
+                limit = max_mb * 1024 * 1024
+                over = sum(1 for size in actual_sizes.values() if size > limit)
+                if over:
+                    st.warning(f"{over} file(s) exceed {max_mb:g} MB because single pages are larger")
+                with st.expander("📏 Estimated vs actual sizes"):
+                    st.dataframe(
+                        [
+                            {
+                                'file': name,
+                                'pages': estimates[name][0] if name in estimates else None,
+                                'estimated MB': round(estimates[name][1] / (1024 * 1024), 3) if name in estimates else None,
+                                'actual MB': round(size / (1024 * 1024), 3),
+                            }
+                            for name, size in actual_sizes.items()
+                        ],
+                        use_container_width=True
+                    )
+
+            def show_split_result(job):
+                if isinstance(job.result, dict) and len(job.result) == 1:
+                    st.success(f"✅ PDF split into {len(job.result)} files!")
+
+                    filename, file_bytes = next(iter(job.result.items()))
+                    st.download_button(
+                        f"📥 Download {filename}",
+                        data=download_data(file_bytes),
+                        file_name=filename,
+                        mime="application/pdf",
+                        type="primary"
+                    )
+                    if max_mb:
+                        show_size_report({name: len(data) for name, data in job.result.items()})
+                else:
+                    if isinstance(job.result, dict):
+                        # The size limit split a part the plan expected to fit, so offer every file
+                        files = job.result
+                        zip_data, file_count = functools.partial(zip_files, files), len(files)
+                        entry_sizes = lambda: {name: len(data) for name, data in files.items()}
                     else:
-                        # Create ZIP
-                        zip_buffer = io.BytesIO()
-                        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                            for filename, file_bytes in split_files.items():
-                                zip_file.writestr(filename, file_bytes)
-
-                        zip_filename = f"{uploaded_file.name.replace('.pdf', '')}_split.zip"
-
-                        st.download_button(
-                            f"📦 Download All Files (ZIP)",
-                            data=zip_buffer.getvalue(),
-                            file_name=zip_filename,
-                            mime="application/zip",
-                            type="primary"
-                        )
+                        zip_archive, file_count = job.result
+                        zip_data = download_data(zip_archive)
+                        entry_sizes = lambda: zip_entry_sizes(zip_archive)
+
+                    st.success(f"✅ PDF split into {file_count} files!")
+
+                    zip_filename = f"{uploaded_file.name.replace('.pdf', '')}_split.zip"
 
-                        st.metric("Files Created", len(split_files))
+                    st.download_button(
+                        f"📦 Download All Files (ZIP)",
+                        data=zip_data,
+                        file_name=zip_filename,
+                        mime="application/zip",
+                        type="primary"
+                    )
 
-                except Exception as e:
-                    st.error(f"❌ Split failed: {str(e)}")
+                    st.metric("Files Created", file_count)
+                    if max_mb:
+                        show_size_report(entry_sizes())
+
+            render_job('split', show_split_result)
         else:
             st.error("❌ Invalid PDF file")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
-def parse_page_string(page_str: str, total_pages: int) -> List[int]:
-    """Parse page range string like '2,4,10-12' into list of page numbers"""
-    pages = []
-    parts = page_str.replace(' ', '').split(',')
-
-    for part in parts:
-        if '-' in part:
-            # Range like "10-12"
-            start, end = map(int, part.split('-'))
-            if 1 <= start <= end <= total_pages:
-                pages.extend(range(start, end + 1))
+def linearize_option(tool: str) -> bool:
+    """'Fast web view' checkbox of the merge, remove and split tools"""
+    return st.checkbox(
+        "⚡ Fast web view",
+        key=f"{tool}_linearize",
+        help="Linearize the output so browsers can show page 1 while the rest is still downloading. "
+             "Files come out somewhat larger."
+    )
+
+def render_text_search(tool: str, source: Source, action: str, use_matches):
+    """Find pages by their text and hand the matches to a tool's page input"""
+    with st.expander("🔎 Find pages by text"):
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            query = st.text_input(
+                "Text on the page",
+                key=f"{tool}_text_query",
+                placeholder="e.g., DRAFT",
+                help="Case-insensitive unless 'Match case' is ticked. "
+                     "In a regular expression, ^ anchors the start of the page"
+            )
+
+        with col2:
+            regex = st.checkbox("Regular expression", key=f"{tool}_text_regex")
+            case_sensitive = st.checkbox("Match case", key=f"{tool}_text_case")
+
+        if not query:
+            return
+
+        # Indexing starts with the first query and continues in the background
+        index = text_index(source)
+        if index.complete:
+            show_text_matches(tool, index, query, regex, case_sensitive, action, use_matches)
+        else:
+            render_text_matches_live(tool, index, query, regex, case_sensitive, action, use_matches)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_text_matches_live(tool: str, index: PageTextIndex, query: str, regex: bool, case_sensitive: bool,
+                             action: str, use_matches):
+    """Matches among the pages indexed so far, refreshed while indexing runs"""
+    if index.complete:
+        # Indexed: rerun the whole app so the final matches render without polling
+        st.rerun()
+    show_text_matches(tool, index, query, regex, case_sensitive, action, use_matches)
+
+def show_text_matches(tool: str, index: PageTextIndex, query: str, regex: bool, case_sensitive: bool,
+                      action: str, use_matches):
+    try:
+        matches, searched = index.search_indexed(query, regex, case_sensitive)
+    except TextQueryError as e:
+        st.error(str(e))
+        return
+
+    if index.error:
+        st.error(f"❌ Text extraction stopped after {searched} pages: {index.error}")
+    elif not index.complete:
+        st.progress(searched / index.page_count,
+                    text=f"Indexing text... {searched}/{index.page_count} pages, {len(matches)} matching so far")
+
+    if matches:
+        st.success(f"{len(matches)} matching page(s): {matches}")
+    elif index.complete:
+        st.warning("No pages match")
+
+    st.button(action, key=f"{tool}_text_apply", on_click=use_matches, args=(matches,),
+              disabled=not (matches and index.complete))
+
+def use_matches_for_remove(matches: PageSelection):
+    st.session_state.remove_pages_input = str(matches)
+
+def use_matches_for_split(matches: PageSelection):
+    st.session_state.split_mode = "Custom Ranges"
+    st.session_state.split_ranges_input = split_ranges_at(matches)
+
+@tool_fragment('pipeline')
+def render_pipeline():
+    """Pipeline builder: merge, remove, reorder and split in one pass"""
+    st.markdown('<div class="tool-section">', unsafe_allow_html=True)
+
+    st.markdown("#### 🧩 Pipeline")
+    st.info("Chain merge, remove, reorder and split steps; the result is written once, at the end")
+
+    uploads = st.file_uploader(
+        "Choose PDF files",
+        type=['pdf'],
+        accept_multiple_files=True,
+        key="pipeline_upload",
+        help="The first file is the starting document; merge steps insert the others"
+    )
+    if not uploads:
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+
+    sources = []
+    page_counts = []
+    for number, uploaded_file in enumerate(uploads, 1):
+        upload = ingest_upload(uploaded_file)
+        if not upload['valid']:
+            st.error(f"❌ Invalid PDF file: {uploaded_file.name}")
+            st.markdown('</div>', unsafe_allow_html=True)
+            return
+        sources.append(upload['source'])
+        page_counts.append(upload['info']['page_count'])
+        st.write(f"**#{number} {uploaded_file.name}** ({page_counts[-1]} pages)"
+                 + (" — starting document" if number == 1 else ""))
+
+    steps = st.session_state.pipeline_steps
+
+    # Current page count, so new steps can be validated against it
+    try:
+        segments, split = plan_pipeline(page_counts, steps)
+        plan_error = None
+    except PipelineStepError as e:
+        segments, split, plan_error = [], None, e
+
+    st.markdown("**Steps**")
+    if not steps:
+        st.caption("No steps yet: add one below")
+    for i, step in enumerate(steps):
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.markdown(f"{i + 1}. {describe_step(step, [upload.name for upload in uploads])}")
+        with col2:
+            st.button("Remove", key=f"pipeline_remove_{i}", on_click=steps.pop, args=(i,))
+
+    if split is None and not plan_error:
+        render_add_step(len(uploads), page_count(segments))
+
+    if plan_error:
+        st.error(f"❌ {plan_error}")
+    elif steps:
+        total = page_count(segments)
+        st.info(f"Result: {total} pages" + (" split into several files" if split else " in one PDF"))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🧩 Run Pipeline", type="primary", use_container_width=True):
+                unique_sizes = {id(source): len(source) for source in sources}
+                start_job(
+                    'pipeline', "Running pipeline",
+                    PDFProcessor.run_pipeline,
+                    sources, [dict(step) for step in steps], to_file=large_file_mode(),
+                    memory_estimate=estimate_memory(sum(unique_sizes.values()), total)
+                )
+        with col2:
+            st.button("Clear Steps", use_container_width=True, on_click=steps.clear)
+
+    def show_pipeline_result(job):
+        stem = uploads[0].name.replace('.pdf', '')
+        if isinstance(job.result, tuple):
+            zip_archive, file_count = job.result
+            st.success(f"✅ Pipeline finished: {file_count} files")
+            st.download_button(
+                "📦 Download All Files (ZIP)",
+                data=download_data(zip_archive),
+                file_name=f"{stem}_pipeline.zip",
+                mime="application/zip",
+                type="primary"
+            )
         else:
-            # Single page like "4"
-            page = int(part)
-            if 1 <= page <= total_pages:
-                pages.append(page)
+            st.success("✅ Pipeline finished")
+            st.download_button(
+                "📥 Download Result",
+                data=download_data(job.result),
+                file_name=f"{stem}_pipeline.pdf",
+                mime="application/pdf",
+                type="primary"
+            )
+
+    render_job('pipeline', show_pipeline_result)
+
+    st.markdown('</div>', unsafe_allow_html=True)
 
-    return sorted(list(set(pages)))  # Remove duplicates and sort
+def render_add_step(source_count: int, total_pages: int):
+    """Controls for appending one step to the pipeline"""
+    op = st.selectbox("Add step", ["Merge", "Remove Pages", "Reorder", "Split"], key="pipeline_op")
+
+    if op == "Merge":
+        col1, col2 = st.columns(2)
+        with col1:
+            st.selectbox(
+                "Insert file",
+                range(source_count),
+                index=1 if source_count > 1 else 0,
+                format_func=lambda i: f"#{i + 1}",
+                key="pipeline_merge_source"
+            )
+        with col2:
+            st.number_input(
+                "Insert after page",
+                min_value=0,
+                max_value=total_pages,
+                value=total_pages,
+                key="pipeline_merge_position",
+                help="0 = beginning; counts pages as they are after the previous steps"
+            )
+
+    elif op == "Remove Pages":
+        st.text_input("Pages to remove", placeholder="e.g., 2,4,10-12", key="pipeline_remove_pages",
+                      help="Same syntax as the Page Remove tool")
+
+    elif op == "Reorder":
+        st.text_input(
+            "New order",
+            placeholder="e.g., 5-,1-4 or reverse",
+            key="pipeline_order",
+            help="Listed entries come first, in the order given; unlisted pages follow in their current order. "
+                 "'reverse' reverses the whole document"
+        )
+
+    else:
+        mode = st.radio("Split method:", ["Every N Pages", "Individual Pages", "Custom Ranges"],
+                        horizontal=True, key="pipeline_split_mode")
+        if mode == "Every N Pages":
+            st.number_input("Pages per file", min_value=1, value=min(5, max(total_pages, 1)),
+                            key="pipeline_pages_per_split")
+        elif mode == "Custom Ranges":
+            st.text_input("Ranges (one file per entry)", placeholder="e.g., 1-3,4-10,11-", key="pipeline_ranges")
+
+    st.button("➕ Add Step", disabled=pipeline_step_from_inputs() is None, on_click=add_pipeline_step)
+
+def pipeline_step_from_inputs() -> Optional[Dict]:
+    """The step described by the add-step controls, or None while incomplete
+
+    Read from session state so a click sees the values submitted with it.
+    """
+    state = st.session_state
+    op = state.get('pipeline_op')
+    if op == "Merge":
+        return {'op': 'merge', 'inserts': [(state.pipeline_merge_source, int(state.pipeline_merge_position))]}
+    if op == "Remove Pages":
+        return {'op': 'remove', 'pages': state.pipeline_remove_pages} if state.get('pipeline_remove_pages') else None
+    if op == "Reorder":
+        return {'op': 'reorder', 'order': state.pipeline_order} if state.get('pipeline_order') else None
+
+    mode = state.get('pipeline_split_mode')
+    if mode == "Every N Pages":
+        return {'op': 'split', 'mode': 'every_n', 'pages_per_split': int(state.pipeline_pages_per_split)}
+    if mode == "Individual Pages":
+        return {'op': 'split', 'mode': 'individual'}
+    return {'op': 'split', 'mode': 'ranges', 'ranges': state.pipeline_ranges} if state.get('pipeline_ranges') else None
+
+def add_pipeline_step():
+    step = pipeline_step_from_inputs()
+    if step is not None:
+        st.session_state.pipeline_steps.append(step)
+
+def describe_step(step: Dict, names: list) -> str:
+    """One-line summary of a pipeline step"""
+    def name(index: int) -> str:
+        return names[index] if 0 <= index < len(names) else f"missing file #{index + 1}"
+
+    op = step['op']
+    if op == 'merge':
+        return "Insert " + ", ".join(f"**{name(source)}** after page {position}"
+                                     for source, position in step['inserts'])
+    if op == 'remove':
+        return f"Remove pages `{step['pages']}`"
+    if op == 'reorder':
+        return "Reverse page order" if step['order'].strip().lower() == 'reverse' else f"Reorder as `{step['order']}`"
+    if step['mode'] == 'every_n':
+        return f"Split every {step['pages_per_split']} pages"
+    if step['mode'] == 'ranges':
+        return f"Split into `{step['ranges']}`"
+    return "Split into single pages"
+
+@tool_fragment('batch')
+def render_batch():
+    """Batch tool: one page removal or split applied to many files"""
+    st.markdown('<div class="tool-section">', unsafe_allow_html=True)
+
+    st.markdown("#### 📦 Batch")
+    st.info("Apply the same page removal or split to many PDFs and download every result in one ZIP")
+
+    uploaded_files = st.file_uploader(
+        "Choose PDF files",
+        type=['pdf'],
+        accept_multiple_files=True,
+        key="batch_upload"
+    )
+    if not uploaded_files:
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+
+    uploads = [ingest_upload(uploaded_file) for uploaded_file in uploaded_files]
+    page_counts = [upload['info']['page_count'] for upload in uploads if upload['valid']]
+    invalid = [upload['name'] for upload in uploads if not upload['valid']]
+    st.write(f"**{len(uploads)} files**, {sum(page_counts)} pages")
+    if invalid:
+        st.warning(f"Not valid PDFs, will be reported as failed: {', '.join(invalid)}")
+
+    operation = st.radio("Operation", ["Remove Pages", "Split"], horizontal=True, key="batch_op")
+    if operation == "Remove Pages":
+        op = 'remove'
+        pages = st.text_input(
+            "Pages to remove from every file",
+            placeholder="e.g., 1 (cover page) or -1 (last page)",
+            key="batch_pages",
+            help="Same syntax as Page Remove, resolved against each file's own page count; "
+                 "files without those pages are reported as failed"
+        )
+        compact = st.checkbox("Compact output", key="batch_compact")
+        params = {'pages': pages, 'compact': compact}
+        ready = bool(pages)
+        if pages:
+            try:
+                # Syntax only: page numbers are checked per file
+                PageSelection.parse(pages, max(page_counts, default=1), clip=True)
+            except PageSelectionError as e:
+                st.error(f"Invalid format: {str(e)}")
+                ready = False
+    else:
+        op = 'split'
+        split_mode = st.radio(
+            "Split method:",
+            ["Individual Pages", "Every N Pages", "Custom Ranges", "Max MB per File"],
+            horizontal=True,
+            key="batch_split_mode"
+        )
+        params = {'mode': {
+            "Individual Pages": 'individual',
+            "Every N Pages": 'every_n',
+            "Custom Ranges": 'ranges',
+            "Max MB per File": 'max_size',
+        }[split_mode]}
+        ready = True
+        if split_mode == "Every N Pages":
+            params['pages_per_split'] = st.number_input("Pages per file", min_value=1, value=5,
+                                                        key="batch_pages_per_split")
+        elif split_mode == "Custom Ranges":
+            params['page_ranges'] = st.text_input("Ranges (one file per entry)", placeholder="e.g., 1-3,4-",
+                                                  key="batch_ranges")
+            ready = bool(params['page_ranges'])
+        elif split_mode == "Max MB per File":
+            params['max_mb'] = st.number_input("Max MB per file", min_value=0.1, value=10.0, step=0.5,
+                                               key="batch_max_mb")
+
+    if st.button("📦 Run Batch", type="primary", use_container_width=True, disabled=not ready):
+        documents = [(upload['name'], upload['source']) for upload in uploads]
+        st.session_state.batch_statuses = batch_statuses([name for name, _ in documents])
+        start_job(
+            'batch', f"Processing {len(documents)} files",
+            PDFProcessor.run_batch,
+            documents, op, params, to_file=large_file_mode(), statuses=st.session_state.batch_statuses,
+            memory_estimate=batch_memory_estimate(uploads)
+        )
+
+    def show_batch_result(job):
+        archive, statuses = job.result
+        failed = sum(1 for status in statuses if status['status'] == 'failed')
+        summary = f"{len(statuses) - failed} of {len(statuses)} files processed"
+        if failed:
+            st.warning(f"⚠️ {summary}; {failed} failed (see below)")
+        else:
+            st.success(f"✅ {summary}")
+        if failed < len(statuses):
+            st.download_button(
+                "📦 Download All Results (ZIP)",
+                data=download_data(archive),
+                file_name="docsuite_batch.zip",
+                mime="application/zip",
+                type="primary"
+            )
+        show_batch_statuses(statuses)
+
+    render_job('batch', show_batch_result, unit='files',
+               details=lambda job: show_batch_statuses(st.session_state.get('batch_statuses', [])))
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def show_batch_statuses(statuses: List[Dict]):
+    """Per-file table of a batch: state, outputs and errors"""
+    st.dataframe(
+        [
+            {
+                'file': status['file'],
+                'status': f"{BATCH_STATUS_ICONS[status['status']]} {status['status']}",
+                'outputs': status['files'],
+                'MB': round(status['bytes'] / (1024 * 1024), 2),
+                'seconds': round(status['seconds'], 2) if status['seconds'] is not None else None,
+                'error': status['error'] or '',
+            }
+            for status in statuses
+        ],
+        hide_index=True
+    )
+
+def batch_memory_estimate(uploads: List[Dict]) -> int:
+    """Peak memory of a batch: its largest documents running side by side on every CPU"""
+    estimates = sorted(estimate_memory(len(upload['source']), upload['info']['page_count'] if upload['valid'] else 0)
+                       for upload in uploads)
+    return sum(estimates[-(os.cpu_count() or 1):])
+
+def render_debug_panel(limit: int = 20):
+    """Collapsible view of the most recent operations' measurements"""
+    with st.expander("🛠️ Debug: recent operations"):
+        col1, col2 = st.columns(2)
+        with col1:
+            set_memory_tracing(st.toggle("Trace peak memory", value=memory_tracing_enabled(),
+                                         help="Uses tracemalloc; operations run several times slower"))
+        with col2:
+            set_profiling(st.toggle("Capture cProfile", value=profiling_enabled(),
+                                    help="Writes a .prof file per operation to the metrics directory"))
+
+        load = job_manager.stats()
+        st.caption(
+            f"Jobs (all sessions): {load['running']}/{load['max_workers']} running, {load['waiting']} waiting, "
+            f"{load['memory_reserved'] / (1024 * 1024):.0f}/{load['memory_budget'] / (1024 * 1024):.0f} MB reserved, "
+            f"{load['rejected']} rejected"
+        )
+
+        blobs = blob_store.stats()
+        st.caption(
+            f"Session documents (all sessions): {blobs['blobs']} stored for {blobs['holders']} references "
+            f"in {blobs['sessions']} sessions, {blobs['memory_bytes'] / (1024 * 1024):.1f} MB in memory + "
+            f"{blobs['disk_bytes'] / (1024 * 1024):.1f} MB on disk "
+            f"({blobs['referenced_bytes'] / (1024 * 1024):.1f} MB without sharing)"
+        )
+
+        results = result_cache.stats()
+        st.caption(
+            f"Result cache (all sessions): {results['hits']} hits, {results['misses']} misses, "
+            f"{results['entries']} entries, {results['total_bytes'] / (1024 * 1024):.1f}/"
+            f"{results['max_bytes'] / (1024 * 1024):.0f} MB on disk"
+        )
+
+        reruns = rerun_stats()
+        if reruns:
+            st.caption("Script reruns (all sessions; 'app' is a full rerun, the rest rerun one tool): " + "; ".join(
+                f"{scope} ×{stats['count']} p50 {stats['p50'] * 1000:.0f} ms, p95 {stats['p95'] * 1000:.0f} ms"
+                for scope, stats in reruns.items()
+            ))
+
+        operations = recent_operations(limit)
+        if not operations:
+            st.caption("No operations recorded yet")
+            return
+
+        st.dataframe(
+            [
+                {
+                    'op': op['op'],
+                    'status': op['status'],
+                    'seconds': op['seconds'],
+                    'pages': op['pages'],
+                    'input MB': round(op['input_bytes'] / (1024 * 1024), 2),
+                    'output MB': round(op['output_bytes'] / (1024 * 1024), 2),
+                    'peak MB': round(op['peak_memory_bytes'] / (1024 * 1024), 1) if op['peak_memory_bytes'] else None,
+                    'stages': ', '.join(f"{name} {seconds:.3f}s" for name, seconds in op['stages'].items()),
+                }
+                for op in operations
+            ],
+            use_container_width=True
+        )
+
+def start_job(tool: str, label: str, func, *args, **kwargs):
+    """Run an operation in the background and remember its job for this tool
+
+    Pass ``memory_estimate`` so the job manager can queue or reject it.
+    """
+    job = job_manager.submit(label, func, *args, **kwargs)
+    st.session_state.jobs[tool] = job.id
+    return job
+
+def render_job(tool: str, render_result, unit: str = 'pages', details=None):
+    """Show progress, failure or the finished result of a tool's job
+
+    ``unit`` names what the job's progress counts; ``details(job)`` adds
+    to the progress display while the job runs.
+    """
+    job = job_manager.get(st.session_state.jobs.get(tool))
+    if job is None:
+        return
+
+    if job.active:
+        render_job_progress(tool, unit, details)
+    elif job.status == DONE:
+        render_result(job)
+    elif job.status == FAILED:
+        st.error(f"❌ {job.label} failed: {job.error}")
+    elif job.status == REJECTED:
+        st.error(f"❌ {job.label} rejected: this document {job.error}. "
+                 "Split the work into smaller documents and try again.")
+    else:
+        st.warning(f"{job.label} cancelled")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_job_progress(tool: str, unit: str = 'pages', details=None):
+    """Progress bar and cancel button, refreshed while the job runs"""
+    job = job_manager.get(st.session_state.jobs.get(tool))
+    if job is None or not job.active:
+        # Finished: rerun the whole app so the result renders in place
+        st.rerun()
+
+    if job.status == QUEUED:
+        position = job_manager.position(job)
+        load = job_manager.stats()
+        st.progress(0.0, text=f"{job.label}: waiting for a free slot, position {position or 1} in queue "
+                              f"({load['running']}/{load['max_workers']} jobs running)")
+    else:
+        done = f"{job.done}/{job.total} {unit}" if job.total else "starting"
+        st.progress(job.fraction, text=f"{job.label}... {done}")
+
+    if st.button("Cancel", key=f"cancel_{tool}"):
+        job.cancel()
+    if details:
+        details(job)
+
+def store_merge_result(job):
+    """Move a finished merge into session state for Step 4"""
+    st.session_state.merged_pdf = blob_store.hold(holder('merged_pdf'), job.result)
+    del st.session_state.jobs['merge']
+    st.success("✅ PDFs merged successfully!")
+
+def session_id() -> str:
+    """ID of the current browser session"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'local'
+
+def holder(slot: str) -> str:
+    """Blob store holder name for one of this session's document slots"""
+    return f"{session_id()}/{slot}"
+
+def forget_dropped_documents():
+    """Clear session references to documents the blob store has released"""
+    state = st.session_state
+    if state.main_pdf and blob_store.get(state.main_pdf['blob']) is None:
+        state.main_pdf = None
+    state.merge_queue = [item for item in state.merge_queue if blob_store.get(item['blob']) is not None]
+    if state.merged_pdf and blob_store.get(state.merged_pdf) is None:
+        state.merged_pdf = None
+
+def large_file_mode() -> bool:
+    """Whether uploads and results should live on disk"""
+    return st.session_state.get('large_file_mode', False)
+
+def read_upload(uploaded_file) -> Source:
+    """Read an upload as bytes, or spool it to disk in large-file mode
+
+    Out-of-core uploads (see pdf_storage.OUT_OF_CORE_BYTES) are always
+    spooled, so operations on them run from disk.
+    """
+    uploaded_file.seek(0)
+    if not large_file_mode() and not out_of_core(uploaded_file.size):
+        return uploaded_file.read()
+    return FileSource.from_stream(uploaded_file)
+
+def ingest_upload(uploaded_file) -> Dict:
+    """Read, validate and describe an upload once per file identity
+
+    Returns {'name', 'source', 'digest', 'valid', 'info'}. Later reruns reuse
+    the entry, so no widget interaction re-reads or re-hashes a file.
+    """
+    uploads = st.session_state.setdefault('uploads', {})
+    key = (uploaded_file.file_id, large_file_mode())
+    entry = uploads.get(key)
+    if entry is not None and isinstance(entry['source'], FileSource):
+        if entry['source'].path.exists():
+            entry['source'].touch()
+        else:
+            entry = None  # Expired from storage; spool it again
+
+    if entry is None:
+        forget_closed_uploads()
+        source = read_upload(uploaded_file)
+        valid = PDFProcessor.validate_pdf(source)
+        entry = uploads[key] = {
+            'name': uploaded_file.name,
+            'source': source,
+            'digest': source_digest(source),
+            'valid': valid,
+            'info': PDFProcessor.get_pdf_info(source) if valid else None,
+        }
+    return entry
+
+def forget_closed_uploads():
+    """Drop ingested uploads that no file uploader holds any more"""
+    open_ids = set()
+    for key in UPLOAD_WIDGET_KEYS:
+        files = st.session_state.get(key) or []
+        open_ids.update(uploaded.file_id for uploaded in (files if isinstance(files, list) else [files]))
+    uploads = st.session_state.get('uploads', {})
+    for key in [key for key in uploads if key[0] not in open_ids]:
+        del uploads[key]
+
+def zip_entry_sizes(archive) -> Dict[str, int]:
+    """Uncompressed size of each entry in a split archive"""
+    if isinstance(archive, FileSource):
+        with zipfile.ZipFile(archive.path) as zip_file:
+            return {info.filename: info.file_size for info in zip_file.infolist()}
+    archive.seek(0)
+    with zipfile.ZipFile(archive) as zip_file:
+        return {info.filename: info.file_size for info in zip_file.infolist()}
+
+def zip_files(files: Dict[str, Source]) -> bytes:
+    """ZIP archive of split outputs that came back as separate files"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        for filename, data in files.items():
+            write_zip_entry(zip_file, filename, data)
+    return buffer.getvalue()
+
+def download_data(result):
+    """Data argument for st.download_button
+
+    File results are passed as a callable, so they are read from disk when
+    the button is clicked instead of on every rerun.
+    """
+    if isinstance(result, FileSource):
+        def read() -> bytes:
+            with result.open() as f:
+                return f.read()
+        return read
+    if hasattr(result, 'read'):
+        result.seek(0)
+        return result.read()
+    return result
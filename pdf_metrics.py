@@ -0,0 +1,285 @@
+"""
+Per-stage timing and memory instrumentation for PDF operations
+
+Every PDFProcessor operation runs inside ``instrument(op)``, which records wall
+time per stage, pages, input/output bytes and peak traced memory. Finished
+records are appended to a JSON-lines log, aggregated into a Prometheus
+text-format file and kept in memory for the app's debug panel.
+
+The app also times its own script reruns per scope (the whole app, or one
+tool's fragment) with ``rerun_timer``; recent timings feed rerun_stats(), and
+rerun counters go into docsuite.prom with the next operation's write.
+
+Environment:
+    DOCSUITE_METRICS_DIR    where operations.jsonl, docsuite.prom and profiles go
+    DOCSUITE_TRACE_MEMORY   set to 1 to record peak memory with tracemalloc
+                            (off by default: tracing slows pypdf several-fold)
+    DOCSUITE_PROFILE        set to 1 to capture a cProfile dump per operation
+"""
+
+import cProfile
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+METRICS_DIR = Path(os.environ.get('DOCSUITE_METRICS_DIR', Path(tempfile.gettempdir()) / 'docsuite-metrics'))
+RECENT_OPERATIONS = 50
+# Rerun timings kept per scope for percentiles
+RECENT_RERUNS = 500
+
+_trace_memory = os.environ.get('DOCSUITE_TRACE_MEMORY', '0') == '1'
+_profiling = os.environ.get('DOCSUITE_PROFILE', '0') == '1'
+
+_recent: deque = deque(maxlen=RECENT_OPERATIONS)
+_reruns: Dict[str, deque] = defaultdict(lambda: deque(maxlen=RECENT_RERUNS))
+_totals: Dict[tuple, float] = defaultdict(float)
+_lock = threading.Lock()
+# Operation being measured in the current context, if any
+_current: contextvars.ContextVar[Optional['OperationMetrics']] = contextvars.ContextVar('operation', default=None)
+
+
+class OperationMetrics:
+    """Measurements for one operation"""
+
+    def __init__(self, op: str):
+        self.op = op
+        self.started = time.time()
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.pages = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.peak_memory: Optional[int] = None
+        self.seconds = 0.0
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self.profile_path: Optional[str] = None
+        # Operation-specific extras, e.g. estimated vs actual split sizes
+        self.details: Dict = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Accumulate wall time spent in a named stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def as_dict(self) -> Dict:
+        return {
+            'op': self.op,
+            'started': self.started,
+            'status': self.status,
+            'error': self.error,
+            'seconds': round(self.seconds, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'pages': self.pages,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'peak_memory_bytes': self.peak_memory,
+            'profile': self.profile_path,
+            'details': self.details,
+        }
+
+
+def set_memory_tracing(enabled: bool):
+    """Switch tracemalloc peak-memory recording on or off"""
+    global _trace_memory
+    _trace_memory = enabled
+    if not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def memory_tracing_enabled() -> bool:
+    return _trace_memory
+
+
+def set_profiling(enabled: bool):
+    """Switch per-operation cProfile capture on or off"""
+    global _profiling
+    _profiling = enabled
+
+
+def profiling_enabled() -> bool:
+    return _profiling
+
+
+@contextmanager
+def instrument(op: str) -> Iterator[OperationMetrics]:
+    """Measure an operation; nested calls report into the outer operation
+
+    Peak memory comes from tracemalloc, which is process-wide, so operations
+    running concurrently inflate each other's peaks.
+    """
+    current = _current.get()
+    if current is not None:
+        yield current
+        return
+
+    metrics = OperationMetrics(op)
+    token = _current.set(metrics)
+
+    trace_memory = _trace_memory
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    profiler = cProfile.Profile() if _profiling else None
+    if profiler:
+        profiler.enable()
+
+    start = time.perf_counter()
+    try:
+        yield metrics
+    except GeneratorExit:
+        # A streaming operation whose consumer stopped early
+        metrics.status = 'cancelled'
+        raise
+    except BaseException as e:
+        metrics.status = getattr(e, 'metrics_status', 'error')
+        metrics.error = str(e)
+        raise
+    finally:
+        metrics.seconds = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+            metrics.profile_path = _dump_profile(profiler, metrics)
+        if trace_memory and tracemalloc.is_tracing():
+            metrics.peak_memory = tracemalloc.get_traced_memory()[1]
+        _restore(token)
+        _record(metrics)
+
+
+@contextmanager
+def suspended() -> Iterator[None]:
+    """Step out of the current operation while a streaming operation is paused at a yield
+
+    The consumer runs between yields; its own instrumented calls are recorded
+    as operations of their own instead of folding into the paused one.
+    """
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _restore(token)
+
+
+def _restore(token: contextvars.Token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A generator closed from another context never changed this one
+        pass
+
+
+def recent_operations(limit: int = RECENT_OPERATIONS) -> List[Dict]:
+    """Most recent operation records, newest first"""
+    with _lock:
+        return [metrics.as_dict() for metrics in list(_recent)[::-1][:limit]]
+
+
+@contextmanager
+def rerun_timer(scope: str) -> Iterator[None]:
+    """Record the wall time of one script rerun (or fragment rerun) under ``scope``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        with _lock:
+            _reruns[scope].append(seconds)
+            _totals[('docsuite_reruns_total', scope, None)] += 1
+            _totals[('docsuite_rerun_seconds_total', scope, None)] += seconds
+
+
+def rerun_stats() -> Dict[str, Dict]:
+    """Count and latency percentiles of recent reruns, per scope"""
+    with _lock:
+        timings = {scope: sorted(values) for scope, values in _reruns.items() if values}
+        counts = {scope: int(_totals[('docsuite_reruns_total', scope, None)]) for scope in timings}
+
+    def percentile(values: List[float], fraction: float) -> float:
+        return values[min(int(len(values) * fraction), len(values) - 1)]
+
+    return {
+        scope: {'count': counts[scope], 'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95),
+                'max': values[-1]}
+        for scope, values in sorted(timings.items())
+    }
+
+
+def _dump_profile(profiler: cProfile.Profile, metrics: OperationMetrics) -> Optional[str]:
+    try:
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        path = METRICS_DIR / f"profile-{metrics.op}-{int(metrics.started * 1000)}.prof"
+        profiler.dump_stats(path)
+        return str(path)
+    except OSError:
+        return None
+
+
+def _record(metrics: OperationMetrics):
+    with _lock:
+        _recent.append(metrics)
+        _totals[('docsuite_operations_total', metrics.op, metrics.status)] += 1
+        _totals[('docsuite_operation_seconds_total', metrics.op, None)] += metrics.seconds
+        _totals[('docsuite_pages_total', metrics.op, None)] += metrics.pages
+        _totals[('docsuite_input_bytes_total', metrics.op, None)] += metrics.input_bytes
+        _totals[('docsuite_output_bytes_total', metrics.op, None)] += metrics.output_bytes
+        for stage, seconds in metrics.stages.items():
+            _totals[('docsuite_stage_seconds_total', metrics.op, stage)] += seconds
+        if metrics.peak_memory is not None:
+            key = ('docsuite_peak_memory_bytes', metrics.op, None)
+            _totals[key] = max(_totals[key], metrics.peak_memory)
+        prom = _render_prometheus()
+
+    try:
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        with _lock:
+            with open(METRICS_DIR / 'operations.jsonl', 'a') as log:
+                log.write(json.dumps(metrics.as_dict()) + '\n')
+        # Write then rename so scrapers never see a half-written file
+        tmp_path = METRICS_DIR / f'docsuite.prom.{os.getpid()}.{threading.get_ident()}.tmp'
+        tmp_path.write_text(prom)
+        os.replace(tmp_path, METRICS_DIR / 'docsuite.prom')
+    except OSError:
+        pass  # Metrics must never break an operation
+
+
+_HELP = {
+    'docsuite_operations_total': ('counter', 'Operations finished, by status'),
+    'docsuite_operation_seconds_total': ('counter', 'Wall time spent in operations'),
+    'docsuite_stage_seconds_total': ('counter', 'Wall time spent per operation stage'),
+    'docsuite_pages_total': ('counter', 'Pages processed'),
+    'docsuite_input_bytes_total': ('counter', 'Input bytes processed'),
+    'docsuite_output_bytes_total': ('counter', 'Output bytes produced'),
+    'docsuite_peak_memory_bytes': ('gauge', 'Highest peak traced memory seen for an operation'),
+    'docsuite_reruns_total': ('counter', 'App script reruns, by scope'),
+    'docsuite_rerun_seconds_total': ('counter', 'Wall time spent in app script reruns, by scope'),
+}
+
+
+def _render_prometheus() -> str:
+    lines = []
+    for name, (kind, help_text) in _HELP.items():
+        samples = [(key, value) for key, value in sorted(_totals.items(), key=str) if key[0] == name]
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (_, op, extra), value in samples:
+            labels = f'scope="{op}"' if name.startswith('docsuite_rerun') else f'op="{op}"'
+            if extra is not None:
+                label = 'status' if name == 'docsuite_operations_total' else 'stage'
+                labels += f',{label}="{extra}"'
+            lines.append(f"{name}{{{labels}}} {value:g}")
+    return '\n'.join(lines) + '\n'
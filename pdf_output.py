@@ -0,0 +1,754 @@
+"""
+Output optimization shared by merge, remove and split
+
+Before a writer is serialized:
+
+1. identical objects are merged, so a font, ICC profile or image copied in
+   from several inputs (or several times from one input) is stored once.
+   Streams are keyed by a digest of their raw bytes; passes repeat until
+   nothing changes, so dictionaries become identical once their streams
+   have been merged;
+2. objects no longer reachable from the catalog or the info dictionary are
+   dropped.
+
+write_compact then packs every non-stream object into compressed object
+streams and ends the file with a cross-reference stream instead of a
+classic xref table. Encrypted writers fall back to the plain pypdf writer,
+because pypdf only encrypts objects written one by one.
+
+For out-of-core documents a StreamSpill moves large stream payloads to a
+temporary file as pages are copied; write_compact copies them back from
+there, so the assembled document never has to fit in memory.
+
+write_linearized instead orders the file for viewers that fetch it by byte
+ranges ("fast web view", PDF 1.7 Annex F): the catalog, a hint stream and
+every object page 1 uses come first, followed by each further page's own
+objects, the objects pages share and everything else. Objects are grouped
+the way qpdf groups them, so ``qpdf --check-linearization`` accepts the hint
+tables.
+
+All of this works on pypdf's private writer and reader state. requirements.txt
+pins the pypdf versions it was verified against; should an installed pypdf
+still lack that state, every writer is serialized by pypdf itself instead.
+"""
+
+import hashlib
+import io
+import tempfile
+import zlib
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
+from pdf_storage import STORAGE_DIR
+
+# Non-stream objects per compressed object stream
+OBJECTS_PER_STREAM = 100
+# Dedupe passes; each pass can merge one more level of nested references
+MAX_DEDUPE_PASSES = 8
+# Objects whose identity matters even when their content is the same
+DEDUPE_EXCLUDED_TYPES = {'/Catalog', '/Pages', '/Page', '/Annot', '/StructTreeRoot', '/StructElem'}
+# Stream payloads of at least this size are spilled; smaller ones stay in memory
+SPILL_MIN_BYTES = 4 * 1024
+# Readers' cached streams are dropped after this much has been spilled
+SPILL_PURGE_BYTES = 16 * 1024 * 1024
+SPILL_COPY_BYTES = 1024 * 1024
+# Linearized body (everything but the header, hints and main xref) kept in memory before spooling to disk
+LINEARIZED_SPOOL_BYTES = 32 * 1024 * 1024
+# Width the linearization dictionary's numbers are padded to; they are only known once the body is laid out
+LINEARIZED_NUMBER_WIDTH = 10
+# Catalog entries a viewer needs to open the document, placed ahead of page 1
+OPEN_DOCUMENT_KEYS = {'/ViewerPreferences', '/PageMode', '/Threads', '/OpenAction', '/AcroForm'}
+
+
+def _supports_internals() -> bool:
+    """Whether the installed pypdf has the private state the optimizer and writers rely on"""
+    try:
+        writer = PdfWriter()
+        writer.add_blank_page(1, 1)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        reader = PdfReader(buffer)
+        stream = DecodedStreamObject()
+        stream.set_data(b"x")
+        return (isinstance(writer._objects, list) and callable(writer._resolve_links)
+                and all(hasattr(writer, name) for name in ('_encryption', '_info', '_encrypt_entry'))
+                and isinstance(reader.resolved_objects, dict) and stream._data == b"x")
+    except Exception:
+        return False
+
+# Checked once at import; False sends every writer through pypdf's own write()
+PYPDF_INTERNALS = _supports_internals()
+
+
+class StreamSpill:
+    """Temporary file holding the large stream payloads of one writer
+
+    Call ``offload`` after copying pages: payloads of the writer's new stream
+    objects move to the file, and the source readers' cached copies of large
+    streams are dropped, so memory stays flat however many pages are copied.
+    The caller must hold the readers' locks. Spilled objects keep their
+    dictionary, and write_compact streams their data back from the file.
+    """
+
+    def __init__(self, writer: PdfWriter, readers: Iterable[PdfReader] = ()):
+        self.writer = writer
+        self.readers = list(readers)
+        self.spilled_bytes = 0
+        STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+        self._file = tempfile.TemporaryFile(dir=STORAGE_DIR)
+        self._scanned = 0
+        self._unpurged = 0
+
+    def offload(self):
+        """Spill the payloads of objects added since the last call"""
+        if not PYPDF_INTERNALS or self.writer._encryption is not None:
+            return
+        objects = self.writer._objects
+        for obj in objects[self._scanned:]:
+            # Only plain streams: their payload is exactly what gets written
+            if type(obj) not in (EncodedStreamObject, DecodedStreamObject) or len(obj._data) < SPILL_MIN_BYTES:
+                continue
+            data = obj._data
+            offset = self._file.seek(0, io.SEEK_END)
+            self._file.write(data)
+            obj._spilled = (offset, len(data), hashlib.blake2b(data, digest_size=20).digest())
+            obj._data = b""
+            obj.decoded_self = None
+            self.spilled_bytes += len(data)
+            self._unpurged += len(data)
+        self._scanned = len(objects)
+
+        if self._unpurged >= SPILL_PURGE_BYTES:
+            self._unpurged = 0
+            for reader in self.readers:
+                cache = reader.resolved_objects
+                for key in [key for key, obj in cache.items()
+                            if isinstance(obj, StreamObject) and len(obj._data) >= SPILL_MIN_BYTES]:
+                    del cache[key]
+
+    def copy_to(self, output: BinaryIO, offset: int, length: int):
+        """Copy a spilled payload to the output in chunks"""
+        self._file.seek(offset)
+        while length > 0:
+            chunk = self._file.read(min(length, SPILL_COPY_BYTES))
+            if not chunk:
+                raise OSError("spill file is truncated")
+            output.write(chunk)
+            length -= len(chunk)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'StreamSpill':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def optimize_writer(writer: PdfWriter) -> Dict[str, int]:
+    """Merge identical objects and drop unreachable ones in place
+
+    Returns counts of merged and dropped objects.
+    """
+    if not PYPDF_INTERNALS:
+        return {}
+    writer._resolve_links()
+    merged = _deduplicate(writer)
+    dropped = _drop_unreachable(writer)
+    return {'objects_merged': merged, 'objects_dropped': dropped,
+            'objects_written': sum(1 for obj in writer._objects if obj is not None)}
+
+
+def write_compact(writer: PdfWriter, output: BinaryIO, spill: Optional[StreamSpill] = None):
+    """Serialize a writer using object streams and a cross-reference stream
+
+    ``spill`` is the StreamSpill holding the writer's offloaded payloads.
+    """
+    if not PYPDF_INTERNALS or writer._encryption is not None:
+        writer.write(output)
+        return
+
+    objects = writer._objects
+    base = output.tell()
+    # Per object number: (type, field 2, field 3) of its xref stream entry
+    entries: List[Tuple[int, int, int]] = [(0, 0, 65535)] + [(0, 0, 0)] * len(objects)
+
+    output.write(writer.pdf_header.encode() + b"\n%\xe2\xe3\xcf\xd3\n")
+    packed = []
+    for idnum, obj in enumerate(objects, start=1):
+        if obj is None:
+            continue
+        if isinstance(obj, StreamObject):
+            entries[idnum] = (1, output.tell() - base, 0)
+            if getattr(obj, '_spilled', None) is not None:
+                _write_spilled(output, idnum, obj, spill)
+            else:
+                _write_indirect(output, idnum, obj)
+        else:
+            packed.append((idnum, obj))
+
+    next_idnum = len(objects) + 1
+    for start in range(0, len(packed), OBJECTS_PER_STREAM):
+        group = packed[start:start + OBJECTS_PER_STREAM]
+        for index, (idnum, _) in enumerate(group):
+            entries[idnum] = (2, next_idnum, index)
+        entries.append((1, output.tell() - base, 0))
+        _write_object_stream(output, next_idnum, group)
+        next_idnum += 1
+
+    xref_offset = output.tell() - base
+    entries.append((1, xref_offset, 0))
+    _write_xref_stream(output, writer, next_idnum, entries)
+    output.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def write_linearized(writer: PdfWriter, output: BinaryIO, spill: Optional[StreamSpill] = None):
+    """Serialize a writer as a linearized PDF with a page offset hint table
+
+    The writer's objects are renumbered in the process. Encrypted writers
+    and layouts that can't be linearized (no pages, a page object shared
+    between pages) fall back to write_compact.
+    """
+    if not PYPDF_INTERNALS:
+        write_compact(writer, output, spill)
+        return
+    pages = [page.indirect_reference.idnum for page in writer.pages] if writer._encryption is None else []
+    layout = _linearized_layout(writer, pages) if pages else None
+    if layout is None:
+        write_compact(writer, output, spill)
+        return
+
+    objects = writer._objects
+    # Second half (pages after the first, shared objects, the rest) takes the low numbers
+    second_half = [idnum for group in layout.page_groups[1:] for idnum in group] + layout.shared + layout.rest
+    numbers = {idnum: number for number, idnum in enumerate(second_half, start=1)}
+    lin_idnum = len(second_half) + 1
+    numbers.update({idnum: number for number, idnum in enumerate(layout.open_document, start=lin_idnum + 1)})
+    hint_idnum = lin_idnum + len(layout.open_document) + 1
+    numbers.update({idnum: number for number, idnum in enumerate(layout.page_groups[0], start=hint_idnum + 1)})
+    size = hint_idnum + len(layout.page_groups[0]) + 1
+    _renumber(writer, numbers)
+
+    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.SpooledTemporaryFile(max_size=LINEARIZED_SPOOL_BYTES, dir=STORAGE_DIR) as body:
+        # Body offsets of every object; the hint stream goes in after the open-document objects
+        spans: Dict[int, Tuple[int, int]] = {}
+        body_order = layout.open_document + [idnum for group in layout.page_groups for idnum in group]
+        for idnum in body_order + layout.shared + layout.rest:
+            obj = objects[idnum - 1]
+            start = body.tell()
+            if getattr(obj, '_spilled', None) is not None:
+                _write_spilled(body, numbers[idnum], obj, spill)
+            else:
+                _write_indirect(body, numbers[idnum], obj)
+            spans[idnum] = (start, body.tell() - start)
+        body_size = body.tell()
+        head_size = spans[layout.page_groups[0][0]][0]
+
+        header = writer.pdf_header.encode() + b"\n%\xe2\xe3\xcf\xd3\n"
+        trailer = _trailer_entries(writer, numbers)
+        # Every number in the section is padded, so zeros give its final size and layout
+        blank = _first_page_section(header, lin_idnum, {}, trailer, size, 0, 0, 0, 0, 0, 0, len(pages),
+                                    numbers[layout.page_groups[0][0]])
+        first_page_size = len(blank)
+        first_xref_offset = blank.index(b"\nxref\n") + 1
+
+        # Hint offsets are written as if the hint stream were absent (Annex F.4)
+        hint = _hint_stream(hint_idnum, layout, spans, numbers, first_page_size)
+        hint_offset = first_page_size + head_size
+
+        def offset(idnum: int) -> int:
+            start = spans[idnum][0]
+            return first_page_size + start + (len(hint) if start >= head_size else 0)
+
+        main_xref_offset = first_page_size + len(hint) + body_size
+        main_xref = [f"xref\n0 {lin_idnum}\n".encode(), b"0000000000 65535 f \n"]
+        main_xref.extend(f"{offset(idnum):010} 00000 n \n".encode() for idnum in second_half)
+        main_xref.append(f"trailer\n<< /Size {lin_idnum} >>\nstartxref\n{first_xref_offset}\n%%EOF\n".encode())
+        main_xref = b"".join(main_xref)
+
+        first_page = layout.page_groups[0]
+        first_page_end = offset(first_page[-1]) + spans[first_page[-1]][1]
+        xref_offsets = {numbers[idnum]: offset(idnum) for idnum in layout.open_document + first_page}
+        xref_offsets[lin_idnum] = len(header)
+        xref_offsets[hint_idnum] = hint_offset
+        section = _first_page_section(
+            header, lin_idnum, xref_offsets, trailer, size, main_xref_offset,
+            file_size=main_xref_offset + len(main_xref), hint_offset=hint_offset, hint_size=len(hint),
+            first_page_end=first_page_end, main_xref_first_entry=main_xref_offset + len(f"xref\n0 {lin_idnum}"),
+            pages=len(pages), first_page_idnum=numbers[first_page[0]])
+        assert len(section) == first_page_size
+
+        output.write(section)
+        _copy(body, output, 0, head_size)
+        output.write(hint)
+        _copy(body, output, head_size, body_size - head_size)
+        output.write(main_xref)
+
+
+class _LinearizedLayout:
+    """Object order of a linearized file, by the writer's original object numbers"""
+
+    def __init__(self):
+        self.open_document: List[int] = []    # catalog first
+        self.page_groups: List[List[int]] = []  # page object first; group 0 is the whole first page section
+        self.shared: List[int] = []           # used by several pages after the first
+        self.rest: List[int] = []             # page tree, thumbnails, outlines, info, ...
+        self.page_shared: List[List[int]] = []  # per page: shared objects it uses (first page section or shared)
+        self.outlines: List[int] = []
+        self.outline_users: List[int] = []
+
+
+def _linearized_layout(writer: PdfWriter, pages: List[int]) -> Optional[_LinearizedLayout]:
+    """Group objects by who uses them: the catalog, the first page, one other page or several"""
+    objects = writer._objects
+    root = writer.root_object
+    root_idnum = root.indirect_reference.idnum
+    users: Dict[int, Set[tuple]] = {}
+    used: Dict[tuple, List[int]] = {}
+
+    def traverse(owner: tuple, value):
+        visited = set()
+        stack = [(owner, value, True)]
+        while stack:
+            owner, value, top = stack.pop()
+            idnum = None
+            if isinstance(value, IndirectObject):
+                idnum = value.idnum
+                value = objects[idnum - 1] if 0 < idnum <= len(objects) else None
+                if value is None:
+                    continue
+            # Other pages are reached through their own traversal, never through links or /Parent
+            is_page = isinstance(value, DictionaryObject) and value.get('/Type') == '/Page'
+            if is_page and not top:
+                continue
+            if idnum is not None:
+                if idnum in visited:
+                    continue
+                visited.add(idnum)
+                users.setdefault(idnum, set()).add(owner)
+                used.setdefault(owner, []).append(idnum)
+            if isinstance(value, DictionaryObject):
+                for key, item in value.items():
+                    if isinstance(item, NullObject):
+                        continue
+                    if is_page and key == '/Thumb':
+                        stack.append((('thumb', owner[1]), item, False))
+                    elif not (is_page and key == '/Parent'):
+                        stack.append((owner, item, False))
+            elif isinstance(value, ArrayObject):
+                stack.extend((owner, item, False) for item in value)
+
+    for number, idnum in enumerate(pages):
+        traverse(('page', number), IndirectObject(idnum, 0, writer))
+    if writer._info is not None:
+        traverse(('trailer', '/Info'), writer._info.indirect_reference)
+    for key, value in root.items():
+        if not isinstance(value, NullObject):
+            traverse(('root_key', key), value)
+    users.setdefault(root_idnum, set()).add(('root',))
+
+    open_document, first_private, first_shared = [], [], []
+    other_private, other_shared, thumb_private, thumb_shared, outlines, other = set(), [], set(), [], [], []
+    for idnum in sorted(users):
+        in_open_document = in_first_page = in_outlines = is_root = False
+        other_pages = thumbs = others = 0
+        for owner in users[idnum]:
+            if owner[0] == 'page':
+                if owner[1] == 0:
+                    in_first_page = True
+                else:
+                    other_pages += 1
+            elif owner[0] == 'thumb':
+                thumbs += 1
+            elif owner[0] == 'root_key' and owner[1] in OPEN_DOCUMENT_KEYS:
+                in_open_document = True
+            elif owner[0] == 'root_key' and owner[1] == '/Outlines':
+                in_outlines = True
+            elif owner[0] == 'root':
+                is_root = True
+            else:
+                others += 1
+
+        if is_root:
+            continue
+        elif in_outlines:
+            outlines.append(idnum)
+        elif in_open_document:
+            open_document.append(idnum)
+        elif in_first_page and not (others or other_pages or thumbs):
+            first_private.append(idnum)
+        elif in_first_page:
+            first_shared.append(idnum)
+        elif other_pages == 1 and not (others or thumbs):
+            other_private.add(idnum)
+        elif other_pages > 1:
+            other_shared.append(idnum)
+        elif thumbs == 1 and not others:
+            thumb_private.add(idnum)
+        elif thumbs > 1:
+            thumb_shared.append(idnum)
+        else:
+            other.append(idnum)
+
+    if pages[0] not in first_private or any(idnum not in other_private for idnum in pages[1:]):
+        return None
+
+    layout = _LinearizedLayout()
+    layout.open_document = [root_idnum] + open_document
+    first_private.remove(pages[0])
+    first_page = [pages[0]] + first_private + first_shared
+
+    outline_root = root.raw_get('/Outlines') if '/Outlines' in root else None
+    if isinstance(outline_root, IndirectObject) and outline_root.idnum in outlines:
+        outlines.remove(outline_root.idnum)
+        layout.outlines = [outline_root.idnum] + outlines
+        layout.outline_users = used.get(('root_key', '/Outlines'), [])
+    else:
+        other.extend(outlines)
+    if root.get('/PageMode') == '/UseOutlines':
+        first_page.extend(layout.outlines)
+    layout.page_groups.append(first_page)
+    layout.page_shared.append([])
+
+    for number, idnum in enumerate(pages[1:], start=1):
+        other_private.discard(idnum)
+        group = [idnum]
+        for member in sorted(used[('page', number)]):
+            if member in other_private:
+                other_private.discard(member)
+                group.append(member)
+        layout.page_groups.append(group)
+    layout.shared = other_shared
+
+    shared = set(first_page) | set(other_shared)
+    for number in range(1, len(pages)):
+        layout.page_shared.append([idnum for idnum in used[('page', number)]
+                                   if idnum in shared and len(users[idnum]) > 1])
+
+    page_tree = set(used.get(('root_key', '/Pages'), []))
+    rest = [idnum for idnum in other if idnum in page_tree]
+    for number, idnum in enumerate(pages):
+        for member in used.get(('thumb', number), []):
+            if member in thumb_private:
+                thumb_private.discard(member)
+                rest.append(member)
+    rest.extend(thumb_shared)
+    if root.get('/PageMode') != '/UseOutlines':
+        rest.extend(layout.outlines)
+    rest.extend(idnum for idnum in other if idnum not in page_tree)
+    # Objects no traversal reaches (pages outside the page tree and what only they use) go last
+    placed = set(users)
+    rest.extend(idnum for idnum, obj in enumerate(objects, start=1) if obj is not None and idnum not in placed)
+    layout.rest = rest
+    return layout
+
+
+def _renumber(writer: PdfWriter, numbers: Dict[int, int]):
+    """Point every reference at its object's new number; references to unplaced objects become null"""
+    objects = writer._objects
+    references = {idnum: IndirectObject(number, 0, writer) for idnum, number in numbers.items()}
+    # Direct dictionaries may be shared between objects, so rewrite each container once
+    seen = set()
+    stack = [objects[idnum - 1] for idnum in numbers]
+    while stack:
+        container = stack.pop()
+        if not isinstance(container, (DictionaryObject, ArrayObject)) or id(container) in seen:
+            continue
+        seen.add(id(container))
+        items = container.items() if isinstance(container, DictionaryObject) else enumerate(container)
+        for key, value in list(items):
+            if isinstance(value, IndirectObject):
+                container[key] = references.get(value.idnum, NullObject())
+            elif isinstance(value, (DictionaryObject, ArrayObject)):
+                stack.append(value)
+
+
+def _trailer_entries(writer: PdfWriter, numbers: Dict[int, int]) -> str:
+    entries = [f"/Root {numbers[writer.root_object.indirect_reference.idnum]} 0 R"]
+    if writer._info is not None:
+        entries.append(f"/Info {numbers[writer._info.indirect_reference.idnum]} 0 R")
+    if writer._ID is not None:
+        id_bytes = io.BytesIO()
+        writer._ID.write_to_stream(id_bytes)
+        entries.append(f"/ID {id_bytes.getvalue().decode('latin-1')}")
+    return ' '.join(entries)
+
+
+def _first_page_section(header: bytes, lin_idnum: int, xref_offsets: Dict[int, int], trailer: str, size: int,
+                        main_xref_offset: int, file_size: int, hint_offset: int, hint_size: int,
+                        first_page_end: int, main_xref_first_entry: int, pages: int,
+                        first_page_idnum: int) -> bytes:
+    """File header, linearization dictionary and first-page xref section, at a fixed size"""
+    w = LINEARIZED_NUMBER_WIDTH
+    parameters = (f"{lin_idnum} 0 obj\n<< /Linearized 1 /L {file_size:<{w}} /H [ {hint_offset:<{w}} {hint_size:<{w}} ] "
+                  f"/O {first_page_idnum} /E {first_page_end:<{w}} /N {pages} /T {main_xref_first_entry:<{w}} >>\n"
+                  f"endobj\n")
+    xref = [f"xref\n{lin_idnum} {size - lin_idnum}\n"]
+    xref.extend(f"{xref_offsets.get(number, 0):010} 00000 n \n" for number in range(lin_idnum, size))
+    xref.append(f"trailer\n<< /Size {size} {trailer} /Prev {main_xref_offset:<{w}} >>\nstartxref\n0\n%%EOF\n")
+    return header + parameters.encode() + ''.join(xref).encode('latin-1')
+
+
+def _hint_stream(idnum: int, layout: _LinearizedLayout, spans: Dict[int, Tuple[int, int]],
+                 numbers: Dict[int, int], first_page_size: int) -> bytes:
+    """Primary hint stream: page offset, shared object and outline hint tables"""
+    def length(group: List[int]) -> int:
+        return sum(spans[idnum][1] for idnum in group)
+
+    def offset(idnum: int) -> int:
+        return first_page_size + spans[idnum][0]
+
+    # Page offset hint table (Annex F.4.1)
+    shared_entries = layout.page_groups[0] + layout.shared
+    shared_index = {idnum: index for index, idnum in enumerate(shared_entries)}
+    counts = [len(group) for group in layout.page_groups]
+    lengths = [length(group) for group in layout.page_groups]
+    nshared = [len(shared) for shared in layout.page_shared]
+    bits = _BitWriter()
+    for value, width in ((min(counts), 32), (offset(layout.page_groups[0][0]), 32),
+                         (_nbits(max(counts) - min(counts)), 16), (min(lengths), 32),
+                         (_nbits(max(lengths) - min(lengths)), 16), (0, 32), (0, 16), (min(lengths), 32),
+                         (_nbits(max(lengths) - min(lengths)), 16), (_nbits(max(nshared)), 16),
+                         (_nbits(len(shared_entries)), 16), (0, 16), (1, 16)):
+        bits.write(value, width)
+    bits.write_items([count - min(counts) for count in counts], _nbits(max(counts) - min(counts)))
+    bits.write_items([size - min(lengths) for size in lengths], _nbits(max(lengths) - min(lengths)))
+    bits.write_items(nshared, _nbits(max(nshared)))
+    bits.write_items([shared_index[idnum] for shared in layout.page_shared for idnum in shared],
+                     _nbits(len(shared_entries)))
+    # Content stream offsets are left at zero and lengths repeat the page lengths, as Acrobat does
+    bits.write_items([size - min(lengths) for size in lengths], _nbits(max(lengths) - min(lengths)))
+
+    # Shared object hint table (Annex F.4.2): one object per group
+    shared_table = len(bits.data)
+    group_lengths = [spans[idnum][1] for idnum in shared_entries]
+    first_shared = layout.shared[0] if layout.shared else None
+    for value, width in ((numbers[first_shared] if first_shared else 0, 32),
+                         (offset(first_shared) if first_shared else 0, 32), (len(layout.page_groups[0]), 32),
+                         (len(shared_entries), 32), (0, 16), (min(group_lengths), 32),
+                         (_nbits(max(group_lengths) - min(group_lengths)), 16)):
+        bits.write(value, width)
+    bits.write_items([size - min(group_lengths) for size in group_lengths],
+                     _nbits(max(group_lengths) - min(group_lengths)))
+    bits.write_items([0] * len(group_lengths), 1)
+
+    entries = f"/S {shared_table}"
+    if layout.outlines:
+        # Outline hint table (Annex F.4.5, generic)
+        entries += f" /O {len(bits.data)}"
+        first = layout.outlines[0]
+        end = max(spans[idnum][0] + spans[idnum][1] for idnum in layout.outline_users)
+        for value in (numbers[first], offset(first), len(layout.outlines), end - spans[first][0]):
+            bits.write(value, 32)
+
+    data = zlib.compress(bytes(bits.data))
+    return (f"{idnum} 0 obj\n<< {entries} /Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode()
+            + data + b"\nendstream\nendobj\n")
+
+
+class _BitWriter:
+    """Big-endian bit packing for hint tables"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._value = 0
+        self._bits = 0
+
+    def write(self, value: int, width: int):
+        self._value = (self._value << width) | value
+        self._bits += width
+        while self._bits >= 8:
+            self._bits -= 8
+            self.data.append((self._value >> self._bits) & 0xFF)
+        self._value &= (1 << self._bits) - 1
+
+    def write_items(self, values: Iterable[int], width: int):
+        """Write one hint table item for every page or group, then pad to a byte boundary"""
+        if width:
+            for value in values:
+                self.write(value, width)
+        if self._bits:
+            self.write(0, 8 - self._bits)
+
+
+def _nbits(value: int) -> int:
+    return value.bit_length()
+
+
+def _copy(source: BinaryIO, output: BinaryIO, offset: int, length: int):
+    source.seek(offset)
+    while length > 0:
+        chunk = source.read(min(length, SPILL_COPY_BYTES))
+        if not chunk:
+            raise OSError("linearized body is truncated")
+        output.write(chunk)
+        length -= len(chunk)
+
+
+def _deduplicate(writer: PdfWriter) -> int:
+    objects = writer._objects
+    protected = _trailer_objects(writer)
+    keys: Dict[int, Tuple[str, bytes]] = {}
+    for idnum, obj in enumerate(objects, start=1):
+        if obj is not None and idnum not in protected and not _identity_matters(obj):
+            keys[idnum] = _content_key(obj)
+
+    merged = 0
+    for _ in range(MAX_DEDUPE_PASSES):
+        canonical: Dict[Tuple[str, bytes], IndirectObject] = {}
+        replacements: Dict[int, IndirectObject] = {}
+        for idnum, key in keys.items():
+            first = canonical.get(key)
+            if first is None:
+                canonical[key] = IndirectObject(idnum, 0, writer)
+            else:
+                replacements[idnum] = first
+
+        if not replacements:
+            break
+        for idnum in replacements:
+            objects[idnum - 1] = None
+            del keys[idnum]
+        # Only objects that pointed at a merged object can have become identical
+        for idnum, obj in enumerate(objects, start=1):
+            if obj is not None and _replace_references(obj, replacements) and idnum in keys:
+                keys[idnum] = _content_key(obj)
+        merged += len(replacements)
+    return merged
+
+
+def _identity_matters(obj) -> bool:
+    return isinstance(obj, DictionaryObject) and obj.get('/Type') in DEDUPE_EXCLUDED_TYPES
+
+
+def _content_key(obj) -> Tuple[str, bytes]:
+    """Digest that is equal for objects that serialize to the same bytes"""
+    # repr() drops types (a name and a string can both show as '/A'), the written bytes don't
+    serialized = io.BytesIO()
+    digest = hashlib.blake2b(digest_size=20)
+    if isinstance(obj, StreamObject):
+        DictionaryObject(obj).write_to_stream(serialized)
+        digest.update(serialized.getvalue())
+        # Spilled payloads are compared by the digest taken when they were spilled
+        spilled = getattr(obj, '_spilled', None)
+        digest.update(spilled[2] if spilled is not None else hashlib.blake2b(obj._data, digest_size=20).digest())
+    else:
+        obj.write_to_stream(serialized)
+        digest.update(serialized.getvalue())
+    return type(obj).__name__, digest.digest()
+
+
+def _replace_references(obj, replacements: Dict[int, IndirectObject]) -> bool:
+    """Point references at merged objects to their replacements"""
+    changed = False
+    stack = [obj]
+    while stack:
+        container = stack.pop()
+        items = container.items() if isinstance(container, DictionaryObject) else enumerate(container)
+        for key, value in list(items):
+            if isinstance(value, IndirectObject):
+                if value.idnum in replacements:
+                    container[key] = replacements[value.idnum]
+                    changed = True
+            elif isinstance(value, (DictionaryObject, ArrayObject)):
+                stack.append(value)
+    return changed
+
+
+def _drop_unreachable(writer: PdfWriter) -> int:
+    objects = writer._objects
+    reachable = set()
+    stack = [IndirectObject(idnum, 0, writer) for idnum in _trailer_objects(writer)]
+    stack.extend(writer._ID or ())
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is writer and obj.idnum not in reachable and 0 < obj.idnum <= len(objects):
+                reachable.add(obj.idnum)
+                stack.append(objects[obj.idnum - 1])
+        elif isinstance(obj, DictionaryObject):
+            stack.extend(obj.values())
+        elif isinstance(obj, ArrayObject):
+            stack.extend(obj)
+
+    dropped = 0
+    for idnum, obj in enumerate(objects, start=1):
+        if obj is not None and idnum not in reachable:
+            objects[idnum - 1] = None
+            dropped += 1
+    return dropped
+
+
+def _trailer_objects(writer: PdfWriter) -> set:
+    """Object numbers referenced from the trailer"""
+    roots = [writer.root_object, writer._info, writer._encrypt_entry]
+    return {obj.indirect_reference.idnum for obj in roots
+            if obj is not None and obj.indirect_reference is not None}
+
+
+def _write_indirect(output: BinaryIO, idnum: int, obj):
+    output.write(f"{idnum} 0 obj\n".encode())
+    obj.write_to_stream(output)
+    output.write(b"\nendobj\n")
+
+
+def _write_spilled(output: BinaryIO, idnum: int, obj: StreamObject, spill: StreamSpill):
+    offset, length, _ = obj._spilled
+    header = DictionaryObject(obj)
+    header[NameObject('/Length')] = NumberObject(length)
+    output.write(f"{idnum} 0 obj\n".encode())
+    header.write_to_stream(output)
+    output.write(b"\nstream\n")
+    spill.copy_to(output, offset, length)
+    output.write(b"\nendstream\nendobj\n")
+
+
+def _write_object_stream(output: BinaryIO, idnum: int, group: List[Tuple[int, object]]):
+    header = []
+    body = io.BytesIO()
+    for member, obj in group:
+        header.append(f"{member} {body.tell()}")
+        obj.write_to_stream(body)
+        body.write(b"\n")
+    header = ' '.join(header).encode() + b"\n"
+    data = zlib.compress(header + body.getvalue())
+
+    output.write(f"{idnum} 0 obj\n<< /Type /ObjStm /N {len(group)} /First {len(header)} "
+                 f"/Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode())
+    output.write(data)
+    output.write(b"\nendstream\nendobj\n")
+
+
+def _write_xref_stream(output: BinaryIO, writer: PdfWriter, idnum: int, entries: List[Tuple[int, int, int]]):
+    offset_width = max((max(field for _, field, _ in entries).bit_length() + 7) // 8, 1)
+    rows = b''.join(kind.to_bytes(1, 'big') + field2.to_bytes(offset_width, 'big') + field3.to_bytes(2, 'big')
+                    for kind, field2, field3 in entries)
+    data = zlib.compress(rows)
+
+    trailer = [f"/Type /XRef /Size {len(entries)} /W [1 {offset_width} 2]",
+               f"/Root {writer.root_object.indirect_reference.idnum} 0 R"]
+    if writer._info is not None:
+        trailer.append(f"/Info {writer._info.indirect_reference.idnum} 0 R")
+    if writer._ID is not None:
+        id_bytes = io.BytesIO()
+        writer._ID.write_to_stream(id_bytes)
+        trailer.append(f"/ID {id_bytes.getvalue().decode('latin-1')}")
+
+    output.write(f"{idnum} 0 obj\n<< {' '.join(trailer)} /Filter /FlateDecode /Length {len(data)} >>\n"
+                 f"stream\n".encode('latin-1'))
+    output.write(data)
+    output.write(b"\nendstream\nendobj\n")
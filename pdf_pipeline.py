@@ -0,0 +1,197 @@
+"""
+Multi-step document pipelines planned over page references
+
+A pipeline starts from its first source document and applies steps in order.
+Each step sees the document as the previous step left it:
+
+    {'op': 'merge', 'inserts': [(source_index, position), ...]}
+        insert whole sources after page ``position`` (0 = beginning)
+    {'op': 'remove', 'pages': '2,4,10-'}
+        drop a page selection (see pdf_selection for the syntax)
+    {'op': 'reorder', 'order': '5-,1-4'}
+        put the listed entries first, in the order given; unlisted pages
+        follow in their current order. 'reverse' reverses the document
+    {'op': 'split', 'mode': 'every_n', 'pages_per_split': 10, 'ranges': None}
+        last step only: one output per part instead of a single document
+
+Planning never touches a PDF. The working document is a list of segments,
+(source index, page range) pairs, so dropping every other page of a huge
+file is one stepped range rather than a list of page numbers. The engine
+copies the planned pages from the parsed sources and serializes each output
+once (see PDFProcessor.run_pipeline).
+"""
+
+import bisect
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pdf_selection import PageSelection, PageSelectionError
+
+# (source index, zero-based pages of that source)
+Segment = Tuple[int, range]
+
+STEP_OPS = ('merge', 'remove', 'reorder', 'split')
+# Split modes that only depend on the page count; 'max_size' needs the sources
+PIPELINE_SPLIT_MODES = ('individual', 'every_n', 'ranges')
+
+
+class PipelineStepError(ValueError):
+    """A pipeline step is malformed or does not fit the document at that point"""
+
+    def __init__(self, message: str, step: Optional[int] = None):
+        super().__init__(message if step is None else f"Step {step + 1}: {message}")
+        self.step = step
+
+
+def plan_pipeline(page_counts: List[int], steps: List[Dict]) -> Tuple[List[Segment], Optional[Dict]]:
+    """Resolve steps against the sources' page counts
+
+    Returns the final document's segments and the split step, if the
+    pipeline ends with one.
+    """
+    if not page_counts:
+        raise PipelineStepError("A pipeline needs at least one source document")
+    segments = _extend([], [(0, range(page_counts[0]))])
+    split = None
+
+    for number, step in enumerate(steps):
+        op = step.get('op')
+        if split is not None:
+            raise PipelineStepError("Split must be the last step", number)
+        try:
+            if op == 'merge':
+                segments = _merge(segments, page_counts, step.get('inserts') or [])
+            elif op == 'remove':
+                selection = PageSelection.parse(str(step.get('pages') or ''), page_count(segments))
+                if len(selection) >= page_count(segments):
+                    raise PipelineStepError("Cannot remove every page")
+                segments = select(segments, selection.complement())
+            elif op == 'reorder':
+                segments = _reorder(segments, str(step.get('order') or ''))
+            elif op == 'split':
+                if step.get('mode') not in PIPELINE_SPLIT_MODES:
+                    raise PipelineStepError(f"Split mode must be one of {', '.join(PIPELINE_SPLIT_MODES)}")
+                if step['mode'] == 'every_n' and int(step.get('pages_per_split') or 0) < 1:
+                    raise PipelineStepError("Pages per split must be at least 1")
+                if step['mode'] == 'ranges':
+                    PageSelection.parse_entries(str(step.get('ranges') or ''), page_count(segments))
+                split = step
+            else:
+                raise PipelineStepError(f"Unknown step '{op}'; expected one of {', '.join(STEP_OPS)}")
+        except PipelineStepError as e:
+            if e.step is not None:
+                raise
+            raise PipelineStepError(str(e), number) from e
+        except (PageSelectionError, ValueError, TypeError) as e:
+            raise PipelineStepError(str(e), number) from e
+
+    return segments, split
+
+
+def page_count(segments: List[Segment]) -> int:
+    return sum(len(pages) for _, pages in segments)
+
+
+def take(segments: List[Segment], positions: range) -> List[Segment]:
+    """Segments for the pages at ``positions`` (ascending) of the document"""
+    starts = [0] + list(accumulate(len(pages) for _, pages in segments))
+    result: List[Segment] = []
+    if not positions:
+        return result
+    index = bisect.bisect_right(starts, positions.start) - 1
+    while index < len(segments) and starts[index] < positions.stop:
+        source, pages = segments[index]
+        offset = starts[index]
+        # First wanted position inside this segment, keeping the stride's phase
+        first = positions.start
+        if first < offset:
+            first += -(-(offset - first) // positions.step) * positions.step
+        local = range(first - offset, min(positions.stop, offset + len(pages)) - offset, positions.step)
+        if local:
+            _extend(result, [(source, pages[local.start:local.stop:local.step])])
+        index += 1
+    return result
+
+
+def select(segments: List[Segment], selection: PageSelection) -> List[Segment]:
+    """Segments for the selected pages, in document order"""
+    ranges = sorted(selection.ranges, key=lambda r: r.start)
+    if all(a[-1] < b.start for a, b in zip(ranges, ranges[1:])):
+        result: List[Segment] = []
+        for positions in ranges:
+            _extend(result, take(segments, positions))
+        return result
+
+    # Interleaved strides (say 1-9:2 with 2-4): take runs of consecutive pages instead
+    result = []
+    for positions in _runs(selection):
+        _extend(result, take(segments, positions))
+    return result
+
+
+def _merge(segments: List[Segment], page_counts: List[int], inserts: List) -> List[Segment]:
+    total = page_count(segments)
+    by_position: Dict[int, List[int]] = {}
+    for insert in inserts:
+        source, position = (insert['source'], insert['position']) if isinstance(insert, dict) else insert
+        source = int(source)
+        if not 0 <= source < len(page_counts):
+            raise PipelineStepError(f"No source document #{source + 1}")
+        position = min(max(int(position), 0), total)
+        by_position.setdefault(position, []).append(source)
+
+    result: List[Segment] = []
+    previous = 0
+    for position in sorted(by_position):
+        _extend(result, take(segments, range(previous, position)))
+        for source in by_position[position]:
+            _extend(result, [(source, range(page_counts[source]))])
+        previous = position
+    _extend(result, take(segments, range(previous, total)))
+    return result
+
+
+def _reorder(segments: List[Segment], order: str) -> List[Segment]:
+    if order.strip().lower() == 'reverse':
+        return _extend([], [(source, pages[::-1]) for source, pages in reversed(segments)])
+
+    total = page_count(segments)
+    entries = PageSelection.parse_entries(order, total)
+    listed = PageSelection(total)
+    result: List[Segment] = []
+    for entry in entries:
+        if entry & listed:
+            raise PipelineStepError(f"Page order lists pages {entry & listed} more than once")
+        listed = listed | entry
+        _extend(result, select(segments, entry))
+    return _extend(result, select(segments, listed.complement()))
+
+
+def _extend(result: List[Segment], segments: Iterable[Segment]) -> List[Segment]:
+    """Append segments, joining each onto the previous one where they continue it"""
+    for source, pages in segments:
+        if not pages:
+            continue
+        if result:
+            last_source, last = result[-1]
+            if last_source == source and last[-1] + last.step == pages.start and (
+                    len(pages) == 1 or pages.step == last.step):
+                result[-1] = (source, range(last.start, pages[-1] + last.step, last.step))
+                continue
+            if last_source == source and len(last) == 1 and len(pages) == 1 and last.start != pages.start:
+                step = pages.start - last.start
+                result[-1] = (source, range(last.start, pages.start + (1 if step > 0 else -1), step))
+                continue
+        result.append((source, pages))
+    return result
+
+
+def _runs(indexes: Iterable[int]) -> List[range]:
+    """Group ascending indexes into runs of consecutive ones"""
+    runs: List[range] = []
+    for index in indexes:
+        if runs and runs[-1].stop == index:
+            runs[-1] = range(runs[-1].start, index + 1)
+        else:
+            runs.append(range(index, index + 1))
+    return runs
@@ -0,0 +1,313 @@
+"""
+Staged upload probe that reads only the ends of a PDF
+
+Stages, cheapest first:
+
+1. header   ``%PDF-`` magic near the start of the file
+2. tail     ``startxref`` / ``%%EOF`` near the end
+3. trailer  trailer dictionary, then Root -> Pages ``/Count`` and the Info title,
+            resolving just those objects through the cross-reference data
+
+Garbage uploads fail in the header stage without parsing anything. The
+trailer stage reads a handful of objects instead of the whole
+cross-reference table and page tree, so page counts of large files are known
+immediately. Anything the later stages cannot handle is reported as
+inconclusive and left to a full parse: a tail without ``startxref``/``%%EOF``
+(a truncated file, or a valid one followed by padding or other trailing
+bytes), encryption, or damaged cross-references that need pypdf's repair
+logic.
+"""
+
+import io
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pypdf.generic import DictionaryObject, IndirectObject, StreamObject, read_object
+
+from pdf_storage import FileSource, Source
+
+try:
+    import magic  # python-magic; needs the libmagic system library
+except ImportError:
+    magic = None
+
+STAGE_HEADER = 'header'
+STAGE_TAIL = 'tail'
+STAGE_TRAILER = 'trailer'
+
+# The header may be preceded by junk; pypdf accepts it within this window
+HEADER_SEARCH_BYTES = 1024
+# startxref and %%EOF must sit within this many bytes of the end
+TAIL_SEARCH_BYTES = 2048
+# Cross-reference sections followed through /Prev before giving up
+MAX_XREF_SECTIONS = 64
+# Bytes copied per object parse; grown for objects that do not fit
+PARSE_WINDOW_BYTES = 64 * 1024
+
+_HEADER_RE = re.compile(rb'%PDF-(\d\.\d)')
+_WHITESPACE = b' \t\r\n\x00\x0c'
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)\s*%%EOF')
+_OBJ_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj')
+_SUBSECTION_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s*?(?:\r\n|\r|\n)')
+
+
+class ProbeError(Exception):
+    """Raised by a probe stage that cannot reach a conclusion"""
+
+
+class ProbeResult(NamedTuple):
+    """Outcome of probing one upload
+
+    ``valid`` is False only when the upload is definitely not a usable PDF.
+    ``page_count`` is None when the trailer stage was inconclusive and a full
+    parse is needed for details.
+    """
+    valid: bool
+    stage: str
+    error: Optional[str] = None
+    version: Optional[str] = None
+    page_count: Optional[int] = None
+    title: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.valid and self.page_count is not None
+
+    @property
+    def info(self) -> Dict:
+        """Page count and title in the shape returned by get_pdf_info"""
+        return {'page_count': self.page_count, 'title': self.title}
+
+
+def probe_pdf(source: Source) -> ProbeResult:
+    """Run the probe stages until one fails or the page count is known"""
+    data = source.view if isinstance(source, FileSource) else source
+
+    match = _HEADER_RE.search(data[:HEADER_SEARCH_BYTES])
+    if match is None:
+        return ProbeResult(False, STAGE_HEADER, _describe_non_pdf(data))
+    version = match.group(1).decode()
+
+    matches = list(_STARTXREF_RE.finditer(data, max(len(data) - TAIL_SEARCH_BYTES, 0)))
+    if not matches:
+        # Truncated, or followed by padding, a signature or other trailing bytes:
+        # only a full parse can tell those apart
+        return ProbeResult(True, STAGE_TAIL, "no startxref/%%EOF at the end of the file", version)
+    startxref = int(matches[-1].group(1))
+
+    try:
+        page_count, title = TrailerReader(data, startxref).page_count_and_title()
+    except Exception as e:
+        return ProbeResult(True, STAGE_TRAILER, str(e), version)
+    return ProbeResult(True, STAGE_TRAILER, None, version, page_count, title)
+
+
+def _describe_non_pdf(data) -> str:
+    """Error message for data without a PDF header"""
+    if not len(data):
+        return "Empty file"
+    if magic is not None:
+        try:
+            return f"Not a PDF (detected {magic.from_buffer(bytes(data[:2048]), mime=True)})"
+        except Exception:
+            pass
+    return "Not a PDF: missing %PDF- header"
+
+
+class TrailerReader:
+    """Resolves individual objects through the cross-reference sections
+
+    Acts as the ``pdf`` argument of pypdf's object parser, so indirect
+    references inside parsed objects resolve lazily through ``get_object``.
+    """
+
+    strict = False
+
+    def __init__(self, data, startxref: int):
+        self.data = data
+        self.startxref = startxref
+        self.trailer: Optional[DictionaryObject] = None
+        # (kind, payload) per section, newest first; parsed on demand
+        self._sections: List[Tuple[str, object]] = []
+        self._next_section: Optional[int] = startxref
+        self._objects: Dict[int, object] = {}
+        self._object_streams: Dict[int, Tuple[bytes, Dict[int, int]]] = {}
+
+    def page_count_and_title(self) -> Tuple[int, Optional[str]]:
+        self._load_next_section()
+        trailer = self.trailer
+        if '/Encrypt' in trailer:
+            raise ProbeError("encrypted document")
+
+        root = trailer['/Root'].get_object()
+        count = root['/Pages'].get_object()['/Count']
+        if isinstance(count, IndirectObject):
+            count = count.get_object()
+
+        # Same rules as pypdf's DocumentInformation.title
+        title = 'Unknown'
+        if '/Info' in trailer:
+            info = trailer['/Info'].get_object()
+            title = info.get('/Title')
+            title = str(title.get_object()) if title is not None else None
+        return int(count), title
+
+    def get_object(self, ref) -> object:
+        """Resolve an IndirectObject (or object number)"""
+        idnum = ref.idnum if isinstance(ref, IndirectObject) else int(ref)
+        if idnum not in self._objects:
+            self._objects[idnum] = self._read_object(idnum)
+        return self._objects[idnum]
+
+    # -- cross-reference sections ------------------------------------------------
+
+    def _load_next_section(self):
+        offset = self._next_section
+        if offset is None or offset >= len(self.data):
+            raise ProbeError("object not found in cross-reference data")
+        if len(self._sections) >= MAX_XREF_SECTIONS:
+            raise ProbeError("too many cross-reference sections")
+        self._next_section = None
+
+        if self.data[offset:offset + 4] == b'xref':
+            trailer, table = self._read_xref_table(offset)
+            self._sections.append(('table', table))
+            if '/XRefStm' in trailer:
+                # Hybrid file: the stream holds entries the table leaves out
+                self._sections.append(('stream', self._read_xref_stream(int(trailer['/XRefStm']))))
+        else:
+            trailer = self._read_xref_stream(offset)
+            self._sections.append(('stream', trailer))
+
+        if self.trailer is None:
+            self.trailer = trailer
+        if '/Prev' in trailer:
+            self._next_section = int(trailer['/Prev'])
+
+    def _read_xref_table(self, offset: int) -> Tuple[DictionaryObject, List[Tuple[int, int, int, int]]]:
+        """Parse subsection headers and the trailer; entries stay unread"""
+        subsections = []  # (first object, count, entries offset, entry width)
+        position = offset + 4
+        while True:
+            match = _SUBSECTION_RE.match(self.data, position)
+            if match is None:
+                break
+            first, count = int(match.group(1)), int(match.group(2))
+            position = match.end()
+            width = self._entry_width(position) if count else 20
+            subsections.append((first, count, position, width))
+            position += count * width
+
+        end = self.data.find(b'trailer', position, position + 64)
+        if end < 0:
+            raise ProbeError("trailer keyword not found")
+        trailer = self._parse_at(end + len(b'trailer'))
+        if not isinstance(trailer, DictionaryObject):
+            raise ProbeError("trailer is not a dictionary")
+        return trailer, subsections
+
+    def _entry_width(self, position: int) -> int:
+        # Entries are 20 bytes, but some writers use a bare EOL
+        entry = self.data[position:position + 20]
+        return 19 if entry[18:19] in (b'\n', b'\r') and entry[19:20] not in (b'\n', b'\r') else 20
+
+    def _read_xref_stream(self, offset: int) -> StreamObject:
+        xref = self._read_indirect(offset)
+        if not isinstance(xref, StreamObject) or xref.get('/Type') != '/XRef':
+            raise ProbeError("startxref does not point at a cross-reference stream")
+        return xref
+
+    def _lookup(self, idnum: int) -> Tuple[int, int, int]:
+        """Return (type, field2, field3) of the newest entry for an object"""
+        index = 0
+        while True:
+            while index >= len(self._sections):
+                self._load_next_section()
+            kind, section = self._sections[index]
+            entry = self._table_entry(section, idnum) if kind == 'table' else self._stream_entry(section, idnum)
+            if entry is not None:
+                return entry
+            index += 1
+
+    def _table_entry(self, subsections, idnum: int) -> Optional[Tuple[int, int, int]]:
+        for first, count, position, width in subsections:
+            if first <= idnum < first + count:
+                entry = self.data[position + (idnum - first) * width:][:18]
+                offset, generation, kind = entry.split()
+                if kind == b'f':
+                    return (0, 0, 0)
+                return (1, int(offset), int(generation))
+        return None
+
+    def _stream_entry(self, xref: StreamObject, idnum: int) -> Optional[Tuple[int, int, int]]:
+        widths = [int(w) for w in xref['/W']]
+        row_size = sum(widths)
+        index = xref.get('/Index', [0, xref['/Size']])
+        rows_before = 0
+        for first, count in zip(index[::2], index[1::2]):
+            first, count = int(first), int(count)
+            if first <= idnum < first + count:
+                row_start = (rows_before + idnum - first) * row_size
+                row = xref.get_data()[row_start:row_start + row_size]
+                fields, position = [], 0
+                for width in widths:
+                    fields.append(int.from_bytes(row[position:position + width], 'big') if width else None)
+                    position += width
+                kind = 1 if fields[0] is None else fields[0]
+                return (kind, fields[1] or 0, fields[2] or 0)
+            rows_before += count
+        return None
+
+    # -- objects -----------------------------------------------------------------
+
+    def _read_indirect(self, offset: int):
+        match = _OBJ_RE.match(self.data, offset)
+        if match is None:
+            raise ProbeError(f"no object at offset {offset}")
+        return self._parse_at(match.end())
+
+    def _parse_at(self, offset: int):
+        """Parse one object, copying only a window of the file around it"""
+        window = PARSE_WINDOW_BYTES
+        while True:
+            chunk = bytes(self.data[offset:offset + window])
+            stream = _object_stream(chunk)
+            reaches_end = offset + window >= len(self.data)
+            try:
+                obj = read_object(stream, self)
+            except Exception:
+                if reaches_end:
+                    raise
+            else:
+                # An object running up to the window edge may have been cut short
+                if reaches_end or stream.tell() < len(chunk):
+                    return obj
+            window *= 4
+
+    def _read_object(self, idnum: int):
+        kind, field2, field3 = self._lookup(idnum)
+        if kind == 1:
+            return self._read_indirect(field2)
+        if kind == 2:
+            return self._read_from_object_stream(field2, idnum)
+        raise ProbeError(f"object {idnum} is free")
+
+    def _read_from_object_stream(self, stream_num: int, idnum: int):
+        if stream_num not in self._object_streams:
+            objstm = self.get_object(stream_num)
+            data = objstm.get_data()
+            first = int(objstm['/First'])
+            numbers = data[:first].split()
+            offsets = {int(numbers[i]): first + int(numbers[i + 1]) for i in range(0, len(numbers), 2)}
+            self._object_streams[stream_num] = (data, offsets)
+        data, offsets = self._object_streams[stream_num]
+        if idnum not in offsets:
+            raise ProbeError(f"object {idnum} missing from object stream {stream_num}")
+        return read_object(_object_stream(data[offsets[idnum]:]), self)
+
+
+def _object_stream(chunk: bytes) -> io.BytesIO:
+    """Stream over ``chunk`` positioned at its first non-whitespace byte"""
+    stream = io.BytesIO(chunk)
+    stream.seek(len(chunk) - len(chunk.lstrip(_WHITESPACE)))
+    return stream
@@ -0,0 +1,347 @@
+"""
+Disk-backed cache of operation results
+
+Results are keyed by the content hashes of every input plus the operation's
+normalized parameters, so the same request from any session (or a later
+process) is answered without running the operation again. Entries are files
+in RESULT_CACHE_DIR: ``<key>.json`` with the metadata and, for document
+results, ``<key>.bin`` with the data. Total size is bounded; the least
+recently used entries are evicted first, and file mtimes carry that order
+across restarts. Entries unused for the storage TTL are deleted along with
+other storage files (see pdf_storage.cleanup_expired).
+
+Environment:
+    DOCSUITE_RESULT_CACHE_DIR   where entries are stored
+    DOCSUITE_RESULT_CACHE_MB    size bound (default 1024; 0 disables caching)
+"""
+
+import functools
+import hashlib
+import inspect
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pdf_storage import (
+    COPY_CHUNK_BYTES,
+    STORAGE_DIR,
+    FileSource,
+    Source,
+    new_storage_path,
+    out_of_core,
+    source_digest,
+)
+
+RESULT_CACHE_DIR = Path(os.environ.get('DOCSUITE_RESULT_CACHE_DIR', STORAGE_DIR / 'results'))
+DEFAULT_RESULT_CACHE_BYTES = int(os.environ.get('DOCSUITE_RESULT_CACHE_MB', 1024)) * 1024 * 1024
+
+# Result kinds: how a value is stored and handed back
+KIND_VALUE = 'value'        # JSON-serializable value (get_pdf_info)
+KIND_DOCUMENT = 'document'  # bytes, or a FileSource when to_file is set or out of core
+KIND_FILES = 'files'        # {filename: bytes or FileSource}, stored as an uncompressed ZIP
+KIND_ARCHIVE = 'archive'    # (ZIP file object or FileSource, entry count)
+
+
+class ResultCache:
+    """Size-bounded LRU of operation results persisted on disk"""
+
+    def __init__(self, directory: Path = RESULT_CACHE_DIR, max_bytes: int = DEFAULT_RESULT_CACHE_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes on disk
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(op: str, inputs: List[Source], params: Dict) -> str:
+        """Cache key for an operation over the given inputs"""
+        identity = {'op': op, 'inputs': [source_digest(source) for source in inputs], 'params': params}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    def get(self, op: str, key: str, to_file: bool = False):
+        """Return the cached result for a key, or None"""
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            self._load()
+            known = key in self._entries
+        meta = self._read_meta(key) if known else None
+        if meta is None:
+            with self._lock:
+                self.misses[op] += 1
+                if known:
+                    self._forget(key)  # Removed by another process
+            return None
+
+        try:
+            result = self._restore(key, meta, to_file)
+        except OSError:
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses[op] += 1
+                self._forget(key)
+                return None
+            self.hits[op] += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        try:
+            os.utime(self._meta_path(key))
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, kind: str, result):
+        """Store a result; failures to write only cost the cache entry"""
+        if self.max_bytes <= 0:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = {'kind': kind, 'created': time.time()}
+        data_path = self._data_path(key)
+        try:
+            if kind == KIND_VALUE:
+                meta['value'] = result
+            elif kind == KIND_DOCUMENT:
+                _store_source(result, data_path)
+            elif kind == KIND_FILES:
+                _store_files(result, data_path)
+            else:
+                archive, count = result
+                meta['count'] = count
+                _store_archive(archive, data_path)
+            _write_atomic(self._meta_path(key), json.dumps(meta).encode())
+        except OSError:
+            self._remove_files(key)
+            return
+
+        size = self._disk_size(key)
+        with self._lock:
+            self._load()
+            if size > self.max_bytes:
+                self._forget(key)
+                return
+            self.total_bytes += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            while self.total_bytes > self.max_bytes and self._entries:
+                self._forget(next(iter(self._entries)))
+
+    def clear(self):
+        """Delete every entry and reset the counters"""
+        with self._lock:
+            self._load()
+            for key in list(self._entries):
+                self._forget(key)
+            self.hits.clear()
+            self.misses.clear()
+
+    def expire(self, ttl: float) -> int:
+        """Delete entries not used within ``ttl`` seconds; returns how many"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            self._load()
+            for key in list(self._entries):
+                try:
+                    used = self._meta_path(key).stat().st_mtime
+                except FileNotFoundError:
+                    used = 0  # Removed by another process
+                if now - used > ttl:
+                    self._forget(key)
+                    removed += 1
+        return removed
+
+    def stats(self) -> Dict:
+        """Occupancy plus hit and miss counts, overall and per operation"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': sum(self.hits.values()),
+                'misses': sum(self.misses.values()),
+                'by_op': {op: {'hits': self.hits[op], 'misses': self.misses[op]}
+                          for op in sorted(set(self.hits) | set(self.misses))},
+            }
+
+    def _load(self):
+        """Rebuild the index from disk once, oldest entries first; caller holds the lock"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.directory.is_dir():
+            return
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                key = entry.name[:-len('.json')]
+                found.append((entry.stat().st_mtime, key))
+        for _, key in sorted(found):
+            size = self._disk_size(key)
+            self._entries[key] = size
+            self.total_bytes += size
+        while self.total_bytes > self.max_bytes and self._entries:
+            self._forget(next(iter(self._entries)))
+
+    def _forget(self, key: str):
+        """Drop an entry from the index and disk; caller holds the lock"""
+        self.total_bytes -= self._entries.pop(key, 0)
+        self._remove_files(key)
+
+    def _remove_files(self, key: str):
+        for path in (self._meta_path(key), self._data_path(key)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _disk_size(self, key: str) -> int:
+        size = 0
+        for path in (self._meta_path(key), self._data_path(key)):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return size
+
+    def _read_meta(self, key: str) -> Optional[Dict]:
+        try:
+            return json.loads(self._meta_path(key).read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def _restore(self, key: str, meta: Dict, to_file: bool):
+        kind = meta['kind']
+        if kind == KIND_VALUE:
+            return meta['value']
+
+        data_path = self._data_path(key)
+        if kind == KIND_FILES:
+            with zipfile.ZipFile(data_path) as zip_file:
+                return {info.filename: _extract(zip_file, info) for info in zip_file.infolist()}
+
+        if to_file or out_of_core(data_path.stat().st_size):
+            # Callers may move or delete their result, so hand out a link, never the entry itself
+            path = new_storage_path('.zip' if kind == KIND_ARCHIVE else '.pdf')
+            _link_or_copy(data_path, path)
+            result = FileSource(path)
+        elif kind == KIND_DOCUMENT:
+            result = data_path.read_bytes()
+        else:
+            result = io.BytesIO(data_path.read_bytes())
+        return (result, meta['count']) if kind == KIND_ARCHIVE else result
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _data_path(self, key: str) -> Path:
+        return self.directory / f"{key}.bin"
+
+
+def memoize(op: str, kind: str, identity: Callable[..., Tuple[List[Source], Dict]]):
+    """Serve a PDFProcessor operation from the result cache
+
+    ``identity`` receives the call's arguments by name (defaults applied) and
+    returns the input sources and the parameters that affect the result.
+    Calls that raise (including cancellations) are never cached; a cache hit
+    reports completion through ``progress`` when the operation takes one.
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if result_cache.max_bytes <= 0:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            inputs, params = identity(**arguments)
+            key = result_cache.key(op, inputs, params)
+            to_file = bool(arguments.get('to_file'))
+
+            result = result_cache.get(op, key, to_file)
+            if result is not None:
+                progress = arguments.get('progress')
+                if progress:
+                    progress(1, 1)
+                return result
+
+            result = func(*args, **kwargs)
+            result_cache.put(key, kind, result)
+            if kind == KIND_ARCHIVE and not isinstance(result[0], FileSource):
+                result[0].seek(0)
+            return result
+        return wrapper
+    return decorate
+
+
+def _write_atomic(path: Path, data: bytes):
+    partial = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    partial.write_bytes(data)
+    os.replace(partial, path)
+
+
+def _link_or_copy(source: Path, target: Path):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _store_source(result: Source, path: Path):
+    if isinstance(result, FileSource):
+        partial = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        _link_or_copy(result.path, partial)
+        os.replace(partial, path)
+    else:
+        _write_atomic(path, result)
+
+
+def _store_files(files: Dict[str, Source], path: Path):
+    partial = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with zipfile.ZipFile(partial, 'w', zipfile.ZIP_STORED) as zip_file:
+            for filename, data in files.items():
+                if isinstance(data, FileSource):
+                    zip_file.write(data.path, filename)
+                else:
+                    zip_file.writestr(filename, data)
+        os.replace(partial, path)
+    except OSError:
+        partial.unlink(missing_ok=True)
+        raise
+
+
+def _extract(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo) -> Source:
+    """Read an entry, into a storage file when it is out of core"""
+    if not out_of_core(info.file_size):
+        return zip_file.read(info)
+    path = new_storage_path()
+    with zip_file.open(info) as entry, open(path, 'wb') as target:
+        shutil.copyfileobj(entry, target, COPY_CHUNK_BYTES)
+    return FileSource(path)
+
+
+def _store_archive(archive, path: Path):
+    if isinstance(archive, FileSource):
+        _store_source(archive, path)
+        return
+    archive.seek(0)
+    partial = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(partial, 'wb') as f:
+        shutil.copyfileobj(archive, f)
+    os.replace(partial, path)
+
+
+result_cache = ResultCache()
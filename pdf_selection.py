@@ -0,0 +1,346 @@
+"""
+Page selections backed by interval sets
+
+A selection is a sorted tuple of disjoint ``range`` objects over zero-based
+page indexes, so ``1-500000`` is one range rather than half a million ints.
+Membership, length and complement cost O(number of ranges).
+
+Selection syntax (1-based, comma separated, whitespace ignored):
+
+    4           single page
+    -1          counted from the end (-1 = last page)
+    2-8         inclusive range; either end may be negative (-3--1)
+    5-          open range up to the last page
+    1-9:2       range with a step (1, 3, 5, 7, 9); also 5-:3
+    odd, even   odd or even pages; all = every page
+"""
+
+import heapq
+import math
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+_ENTRY_RE = re.compile(r'^(-?\d+)(-(-?\d+)?)?(?::(\d+))?$')
+_KEYWORDS = {'all': (0, 1), 'odd': (0, 2), 'even': (1, 2)}
+# Largest common period of several strides kept as a periodic pattern
+MAX_STRIDE_PERIOD = 64
+
+
+class PageSelectionError(ValueError):
+    """Raised for a selection string that cannot be parsed
+
+    ``position`` is the zero-based offset of the offending entry in ``text``.
+    """
+
+    def __init__(self, message: str, text: str = '', position: int = 0):
+        self.text = text
+        self.position = position
+        if text:
+            message = f"{message} (at position {position + 1} in {text!r})"
+        super().__init__(message)
+
+
+class PageSelection:
+    """Immutable set of zero-based page indexes within a document"""
+
+    __slots__ = ('total_pages', 'ranges')
+
+    def __init__(self, total_pages: int, ranges: Iterable[range] = ()):
+        self.total_pages = total_pages
+        self.ranges: Tuple[range, ...] = _normalize(
+            [_clip(r, total_pages) for r in ranges], total_pages)
+
+    # -- construction ------------------------------------------------------------
+
+    @classmethod
+    def parse(cls, text: str, total_pages: int, clip: bool = False) -> 'PageSelection':
+        """Parse a selection string
+
+        Out-of-range pages raise PageSelectionError unless ``clip`` is set,
+        in which case they are dropped.
+        """
+        ranges = []
+        for entry in cls.parse_entries(text, total_pages, clip):
+            ranges.extend(entry.ranges)
+        return cls(total_pages, ranges)
+
+    @classmethod
+    def parse_entries(cls, text: str, total_pages: int, clip: bool = False) -> List['PageSelection']:
+        """Parse a selection string into one selection per comma-separated entry"""
+        entries = []
+        position = 0
+        for raw in text.split(','):
+            entry = ''.join(raw.split())
+            offset = position + len(raw) - len(raw.lstrip())
+            position += len(raw) + 1
+            if entry:
+                entries.append(cls(total_pages, [_parse_entry(entry, total_pages, clip, text, offset)]))
+        if not entries:
+            raise PageSelectionError("No pages specified", text, 0)
+        return entries
+
+    @classmethod
+    def all(cls, total_pages: int) -> 'PageSelection':
+        return cls(total_pages, [range(total_pages)])
+
+    @classmethod
+    def from_pages(cls, page_numbers: Iterable[int], total_pages: int) -> 'PageSelection':
+        """Build a selection from 1-based page numbers, ignoring invalid ones"""
+        indexes = sorted({page - 1 for page in page_numbers if 1 <= page <= total_pages})
+        runs = []
+        for index in indexes:
+            if runs and runs[-1][1] == index:
+                runs[-1][1] += 1
+            else:
+                runs.append([index, index + 1])
+        return cls(total_pages, [range(start, stop) for start, stop in runs])
+
+    # -- queries -----------------------------------------------------------------
+
+    def __contains__(self, index: int) -> bool:
+        return any(index in r for r in self.ranges)
+
+    def __len__(self) -> int:
+        return sum(len(r) for r in self.ranges)
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges)
+
+    def __iter__(self) -> Iterator[int]:
+        """Zero-based indexes in ascending order"""
+        return heapq.merge(*self.ranges)
+
+    def __eq__(self, other) -> bool:
+        # The same pages can be spelled with different strides, so compare as sets
+        if not isinstance(other, PageSelection) or self.total_pages != other.total_pages:
+            return False
+        return self.ranges == other.ranges or not (self - other or other - self)
+
+    def __hash__(self) -> int:
+        return hash((self.total_pages, len(self)))
+
+    def __repr__(self) -> str:
+        return f"PageSelection({str(self)!r}, total_pages={self.total_pages})"
+
+    def __str__(self) -> str:
+        """Canonical selection string"""
+        parts = []
+        for r in sorted(self.ranges, key=lambda r: r.start):
+            last = r[-1] + 1
+            if len(r) == 1:
+                parts.append(str(r.start + 1))
+            elif r.step == 1:
+                parts.append(f"{r.start + 1}-{last}")
+            else:
+                parts.append(f"{r.start + 1}-{last}:{r.step}")
+        return ','.join(parts)
+
+    def page_numbers(self) -> List[int]:
+        """1-based page numbers as a list"""
+        return [index + 1 for index in self]
+
+    @property
+    def contiguous(self) -> Optional[range]:
+        """The selection as one step-1 range, or None if it has gaps"""
+        if len(self.ranges) == 1 and (self.ranges[0].step == 1 or len(self.ranges[0]) == 1):
+            r = self.ranges[0]
+            return range(r.start, r.start + len(r))
+        return None
+
+    # -- set algebra -------------------------------------------------------------
+
+    def complement(self) -> 'PageSelection':
+        """Pages of the document not in this selection"""
+        result = PageSelection.__new__(PageSelection)
+        result.total_pages = self.total_pages
+        result.ranges = _finish(_complement_segments(self.ranges, self.total_pages))
+        return result
+
+    def __or__(self, other: 'PageSelection') -> 'PageSelection':
+        return PageSelection(self.total_pages, self.ranges + other.ranges)
+
+    def __and__(self, other: 'PageSelection') -> 'PageSelection':
+        return (self.complement() | other.complement()).complement()
+
+    def __sub__(self, other: 'PageSelection') -> 'PageSelection':
+        return self & other.complement()
+
+
+def _parse_entry(entry: str, total_pages: int, clip: bool, text: str, offset: int) -> range:
+    """Resolve one entry to a zero-based range"""
+    keyword = _KEYWORDS.get(entry.lower())
+    if keyword is not None:
+        start, step = keyword
+        return range(start, total_pages, step)
+
+    match = _ENTRY_RE.match(entry)
+    if match is None:
+        raise PageSelectionError(f"Invalid page entry '{entry}'", text, offset)
+    first, dash, last, step = match.groups()
+
+    def resolve(value: str) -> int:
+        page = int(value)
+        if page == 0:
+            raise PageSelectionError("Page numbers start at 1", text, offset)
+        index = page - 1 if page > 0 else total_pages + page
+        if not clip and not 0 <= index < total_pages:
+            raise PageSelectionError(
+                f"Page {value} is out of range (document has {total_pages} pages)", text, offset)
+        return index
+
+    start = resolve(first)
+    if dash is None:
+        stop = start + 1
+    else:
+        stop = resolve(last) + 1 if last is not None else total_pages
+    if clip and start >= total_pages:
+        return range(0)
+    if stop <= start and dash is not None:
+        raise PageSelectionError(f"Range '{entry}' ends before it starts", text, offset)
+
+    step = int(step) if step is not None else 1
+    if step < 1:
+        raise PageSelectionError(f"Step in '{entry}' must be at least 1", text, offset)
+    return range(start, stop, step)
+
+
+def _clip(r: range, total_pages: int) -> range:
+    """Restrict a range to [0, total_pages), keeping its phase"""
+    if r.step < 1:
+        raise ValueError("ranges must ascend")
+    start = r.start
+    if start < 0:
+        start += -(-(0 - start) // r.step) * r.step
+    return range(start, min(r.stop, total_pages), r.step)
+
+
+def _segments(ranges, total_pages: int):
+    """Sweep the page axis, yielding (start, stop, active ranges) segments
+
+    Boundaries fall at every range's first and one-past-last element, so each
+    active range covers its segment from end to end at its own stride.
+    """
+    ranges = sorted((r for r in ranges if len(r)), key=lambda r: r.start)
+    cuts = sorted({0, total_pages} | {r.start for r in ranges} | {r[-1] + 1 for r in ranges})
+    active: List[range] = []
+    next_range = 0
+    for start, stop in zip(cuts, cuts[1:]):
+        active = [r for r in active if r[-1] >= start]
+        while next_range < len(ranges) and ranges[next_range].start <= start:
+            active.append(ranges[next_range])
+            next_range += 1
+        yield start, stop, active
+
+
+def _cover(start: int, stop: int, active: List[range]) -> Tuple[int, set, List[int]]:
+    """Describe how the active ranges cover [start, stop)
+
+    Returns (period, offsets, extras): index i is covered when
+    (i - start) % period is in ``offsets`` or i is in the sorted ``extras``.
+    Strides are folded into the periodic part while their common period stays
+    small; any remaining ranges contribute their (uncovered) elements to
+    ``extras`` so unrelated strides never multiply into a huge period.
+    """
+    if any(r.step == 1 for r in active):
+        return 1, {0}, []
+
+    length = stop - start
+    period, base, rest = 1, [], []
+    for r in sorted(active, key=lambda r: r.step):
+        candidate = math.lcm(period, r.step)
+        if candidate < length and (not base or candidate <= MAX_STRIDE_PERIOD):
+            base.append(r)
+            period = candidate
+        else:
+            rest.append(r)
+
+    offsets = set()
+    for r in base:
+        offsets.update(range((r.start - start) % r.step, period, r.step))
+    if period > 1 and len(offsets) == period:
+        return 1, {0}, []
+
+    extras = set()
+    for r in rest:
+        extras.update(i for i in range(start + (r.start - start) % r.step, stop, r.step)
+                      if (i - start) % period not in offsets)
+    return period, offsets, sorted(extras)
+
+
+def _normalize(ranges, total_pages: int) -> Tuple[range, ...]:
+    """Union of possibly overlapping ranges as disjoint ranges"""
+    pieces = []
+    for start, stop, active in _segments(ranges, total_pages):
+        period, offsets, extras = _cover(start, stop, active)
+        pieces.extend(range(start + offset, stop, period) for offset in offsets)
+        pieces.extend(range(i, i + 1) for i in extras)
+    return _finish(pieces)
+
+
+def _complement_segments(ranges, total_pages: int) -> List[range]:
+    pieces = []
+    for start, stop, active in _segments(ranges, total_pages):
+        period, offsets, extras = _cover(start, stop, active)
+        by_offset = {}
+        for i in extras:
+            by_offset.setdefault((i - start) % period, []).append(i)
+        for offset in set(range(period)) - offsets:
+            pieces.extend(_split_progression(range(start + offset, stop, period), by_offset.get(offset, [])))
+    return pieces
+
+
+def _split_progression(progression: range, holes: List[int]) -> List[range]:
+    """Remove the sorted ``holes`` (members of ``progression``) from it"""
+    step = progression.step
+    pieces = []
+    previous = progression.start
+    for hole in holes:
+        if hole > previous:
+            pieces.append(range(previous, hole, step))
+        previous = hole + step
+    if previous < progression.stop:
+        pieces.append(range(previous, progression.stop, step))
+    return pieces
+
+
+def _finish(pieces: List[range]) -> Tuple[range, ...]:
+    """Join pieces that continue one another and canonicalize their stops"""
+    result: List[range] = []
+    waiting = {}  # next element -> indexes of progressions in result expecting it
+    singles = {}  # element -> index of a one-page range in result
+
+    def extend(index: int, r: range, step: int):
+        old = result[index]
+        waiting[old[-1] + (old.step if len(old) > 1 else step)].remove(index)
+        result[index] = range(old.start, r[-1] + 1, step)
+        waiting.setdefault(r[-1] + step, []).append(index)
+
+    for r in sorted((r for r in pieces if len(r)), key=lambda r: r.start):
+        if len(r) == 1:
+            for index in waiting.get(r.start, []):
+                extend(index, r, result[index].step)
+                break
+            else:
+                index = singles.pop(r.start - 1, None)
+                if index is not None:
+                    # Two neighbouring single pages start a run
+                    result[index] = range(r.start - 1, r.start + 1)
+                    waiting.setdefault(r.start + 1, []).append(index)
+                else:
+                    singles[r.start] = len(result)
+                    result.append(range(r.start, r.start + 1))
+            continue
+
+        step = r.step
+        joined = [index for index in waiting.get(r.start, []) if result[index].step == step]
+        if joined:
+            extend(joined[0], r, step)
+            continue
+        index = singles.pop(r.start - step, None)
+        if index is not None:
+            result[index] = range(r.start - step, r[-1] + 1, step)
+        else:
+            index = len(result)
+            result.append(range(r.start, r[-1] + 1, step))
+        waiting.setdefault(r[-1] + step, []).append(index)
+    return tuple(result)
@@ -0,0 +1,139 @@
+"""
+Serialized size estimates for size-bounded splits
+
+A page's cost is the serialized size of every indirect object it pulls in
+(content streams, fonts, images, annotations), found by walking references
+from the page dictionary. Objects shared between pages are counted once per
+output chunk, so a font used on every page is paid for once per file.
+
+Outputs pack non-stream objects into compressed object streams (see
+pdf_output), so those are scaled by the compression ratio of a sample of the
+document's own objects.
+"""
+
+import io
+import zlib
+from typing import Dict, FrozenSet, List, Tuple
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Fixed bytes per output file: header, catalog, page tree, info and trailer
+FILE_OVERHEAD_BYTES = 600
+# Per stream object: "N 0 obj" / "endobj" framing plus its cross-reference entry
+OBJECT_OVERHEAD_BYTES = 40
+# Per object packed into an object stream: its offset pair and xref stream row
+PACKED_OBJECT_OVERHEAD_BYTES = 8
+# Serialized non-stream objects compressed to estimate the object stream ratio
+COMPRESSION_SAMPLE_BYTES = 256 * 1024
+# Per page: its /Kids entry in the output page tree
+PAGE_OVERHEAD_BYTES = 12
+
+ObjectKey = Tuple[int, int]
+
+
+class PageCostModel:
+    """Per-page object sets and per-object serialized sizes of a document"""
+
+    def __init__(self, reader: PdfReader):
+        self.object_sizes: Dict[ObjectKey, int] = {}
+        self._packed: Dict[ObjectKey, int] = {}
+        self._sample = io.BytesIO()
+        self.page_objects: List[FrozenSet[ObjectKey]] = [self._collect(page) for page in reader.pages]
+
+        sample = self._sample.getvalue()
+        ratio = len(zlib.compress(sample)) / len(sample) if sample else 1.0
+        for key, size in self._packed.items():
+            self.object_sizes[key] = int(size * ratio) + PACKED_OBJECT_OVERHEAD_BYTES
+        del self._packed, self._sample
+
+    def page_cost(self, index: int) -> int:
+        """Estimated bytes of a page written on its own, without file overhead"""
+        return PAGE_OVERHEAD_BYTES + sum(self.object_sizes[key] for key in self.page_objects[index])
+
+    def pack(self, max_bytes: int) -> List[Tuple[range, int]]:
+        """Group consecutive pages into chunks estimated to fit ``max_bytes``
+
+        Returns (pages, estimated bytes) per chunk. A page that alone exceeds
+        the limit still gets a chunk of its own.
+        """
+        chunks = []
+        start = 0
+        size = FILE_OVERHEAD_BYTES
+        included = set()
+        for index, objects in enumerate(self.page_objects):
+            added = PAGE_OVERHEAD_BYTES + sum(self.object_sizes[key] for key in objects if key not in included)
+            if index > start and size + added > max_bytes:
+                chunks.append((range(start, index), size))
+                start = index
+                size = FILE_OVERHEAD_BYTES
+                included = set()
+                added = self.page_cost(index)
+            included.update(objects)
+            size += added
+        if self.page_objects:
+            chunks.append((range(start, len(self.page_objects)), size))
+        return chunks
+
+    def _collect(self, page) -> FrozenSet[ObjectKey]:
+        """Indirect objects reachable from a page, excluding the page tree"""
+        objects = set()
+        page_ref = page.indirect_reference
+        if page_ref is not None:
+            objects.add(self._record(page_ref, page))
+
+        stack = [page]
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, DictionaryObject):
+                children = [value for key, value in obj.items() if key != '/Parent']
+            elif isinstance(obj, ArrayObject):
+                children = obj
+            else:
+                continue
+
+            for child in children:
+                if not isinstance(child, IndirectObject):
+                    stack.append(child)
+                    continue
+                key = (child.idnum, child.generation)
+                if key in objects:
+                    continue
+                target = child.get_object()
+                # Links to other pages don't pull those pages into the output
+                if isinstance(target, DictionaryObject) and target.get('/Type') in ('/Page', '/Pages'):
+                    continue
+                objects.add(self._record(child, target))
+                stack.append(target)
+        return frozenset(objects)
+
+    def _record(self, ref: IndirectObject, obj) -> ObjectKey:
+        key = (ref.idnum, ref.generation)
+        if key in self.object_sizes or key in self._packed:
+            return key
+        if isinstance(obj, StreamObject):
+            self.object_sizes[key] = serialized_size(obj) + OBJECT_OVERHEAD_BYTES
+        else:
+            data = _written(obj)
+            self._packed[key] = len(data)
+            if self._sample.tell() < COMPRESSION_SAMPLE_BYTES:
+                self._sample.write(data)
+        return key
+
+
+def serialized_size(obj) -> int:
+    """Bytes an object takes when written, without copying stream data"""
+    if isinstance(obj, StreamObject):
+        header = DictionaryObject(obj)
+        return _written_size(header) + len(obj._data) + len(b"\nstream\n\nendstream")
+    return _written_size(obj)
+
+
+def _written_size(obj) -> int:
+    return len(_written(obj))
+
+
+def _written(obj) -> bytes:
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,182 @@
+"""
+Disk-backed document storage for large uploads and results
+
+Documents of at least OUT_OF_CORE_BYTES are handled out of core: uploads are
+spooled here, operations write their output straight to a storage file, and
+large stream payloads are parked in temporary files while a document is
+assembled (see pdf_output.StreamSpill), so peak memory no longer follows the
+size of the inputs and output.
+
+Environment:
+    DOCSUITE_TMPDIR             parent of the storage directory
+    DOCSUITE_OUT_OF_CORE_MB     size from which documents stay on disk (default 64)
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+STORAGE_DIR = Path(os.environ.get('DOCSUITE_TMPDIR', tempfile.gettempdir())) / 'docsuite'
+
+# Spooled files untouched for this long are deleted
+FILE_TTL_SECONDS = 60 * 60
+CLEANUP_INTERVAL_SECONDS = 60
+COPY_CHUNK_BYTES = 1024 * 1024
+# Inputs (or combined inputs) of this size are processed out of core
+OUT_OF_CORE_BYTES = int(float(os.environ.get('DOCSUITE_OUT_OF_CORE_MB', 64)) * 1024 * 1024)
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+
+def content_digest(data) -> str:
+    """Return the content hash used to identify a document"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FileSource:
+    """PDF held in a temp file
+
+    Parsing reads it through a plain file handle, so only the parts the reader
+    asks for are held in memory; ``view`` maps it for slicing and scanning.
+    """
+
+    def __init__(self, path: Union[str, Path], digest: Optional[str] = None):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        self._digest = digest
+        self._view = None
+
+    @classmethod
+    def from_stream(cls, stream: BinaryIO, suffix: str = '.pdf') -> 'FileSource':
+        """Copy a readable stream into a new storage file"""
+        path = new_storage_path(suffix)
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(stream, target, COPY_CHUNK_BYTES)
+        return cls(path)
+
+    @property
+    def digest(self) -> str:
+        """Content hash, computed once per file"""
+        if self._digest is None:
+            with open(self.path, 'rb') as f:
+                self._digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        return self._digest
+
+    @property
+    def view(self):
+        """Shared read-only mmap of the whole file"""
+        if self._view is None:
+            self._view = self.open_mmap()
+        return self._view
+
+    def open_mmap(self):
+        """Open a new read-only mmap with its own file position"""
+        if not self.size:
+            return io.BytesIO(b'')
+        with open(self.path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def open(self) -> BinaryIO:
+        """Open the file for streaming reads (e.g. downloads)"""
+        self.touch()
+        return open(self.path, 'rb')
+
+    def touch(self):
+        """Mark the file as in use so TTL cleanup keeps it"""
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        return self.size
+
+    def unlink(self):
+        """Delete the file; the source must not be used afterwards"""
+        if self._view is not None and not isinstance(self._view, io.BytesIO):
+            self._view.close()
+        self._view = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __getstate__(self):
+        # Worker processes reopen their own mmap
+        return {'path': self.path, 'size': self.size, '_digest': self._digest, '_view': None}
+
+
+Source = Union[bytes, FileSource]
+
+
+def source_view(source: Source):
+    """Bytes-like view of a source for hashing and slicing"""
+    return source.view if isinstance(source, FileSource) else source
+
+
+def source_stream(source: Source):
+    """Seekable stream over a source for a PdfReader
+
+    Files are read through a buffered handle rather than an mmap, so the pages
+    a reader touches don't stay resident in the process.
+    """
+    if isinstance(source, FileSource):
+        source.touch()
+        return open(source.path, 'rb')
+    return io.BytesIO(source)
+
+
+def source_digest(source: Source) -> str:
+    """Content hash of a source, reusing the cached one for files"""
+    return source.digest if isinstance(source, FileSource) else content_digest(source)
+
+
+def out_of_core(size: int) -> bool:
+    """Whether a document (or set of inputs) of this many bytes should stay on disk"""
+    return size >= OUT_OF_CORE_BYTES
+
+
+def new_storage_path(suffix: str = '.pdf') -> Path:
+    """Reserve a fresh path in the storage directory"""
+    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+    return STORAGE_DIR / f"{uuid.uuid4().hex}{suffix}"
+
+
+def cleanup_expired(ttl: float = FILE_TTL_SECONDS, force: bool = False) -> int:
+    """Delete storage files not touched within ``ttl`` seconds
+
+    Result cache entries not used within ``ttl`` go too. Runs at most once
+    per CLEANUP_INTERVAL_SECONDS unless forced. Returns the number of files
+    and cache entries removed.
+    """
+    from pdf_results import result_cache  # pdf_results imports this module
+    global _last_cleanup
+
+    now = time.time()
+    with _cleanup_lock:
+        if not force and now - _last_cleanup < CLEANUP_INTERVAL_SECONDS:
+            return 0
+        _last_cleanup = now
+
+    removed = result_cache.expire(ttl)
+    if not STORAGE_DIR.is_dir():
+        return removed
+
+    for entry in os.scandir(STORAGE_DIR):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > ttl:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
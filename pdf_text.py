@@ -0,0 +1,269 @@
+"""
+Per-page text index for content-driven page selection
+
+Page text is extracted once per document (keyed by content hash) as a
+background job, spread over a process pool for long documents. The job goes
+through the job manager like any other operation, so admission control
+counts it, including every pool worker's parse of the document. Pages
+become searchable in page order as they are extracted, so a query over the
+first pages is answered before the rest of the document is indexed.
+Finished indexes are stored in the result cache and survive restarts.
+
+Queries are keywords (case-insensitive by default, any run of whitespace
+matches any other) or regular expressions; a ``^`` anchors the start of the
+page's text.
+"""
+
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Pattern, Tuple
+
+from pypdf import PdfReader
+from pdf_cache import document_cache
+from pdf_engine import WORKER_CONTEXT, ProgressCallback
+from pdf_jobs import REJECTED, estimate_pool_memory, job_manager, pool_workers
+from pdf_metrics import instrument
+from pdf_results import KIND_VALUE, result_cache
+from pdf_selection import PageSelection
+from pdf_storage import Source, source_digest, source_stream
+
+# Documents whose page text is kept in memory
+TEXT_INDEX_MAX_DOCUMENTS = 32
+# Below this many pages text is extracted on the background thread alone
+PARALLEL_TEXT_MIN_PAGES = 64
+# Pages per worker task; kept small so the first pages are searchable quickly
+TEXT_BATCH_PAGES = 16
+
+
+class TextQueryError(ValueError):
+    """Raised for a query that is empty or not a valid regular expression"""
+
+
+class TextIndexError(RuntimeError):
+    """Raised when a document's text could not be extracted"""
+
+
+def compile_query(query: str, regex: bool = False, case_sensitive: bool = False) -> Pattern:
+    """Compile a keyword or regular expression query"""
+    if not query.strip():
+        raise TextQueryError("Enter some text to search for")
+    flags = 0 if case_sensitive else re.IGNORECASE
+    if not regex:
+        # Extracted text breaks lines and spaces unpredictably, so match words loosely
+        return re.compile(r'\s+'.join(map(re.escape, query.split())), flags)
+    try:
+        return re.compile(query, flags)
+    except re.error as e:
+        raise TextQueryError(f"Invalid regular expression: {e}") from e
+
+
+class PageTextIndex:
+    """Text of every page of one document, filled in page order"""
+
+    def __init__(self, digest: str, page_count: int, texts: Optional[List[str]] = None):
+        self.digest = digest
+        self.page_count = page_count
+        self._texts: List[str] = list(texts or [])
+        self._error: Optional[Exception] = None
+        self._changed = threading.Condition()
+
+    @property
+    def indexed(self) -> int:
+        """Number of leading pages whose text is available"""
+        return len(self._texts)
+
+    @property
+    def complete(self) -> bool:
+        return len(self._texts) >= self.page_count
+
+    @property
+    def error(self) -> Optional[Exception]:
+        """Why extraction stopped early, if it did"""
+        return self._error
+
+    def wait(self, pages: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Block until the first ``pages`` pages (default all) are indexed; False on timeout"""
+        pages = self.page_count if pages is None else min(pages, self.page_count)
+        with self._changed:
+            ready = self._changed.wait_for(lambda: len(self._texts) >= pages or self._error, timeout)
+            if len(self._texts) < pages and self._error:
+                raise TextIndexError(f"Text extraction failed: {self._error}") from self._error
+            return bool(ready)
+
+    def text(self, index: int) -> str:
+        """Text of a zero-based page, waiting for it to be indexed"""
+        self.wait(index + 1)
+        return self._texts[index]
+
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False,
+               pages: Optional[int] = None, timeout: Optional[float] = None) -> PageSelection:
+        """Pages among the first ``pages`` (default all) whose text matches
+
+        Waits only until those pages are indexed; raises TimeoutError if that
+        takes longer than ``timeout`` seconds.
+        """
+        pattern = compile_query(query, regex, case_sensitive)
+        stop = self.page_count if pages is None else min(pages, self.page_count)
+        if not self.wait(stop, timeout):
+            raise TimeoutError(f"Only {self.indexed} of {stop} pages indexed")
+        return self._matches(pattern, stop)
+
+    def search_indexed(self, query: str, regex: bool = False,
+                       case_sensitive: bool = False) -> Tuple[PageSelection, int]:
+        """Matches among the pages indexed so far, and how many pages were searched"""
+        pattern = compile_query(query, regex, case_sensitive)
+        stop = self.indexed
+        return self._matches(pattern, stop), stop
+
+    def _matches(self, pattern: Pattern, stop: int) -> PageSelection:
+        texts = self._texts
+        return PageSelection.from_pages((i + 1 for i in range(stop) if pattern.search(texts[i])), self.page_count)
+
+    def _extend(self, texts: List[str]):
+        with self._changed:
+            self._texts.extend(texts)
+            self._changed.notify_all()
+
+    def _fail(self, error: Exception):
+        with self._changed:
+            self._error = error
+            self._changed.notify_all()
+
+
+class TextIndexCache:
+    """LRU cache of page text indexes, building each one in the background"""
+
+    def __init__(self, max_documents: int = TEXT_INDEX_MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self._entries: "OrderedDict[str, PageTextIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: Source, workers: Optional[int] = None) -> PageTextIndex:
+        """Return the index for a source, starting extraction on first use
+
+        ``workers`` sets the process pool size; None picks one per CPU, or
+        fewer if that would not fit the job memory budget.
+        """
+        digest = source_digest(source)
+        with self._lock:
+            index = self._entries.get(digest)
+            if index is not None:
+                self._entries.move_to_end(digest)
+                return index
+
+        key = result_cache.key('text', [source], {})
+        texts = result_cache.get('text', key)
+        if texts is not None:
+            index = PageTextIndex(digest, len(texts), texts)
+        else:
+            index = PageTextIndex(digest, document_cache.get(source).page_count)
+
+        with self._lock:
+            existing = self._entries.get(digest)
+            if existing is not None:
+                return existing
+            self._entries[digest] = index
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+
+        if not index.complete:
+            if workers is None:
+                workers = pool_workers(len(source), index.page_count, parallel_min_pages=PARALLEL_TEXT_MIN_PAGES)
+            job = job_manager.submit(
+                "Indexing page text", _build, index, source, key, workers,
+                memory_estimate=estimate_pool_memory(len(source), index.page_count, workers, PARALLEL_TEXT_MIN_PAGES)
+            )
+            if job.status == REJECTED:
+                self.discard(digest)
+                index._fail(TextIndexError(f"this document {job.error}"))
+        return index
+
+    def discard(self, digest: str):
+        """Forget an index so the next request starts over"""
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _build(index: PageTextIndex, source: Source, key: str, workers: int,
+           progress: Optional[ProgressCallback] = None):
+    """Extract every page's text into the index, in page order; runs as a job"""
+    try:
+        with instrument('text_index') as metrics:
+            metrics.input_bytes = len(source)
+            if workers <= 1 or index.page_count < PARALLEL_TEXT_MIN_PAGES:
+                doc = document_cache.get(source)
+                for i in range(index.page_count):
+                    # Lock page by page so operations on the same document can interleave
+                    with doc.lock:
+                        text = _page_text(doc.reader, i)
+                    index._extend([text])
+                    if progress:
+                        progress(index.indexed, index.page_count)
+            else:
+                batches = (range(start, min(start + TEXT_BATCH_PAGES, index.page_count))
+                           for start in range(0, index.page_count, TEXT_BATCH_PAGES))
+                with ProcessPoolExecutor(max_workers=workers, mp_context=WORKER_CONTEXT,
+                                         initializer=_init_text_worker, initargs=(source,)) as executor:
+                    # Batches finish out of order; publish them in order from a bounded window
+                    pending = deque()
+                    while True:
+                        for batch in batches:
+                            pending.append(executor.submit(_extract_batch, batch))
+                            if len(pending) >= workers * 2:
+                                break
+                        if not pending:
+                            break
+                        index._extend(pending.popleft().result())
+                        if progress:
+                            progress(index.indexed, index.page_count)
+            metrics.pages = index.page_count
+    except Exception as e:
+        text_indexes.discard(index.digest)
+        index._fail(e)
+        raise
+    result_cache.put(key, KIND_VALUE, index._texts)
+
+
+def _page_text(reader: PdfReader, index: int) -> str:
+    try:
+        return reader.pages[index].extract_text().strip()
+    except Exception:
+        # One unreadable page (broken font, odd content stream) must not sink the index
+        return ''
+
+# Reader opened once per text extraction worker process
+_worker_reader = None
+
+def _init_text_worker(source: Source):
+    global _worker_reader
+    _worker_reader = PdfReader(source_stream(source))
+
+def _extract_batch(pages: range) -> List[str]:
+    return [_page_text(_worker_reader, i) for i in pages]
+
+
+def text_index(source: Source, workers: Optional[int] = None) -> PageTextIndex:
+    """Page text index of a document, built in the background on first use"""
+    return text_indexes.get(source, workers)
+
+
+def split_ranges_at(starts: PageSelection) -> str:
+    """Ranges for split_pdf's 'ranges' mode that begin a new file at each selected page
+
+    Pages before the first selected page form a file of their own.
+    """
+    bounds = starts.page_numbers()
+    if not bounds or bounds[0] != 1:
+        bounds.insert(0, 1)
+    entries = [f"{start}" if stop - start == 1 else f"{start}-{stop - 1}" for start, stop in zip(bounds, bounds[1:])]
+    entries.append(f"{bounds[-1]}-")
+    return ','.join(entries)
+
+
+text_indexes = TextIndexCache()